@@ -0,0 +1,200 @@
+"""
+Shared helpers of the benchmark scripts.
+
+Importing this module sets up defaults for the environment variables required by `transcription_service.config`
+(pointing to a temporary working directory), so the benchmarks can be run without any service configuration. Thus, it
+has to be imported before any of the `transcription_service` modules.
+"""
+import atexit
+import importlib.util
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import click
+import ffmpeg
+import httpx
+from redis import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="transcription_service_benchmark_"))
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_DB", "15")
+os.environ.setdefault("UPLOADS_DIR", str(WORK_DIR / "uploads"))
+os.environ.setdefault("TRANSCRIPTIONS_DIR", str(WORK_DIR / "transcriptions"))
+os.environ.setdefault("MODEL_ARTIFACTS_DIR", str(WORK_DIR / "models"))
+# Set for the service processes started by the benchmarks, when they run against the TCP fakeredis server.
+FAKE_REDIS_ENV_VAR = "BENCHMARK_FAKE_REDIS"
+REPO_DIR = Path(__file__).resolve().parents[2]
+Path(os.environ["UPLOADS_DIR"]).mkdir(parents=True, exist_ok=True)
+Path(os.environ["TRANSCRIPTIONS_DIR"]).mkdir(parents=True, exist_ok=True)
+
+
+def get_redis_connection(redis_url: Optional[str]) -> Redis:
+    """
+    Connect to the Redis server under the given URL (preferably a dedicated/empty DB, as the benchmarks write to it),
+    or create an in-process fakeredis instance if no URL is given.
+    """
+    if redis_url:
+        return Redis.from_url(redis_url)
+    try:
+        import fakeredis
+    except ImportError:
+        raise click.UsageError("fakeredis is not installed – install it or pass a --redis-url of a running Redis server.")
+    return fakeredis.FakeRedis()
+
+
+def measure(func: Callable[[], object], repeats: int) -> List[float]:
+    """Call the function `repeats` times and return the durations of the calls in seconds."""
+    durations = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """Summarize the durations (in seconds) into milliseconds statistics."""
+    durations_ms = sorted(duration * 1000 for duration in durations)
+    return {
+        "count": len(durations_ms),
+        "mean_ms": statistics.fmean(durations_ms),
+        "p50_ms": durations_ms[int(0.50 * (len(durations_ms) - 1))],
+        "p99_ms": durations_ms[int(0.99 * (len(durations_ms) - 1))],
+        "max_ms": durations_ms[-1],
+    }
+
+
+def write_results(results: dict, output_path: Optional[Path]) -> None:
+    """Print the results and optionally save them as JSON (for comparison across commits)."""
+    serialized = json.dumps(results, indent=4)
+    print(serialized)
+    if output_path is not None:
+        output_path.write_text(serialized, encoding="utf-8")
+        print(f"Results saved to {output_path}")
+
+
+def generate_media_fixture(path: Path, duration: float, video: bool) -> None:
+    """Generate a synthetic media file (a tone, plus a tiny test pattern video) with ffmpeg."""
+    audio = ffmpeg.input(f"sine=frequency=440:duration={duration}", f="lavfi")
+    if video:
+        picture = ffmpeg.input(f"testsrc=size=64x64:rate=1:duration={duration}", f="lavfi")
+        stream = ffmpeg.output(audio, picture, str(path), shortest=None)
+    else:
+        stream = ffmpeg.output(audio, str(path))
+    ffmpeg.run(stream.overwrite_output(), capture_stdout=True, capture_stderr=True)
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_fake_redis(port: int) -> None:
+    from fakeredis import TcpFakeServer
+    from fakeredis._clients._tcp_server import TCPFakeRequestHandler
+    from redis.exceptions import ResponseError
+
+    class RequestHandler(TCPFakeRequestHandler):
+        # Otherwise, the replies written in parts wait for the delayed ACKs (~40 ms per command).
+        disable_nagle_algorithm = True
+
+        def setup(self) -> None:
+            super().setup()
+            read_response = self.current_client.read_response
+
+            def read_response_or_error():
+                try:
+                    return read_response()
+                except ResponseError as e:
+                    return e
+
+            # The error replies (e.g. to INFO, which RQ falls back from) would close the connection otherwise, failing
+            # the next command sent over it.
+            self.current_client.read_response = read_response_or_error
+
+    server = TcpFakeServer(("127.0.0.1", port), server_type="redis")
+    server.RequestHandlerClass = RequestHandler
+    server.serve_forever()
+
+
+def start_fake_redis_server() -> Tuple[multiprocessing.Process, str]:
+    """
+    Start a TCP fakeredis server in a subprocess, for the benchmarks running the service in separate processes
+    without a Redis server (slower than a real Redis, but just as blocking).
+
+    Returns:
+        Tuple[multiprocessing.Process, str]: The server process and its Redis URL.
+    """
+    if importlib.util.find_spec("fakeredis") is None:
+        raise click.UsageError("fakeredis is not installed – install it or pass a --redis-url of a running Redis server.")
+    port = get_free_port()
+    process = multiprocessing.get_context("spawn").Process(target=_serve_fake_redis, args=(port,))
+    process.start()
+    return process, f"redis://127.0.0.1:{port}/0"
+
+
+def wait_for_redis(redis_conn: Redis) -> None:
+    for _ in range(300):
+        try:
+            redis_conn.ping()
+            return
+        except RedisConnectionError:
+            time.sleep(0.1)
+    raise click.ClickException("Redis is not available.")
+
+
+def get_service_env(redis_url: str, app_dir: Path = REPO_DIR, is_fake_redis: bool = False, **env: str) -> Dict[str, str]:
+    """Get the environment of a service process (the API or a worker) of the checkout in `app_dir`, using the Redis."""
+    parsed_url = urlparse(redis_url)
+    return {
+        **os.environ,
+        "REDIS_HOST": parsed_url.hostname,
+        "REDIS_PORT": str(parsed_url.port or 6379),
+        "REDIS_DB": parsed_url.path.lstrip("/") or "0",
+        "PYTHONPATH": str(app_dir),
+        "LOG_LEVEL": "WARNING",
+        **({FAKE_REDIS_ENV_VAR: "1"} if is_fake_redis else {}),
+        **env,
+    }
+
+
+def start_service(args: List[str], env: Dict[str, str], ping_url: str, cwd: Path = REPO_DIR) -> subprocess.Popen:
+    """Start a service (e.g. the API) in a subprocess and wait until its `/ping` endpoint answers."""
+    process = subprocess.Popen(args, cwd=cwd, env=env)
+    # The services import whisper (and torch), or load the model first, so they take a while to start.
+    for _ in range(3000):
+        if process.poll() is not None:
+            raise click.ClickException(f"The service failed to start: {' '.join(args)}")
+        try:
+            httpx.get(ping_url, timeout=1).raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise click.ClickException(f"The service didn't start in time: {' '.join(args)}")
+
+
+def start_api(env: Dict[str, str], port: int, cwd: Path = REPO_DIR) -> subprocess.Popen:
+    """Start the API (a single uvicorn worker) in a subprocess – see `get_service_env` for its environment."""
+    return start_service(
+        [sys.executable, "-m", "uvicorn", "transcription_service.main:app", "--port", str(port), "--no-access-log"],
+        env,
+        f"http://127.0.0.1:{port}/ping",
+        cwd=cwd,
+    )
@@ -0,0 +1,76 @@
+"""
+Model backends of the benchmarks running the service's workers, so they can be run offline and without a GPU:
+
+- `stub` – no inference at all, the audio is "transcribed" in `real_time_factor` seconds per second of it, so the rest
+  of the pipeline (the decoding, the queueing, the results) is measured on its own, deterministically,
+- `random` – the model with random weights (the real inference cost, garbage transcripts), see
+  `RANDOM_WEIGHTS_MODELS_DIMS`,
+- `checkpoint` – the real model, loaded the same way as by the workers (its checkpoint has to be downloaded already
+  to run offline, e.g. by `scripts/prewarm_models.py`).
+"""
+import time
+
+import torch
+import whisper
+from benchmark_worker_pool import RANDOM_WEIGHTS_MODELS_DIMS
+
+from transcription_service import model_cache
+from transcription_service.audio import SAMPLE_RATE
+
+MODEL_BACKENDS = ["stub", "random", "checkpoint"]
+# Seconds of the audio per word and per segment of the stub transcripts.
+STUB_WORD_DURATION = 0.5
+STUB_SEGMENT_DURATION = 10
+
+
+class StubWhisperModel(torch.nn.Module):
+    """
+    Stand-in for the whisper model (without any weights) – sleeps `real_time_factor` seconds per second of the audio
+    and returns a transcript of a word per `STUB_WORD_DURATION` seconds of it, in segments of `STUB_SEGMENT_DURATION`.
+    """
+
+    def __init__(self, real_time_factor: float):
+        super().__init__()
+        self.real_time_factor = real_time_factor
+
+    def transcribe(self, audio, word_timestamps: bool = False, **kwargs) -> dict:
+        if isinstance(audio, str):
+            audio = whisper.load_audio(audio)
+        duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.real_time_factor)
+        segments = []
+        for segment_start in range(0, int(duration), STUB_SEGMENT_DURATION):
+            segment_end = min(segment_start + STUB_SEGMENT_DURATION, duration)
+            words = [
+                {"word": f" word{i}", "start": word_start, "end": word_start + STUB_WORD_DURATION, "probability": 1.0}
+                for i, word_start in enumerate(
+                    segment_start + j * STUB_WORD_DURATION
+                    for j in range(int((segment_end - segment_start) / STUB_WORD_DURATION))
+                )
+            ]
+            segment = {
+                "id": len(segments),
+                "start": float(segment_start),
+                "end": segment_end,
+                "text": "".join(word["word"] for word in words),
+            }
+            if word_timestamps:
+                segment["words"] = words
+            segments.append(segment)
+        return {"text": "".join(segment["text"] for segment in segments), "segments": segments, "language": "en"}
+
+
+def create_random_weights_model(model_name: str) -> whisper.Whisper:
+    dims = whisper.model.ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_vocab=51865, n_text_ctx=448, **RANDOM_WEIGHTS_MODELS_DIMS[model_name]
+    )
+    torch.manual_seed(0)
+    return whisper.model.Whisper(dims).eval()
+
+
+def use_model_backend(model_backend: str, stub_real_time_factor: float = 0.0) -> None:
+    """Make the models loaded by this process (see `ModelCache`) the ones of the model backend."""
+    if model_backend == "stub":
+        model_cache.load_whisper_model = lambda model_name, device: StubWhisperModel(stub_real_time_factor)
+    elif model_backend == "random":
+        model_cache.load_whisper_model = lambda model_name, device: create_random_weights_model(model_name).to(device)
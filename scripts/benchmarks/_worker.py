@@ -0,0 +1,22 @@
+"""
+Entrypoint of the workers started by the benchmarks – the service's worker, with the model backend given by the
+`BENCHMARK_MODEL_BACKEND` (and `BENCHMARK_STUB_REAL_TIME_FACTOR`) environment variables, see `_models`.
+"""
+import os
+
+from _common import FAKE_REDIS_ENV_VAR
+from _models import use_model_backend
+from redis import Redis
+
+from transcription_service import worker
+
+if __name__ == "__main__":
+    if os.environ.get(FAKE_REDIS_ENV_VAR):
+        # The replies of the TCP fakeredis server to CLIENT LIST can't be parsed by redis-py – RQ only reads the
+        # address of the worker from them.
+        Redis.client_list = lambda self, *args, **kwargs: []
+    use_model_backend(
+        os.environ.get("BENCHMARK_MODEL_BACKEND", "checkpoint"),
+        float(os.environ.get("BENCHMARK_STUB_REAL_TIME_FACTOR", 0)),
+    )
+    worker.main()
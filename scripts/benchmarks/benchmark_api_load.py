@@ -0,0 +1,254 @@
+"""
+Load test of the API read path – concurrent clients polling `/status`, `/list` and `/status/batch` (the typical load
+of the clients waiting for their transcriptions) against a single uvicorn worker, reporting the requests per second and
+the latency percentiles of every endpoint.
+
+The API runs in a subprocess against the Redis under `--redis-url`, or against a TCP fakeredis server started by the
+benchmark (slower than a real Redis, but just as blocking). `--app-dir` points at the checkout of the service to run
+(the current one by default), so the same load can be replayed against an older commit, e.g. from a `git worktree`.
+"""
+import asyncio
+import logging
+import multiprocessing
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import click
+import httpx
+from _common import (
+    REPO_DIR,
+    get_free_port,
+    get_service_env,
+    start_api,
+    start_fake_redis_server,
+    summarize,
+    wait_for_redis,
+    write_results,
+)
+from redis import Redis
+from rq.job import Job, JobStatus
+from rq.queue import Queue
+
+from transcription_service import config
+from transcription_service.scheduling import SHORT_QUEUE_NAME, get_model_queue_name
+from transcription_service.transcription import transcribe_audio_task
+from transcription_service.uploads_index import add_to_uploads_index
+
+# Share of the requests of every endpoint.
+ENDPOINTS_WEIGHTS = {"status": 0.7, "list": 0.2, "status_batch": 0.1}
+BATCH_SIZE = 100
+
+
+def _serve_latency_proxy(port: int, upstream_host: str, upstream_port: int, latency: float) -> None:
+    """Forward the connections to the upstream Redis, delaying its replies – as if it was over the network."""
+
+    async def pump(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, delay: float) -> None:
+        try:
+            while data := await reader.read(65536):
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle(client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter) -> None:
+        upstream_reader, upstream_writer = await asyncio.open_connection(upstream_host, upstream_port)
+        await asyncio.gather(
+            pump(client_reader, upstream_writer, 0), pump(upstream_reader, client_writer, latency), return_exceptions=True
+        )
+
+    async def serve() -> None:
+        server = await asyncio.start_server(handle, "127.0.0.1", port)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+def _seed(redis_conn: Redis, uploads: int, queued_fraction: float) -> List[str]:
+    """Create the uploads with their jobs – the finished ones, and a part still queued (with the estimated waits)."""
+    redis_conn.flushdb()
+    queue = Queue(get_model_queue_name(SHORT_QUEUE_NAME, config.WHISPER_MODEL_NAME), connection=redis_conn)
+    reference_ids = [f"2024-01-01T00:00:00+00:00_upload_{i:08d}.mp3" for i in range(uploads)]
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for i, reference_id in enumerate(reference_ids):
+            is_queued = i >= uploads * (1 - queued_fraction)
+            job = Job.create(
+                transcribe_audio_task,
+                args=(reference_id, False),
+                connection=redis_conn,
+                id=reference_id,
+                origin=queue.name,
+                result_ttl=-1,
+                failure_ttl=-1,
+                status=JobStatus.QUEUED if is_queued else JobStatus.FINISHED,
+                meta={"duration": 60.0},
+            )
+            # Otherwise queried (with INFO, which the TCP fakeredis doesn't support) by every job.
+            job.redis_server_version = (7, 0, 0)
+            job.save(pipeline=pipeline)
+            if is_queued:
+                queue.push_job_id(reference_id, pipeline=pipeline)
+            else:
+                queue.finished_job_registry.add(job, ttl=-1, pipeline=pipeline)
+            add_to_uploads_index(pipeline, reference_id, uploaded_at=float(i))
+            if i % 1000 == 999:
+                pipeline.execute()
+        pipeline.execute()
+    return reference_ids
+
+
+async def _run_client(
+    client: httpx.AsyncClient,
+    reference_ids: List[str],
+    started_at: float,
+    warmup: float,
+    deadline: float,
+    results: Dict[str, List[float]],
+    errors: Dict[str, int],
+) -> None:
+    endpoints, weights = zip(*ENDPOINTS_WEIGHTS.items())
+    while (request_started_at := time.perf_counter()) < deadline:
+        endpoint = random.choices(endpoints, weights)[0]
+        if endpoint == "status":
+            request = client.get(f"/status/{random.choice(reference_ids)}")
+        elif endpoint == "list":
+            request = client.get("/list", params={"page": random.randint(1, len(reference_ids) // 10), "size": 10})
+        else:
+            request = client.post("/status/batch", json={"reference_ids": random.sample(reference_ids, BATCH_SIZE)})
+        try:
+            response = await request
+            is_error = response.status_code != 200
+        except httpx.HTTPError:
+            is_error = True
+        if request_started_at - started_at < warmup:
+            continue
+        if is_error:
+            errors[endpoint] += 1
+        else:
+            results[endpoint].append(time.perf_counter() - request_started_at)
+
+
+async def _run_load(base_url: str, reference_ids: List[str], concurrency: int, duration: float, warmup: float):
+    results: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        started_at = time.perf_counter()
+        deadline = started_at + warmup + duration
+        await asyncio.gather(
+            *(_run_client(client, reference_ids, started_at, warmup, deadline, results, errors) for _ in range(concurrency))
+        )
+    return results, errors
+
+
+@click.command()
+@click.option("--redis-url", type=str, default=None, help="Redis to use (a dedicated DB), defaults to TCP fakeredis.")
+@click.option(
+    "--app-dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    default=REPO_DIR,
+    help="Checkout of the service to run (the current one by default).",
+)
+@click.option(
+    "--redis-latency-ms", type=float, default=0, help="Delay of the Redis replies to the API (a network round trip)."
+)
+@click.option(
+    "--uploads", type=str, default="10000", help="Comma separated numbers of the uploads (jobs) in Redis, e.g. 1000,100000."
+)
+@click.option("--queued-fraction", type=float, default=0.05, help="Share of the jobs still queued.")
+@click.option("--concurrency", type=str, default="1,16,64", help="Comma separated numbers of the concurrent clients.")
+@click.option("--duration", type=float, default=20, help="Duration of the load of every concurrency in seconds.")
+@click.option("--warmup", type=float, default=2, help="Requests in the first seconds of every run are not measured.")
+@click.option("--seed", type=int, default=0)
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    redis_url: Optional[str],
+    app_dir: Path,
+    redis_latency_ms: float,
+    uploads: str,
+    queued_fraction: float,
+    concurrency: str,
+    duration: float,
+    warmup: float,
+    seed: int,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Measure the throughput and the tail latency of the API read path under growing numbers of concurrent clients, as
+    the number of the uploads grows.
+    """
+    random.seed(seed)
+    # Every request would be logged otherwise.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    fake_redis_process = None
+    if redis_url is None:
+        fake_redis_process, redis_url = start_fake_redis_server()
+
+    api_process = latency_proxy_process = None
+    try:
+        redis_conn = Redis.from_url(redis_url)
+        wait_for_redis(redis_conn)
+        api_redis_url = redis_url
+        if redis_latency_ms > 0:
+            parsed_url = urlparse(redis_url)
+            proxy_port = get_free_port()
+            latency_proxy_process = multiprocessing.get_context("spawn").Process(
+                target=_serve_latency_proxy,
+                args=(proxy_port, parsed_url.hostname, parsed_url.port or 6379, redis_latency_ms / 1000),
+            )
+            latency_proxy_process.start()
+            api_redis_url = parsed_url._replace(netloc=f"127.0.0.1:{proxy_port}").geturl()
+            wait_for_redis(Redis.from_url(api_redis_url))
+        api_port = get_free_port()
+        api_process = start_api(get_service_env(api_redis_url, app_dir), api_port, cwd=app_dir)
+
+        runs = []
+        for uploads_count in (int(uploads_count) for uploads_count in uploads.split(",")):
+            reference_ids = _seed(redis_conn, uploads_count, queued_fraction)
+            for clients in (int(clients) for clients in concurrency.split(",")):
+                endpoints_durations, errors = asyncio.run(
+                    _run_load(f"http://127.0.0.1:{api_port}", reference_ids, clients, duration, warmup)
+                )
+                requests_count = sum(len(durations) for durations in endpoints_durations.values())
+                run: Dict[str, object] = {
+                    "uploads": uploads_count,
+                    "concurrency": clients,
+                    "requests_per_second": requests_count / duration,
+                    "errors": dict(errors),
+                    "all": summarize([d for durations in endpoints_durations.values() for d in durations]),
+                    **{endpoint: summarize(durations) for endpoint, durations in endpoints_durations.items()},
+                }
+                runs.append(run)
+                click.echo(
+                    f"{uploads_count:>7} uploads, {clients:>4} clients: {run['requests_per_second']:.0f} req/s, "
+                    f"p50 {run['all']['p50_ms']:.1f} ms, p99 {run['all']['p99_ms']:.1f} ms, "
+                    f"max {run['all']['max_ms']:.1f} ms, {sum(errors.values())} errors"
+                )
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait()
+        if latency_proxy_process is not None:
+            latency_proxy_process.terminate()
+        if fake_redis_process is not None:
+            fake_redis_process.terminate()
+
+    results = {
+        "benchmark": "api_load",
+        "app_dir": str(app_dir),
+        "uploads": [int(uploads_count) for uploads_count in uploads.split(",")],
+        "queued_fraction": queued_fraction,
+        "redis_latency_ms": redis_latency_ms,
+        "duration_s": duration,
+        "runs": runs,
+    }
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
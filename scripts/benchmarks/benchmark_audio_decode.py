@@ -0,0 +1,92 @@
+"""
+Benchmark of the audio decoding before the inference – the legacy path (videos: ffmpeg extraction into a temporary
+WAV file, decoded again by whisper with another ffmpeg process; audio files: decoded by whisper itself) vs. the single
+in-memory decode stage.
+
+Every measurement runs in a fresh process, so the peak RSS values are not affected by each other.
+"""
+import multiprocessing
+import resource
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import click
+import ffmpeg
+import whisper
+from _common import WORK_DIR, generate_media_fixture, write_results
+
+from transcription_service.audio import decode_audio
+from transcription_service.models import MediaType
+from transcription_service.transcription import determine_media_type
+
+
+def _current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+
+def _decode(method: str, path: Path, is_video: bool) -> dict:
+    baseline_rss_mb = _current_rss_mb()
+    start = time.perf_counter()
+    if method == "in_memory":
+        audio = decode_audio(path)
+    elif is_video:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_audio_path = Path(temp_dir) / "audio.wav"
+            stream = ffmpeg.output(ffmpeg.input(str(path)), str(temp_audio_path), acodec="pcm_s16le", ac=1, ar="16k")
+            ffmpeg.run(stream, capture_stdout=True, capture_stderr=True)
+            audio = whisper.load_audio(str(temp_audio_path))
+    else:
+        audio = whisper.load_audio(str(path))
+    wall_time = time.perf_counter() - start
+
+    return {
+        "wall_time_s": wall_time,
+        "samples": len(audio),
+        "baseline_rss_mb": baseline_rss_mb,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_rss_increase_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - baseline_rss_mb,
+        "ffmpeg_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+@click.command()
+@click.option("--input-path", type=click.Path(exists=True, dir_okay=False, path_type=Path), default=None)
+@click.option("--duration", type=float, default=3600, help="Duration of the generated fixture (without --input-path).")
+@click.option("--video/--audio", default=True, help="Type of the generated fixture (without --input-path).")
+@click.option("--repeats", type=int, default=3)
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(input_path: Optional[Path], duration: float, video: bool, repeats: int, output_json: Optional[Path]) -> None:
+    """
+    Measure the wall time and the peak RSS of decoding the (by default generated, hour-long) media file.
+    """
+    if input_path is None:
+        input_path = WORK_DIR / ("fixture.mp4" if video else "fixture.mp3")
+        click.echo(f"Generating a {duration:.0f} s {'video' if video else 'audio'} fixture...")
+        generate_media_fixture(input_path, duration, video)
+    is_video = determine_media_type(input_path) == MediaType.VIDEO
+
+    results = {"benchmark": "audio_decode", "input": str(input_path), "is_video": is_video, "methods": {}}
+    context = multiprocessing.get_context("spawn")
+    for method in ("legacy", "in_memory"):
+        runs = []
+        for _ in range(repeats):
+            with context.Pool(1) as pool:
+                runs.append(pool.apply(_decode, (method, input_path, is_video)))
+        results["methods"][method] = {
+            "runs": runs,
+            "best_wall_time_s": min(run["wall_time_s"] for run in runs),
+            "max_peak_rss_increase_mb": max(run["peak_rss_increase_mb"] for run in runs),
+        }
+        click.echo(
+            f"{method:>9}: best wall time {results['methods'][method]['best_wall_time_s']:.2f} s, "
+            f"peak RSS increase {results['methods'][method]['max_peak_rss_increase_mb']:.0f} MB"
+        )
+
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""
+End-to-end benchmark of the transcription jobs – `--jobs` synthetic media files (generated with ffmpeg) are uploaded
+at once to the API and transcribed by N workers, reporting the jobs finished per minute, the latency percentiles of the
+jobs (their queue wait, processing and from the upload till the end), and the mean duration of every stage of them
+(as reported by the `/metrics` of the API).
+
+The API and the workers run in subprocesses against the Redis under `--redis-url`, or against a TCP fakeredis server
+started by the benchmark. The workers transcribe with `--model-backend` (see `_models`) – the stub one by default, so
+the benchmark runs offline and without a GPU, measuring the service itself rather than the model. The result cache is
+disabled, as all the uploads are the same file.
+"""
+import logging
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import httpx
+from _common import (
+    REPO_DIR,
+    WORK_DIR,
+    generate_media_fixture,
+    get_free_port,
+    get_service_env,
+    start_api,
+    start_fake_redis_server,
+    summarize,
+    wait_for_redis,
+    write_results,
+)
+from _models import MODEL_BACKENDS
+from redis import Redis
+from rq.job import Job
+from rq.worker import Worker
+
+from transcription_service.models import TranscriptionStatusEnum
+
+STATUS_POLL_INTERVAL = 0.5
+UPLOAD_BATCH_SIZE = 100
+WORKER_START_TIMEOUT = 600
+WORKER_STOP_TIMEOUT = 30
+_STAGE_METRIC_PATTERN = re.compile(r'^transcription_stage_duration_seconds_(sum|count)\{stage="(\w+)"\} (\S+)$', re.M)
+
+
+def _start_workers(env: Dict[str, str], workers: int, redis_conn: Redis) -> List[subprocess.Popen]:
+    """Start the workers and wait until all of them are registered (their model is loaded before that)."""
+    processes = [
+        subprocess.Popen([sys.executable, str(Path(__file__).parent / "_worker.py")], cwd=REPO_DIR, env=env)
+        for _ in range(workers)
+    ]
+    deadline = time.monotonic() + WORKER_START_TIMEOUT
+    while Worker.count(connection=redis_conn) < workers:
+        if any(process.poll() is not None for process in processes) or time.monotonic() > deadline:
+            _stop_workers(processes)
+            raise click.ClickException("The workers failed to start.")
+        time.sleep(0.2)
+    return processes
+
+
+def _stop_workers(processes: List[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(WORKER_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def _upload(client: httpx.Client, content: bytes, suffix: str, jobs: int) -> List[str]:
+    reference_ids = []
+    for offset in range(0, jobs, UPLOAD_BATCH_SIZE):
+        files = [("file", (f"job_{i:08d}{suffix}", content)) for i in range(offset, min(offset + UPLOAD_BATCH_SIZE, jobs))]
+        response = client.post("/upload/batch", files=files)
+        response.raise_for_status()
+        reference_ids.extend(item["reference_id"] for item in response.json()["items"])
+    return reference_ids
+
+
+def _wait_for_jobs(client: httpx.Client, reference_ids: List[str], timeout: float) -> Dict[str, str]:
+    """Poll the statuses of the jobs until all of them are finished (or failed)."""
+    statuses: Dict[str, str] = {}
+    pending = list(reference_ids)
+    deadline = time.monotonic() + timeout
+    while pending and time.monotonic() < deadline:
+        time.sleep(STATUS_POLL_INTERVAL)
+        response = client.post("/status/batch", json={"reference_ids": pending})
+        response.raise_for_status()
+        for item in response.json()["items"]:
+            if item["status"] in (TranscriptionStatusEnum.COMPLETED, TranscriptionStatusEnum.FAILED):
+                statuses[item["reference_id"]] = item["status"]
+        pending = [reference_id for reference_id in pending if reference_id not in statuses]
+    return statuses
+
+
+def _get_stage_durations(client: httpx.Client) -> Dict[str, float]:
+    """Get the mean durations of the stages of the transcriptions in milliseconds, from the metrics of the API."""
+    response = client.get("/metrics")
+    response.raise_for_status()
+    values: Dict[str, Dict[str, float]] = defaultdict(dict)
+    for kind, stage, value in _STAGE_METRIC_PATTERN.findall(response.text):
+        values[stage][kind] = float(value)
+    return {f"{stage}_mean_ms": value["sum"] / value["count"] * 1000 for stage, value in values.items() if value["count"]}
+
+
+def _run(
+    redis_url: Optional[str],
+    workers: int,
+    content: bytes,
+    suffix: str,
+    jobs: int,
+    service_env: Dict[str, str],
+    worker_env: Dict[str, str],
+    timeout: float,
+) -> Dict[str, object]:
+    """
+    Transcribe the jobs with the workers, on an empty Redis – every run starts its own TCP fakeredis server, which
+    (unlike Redis) keeps serving the blocking pops of the closed connections, so the workers of the previous runs would
+    still take the jobs.
+    """
+    fake_redis_process = api_process = None
+    worker_processes: List[subprocess.Popen] = []
+    try:
+        if redis_url is None:
+            fake_redis_process, redis_url = start_fake_redis_server()
+        redis_conn = Redis.from_url(redis_url)
+        wait_for_redis(redis_conn)
+        redis_conn.flushdb()
+        is_fake_redis = fake_redis_process is not None
+        api_port = get_free_port()
+        api_process = start_api(get_service_env(redis_url, is_fake_redis=is_fake_redis, **service_env), api_port)
+        worker_processes = _start_workers(
+            get_service_env(redis_url, is_fake_redis=is_fake_redis, **service_env, **worker_env), workers, redis_conn
+        )
+
+        with httpx.Client(base_url=f"http://127.0.0.1:{api_port}", timeout=300) as client:
+            started_at = time.perf_counter()
+            reference_ids = _upload(client, content, suffix, jobs)
+            statuses = _wait_for_jobs(client, reference_ids, timeout)
+            wall_time = time.perf_counter() - started_at
+            stage_durations = _get_stage_durations(client)
+        finished_jobs = [
+            job for job in Job.fetch_many(reference_ids, connection=redis_conn) if job is not None and job.ended_at is not None
+        ]
+    finally:
+        _stop_workers(worker_processes)
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait()
+        if fake_redis_process is not None:
+            fake_redis_process.terminate()
+
+    completed = sum(status == TranscriptionStatusEnum.COMPLETED for status in statuses.values())
+    return {
+        "workers": workers,
+        "completed": completed,
+        "failed": len(statuses) - completed,
+        "timed_out": len(reference_ids) - len(statuses),
+        "wall_time_s": wall_time,
+        "jobs_per_minute": completed / wall_time * 60,
+        "queue_wait": summarize([(job.started_at - job.enqueued_at).total_seconds() for job in finished_jobs]),
+        "processing": summarize([(job.ended_at - job.started_at).total_seconds() for job in finished_jobs]),
+        "latency": summarize([(job.ended_at - job.enqueued_at).total_seconds() for job in finished_jobs]),
+        "stages": stage_durations,
+    }
+
+
+@click.command()
+@click.option("--redis-url", type=str, default=None, help="Redis to use (a dedicated DB), defaults to TCP fakeredis.")
+@click.option("--workers", type=str, default="1,2,4", help="Comma separated numbers of the workers.")
+@click.option("--jobs", type=int, default=50, help="Number of the jobs transcribed by every run.")
+@click.option("--clip-duration", type=float, default=30, help="Duration of the transcribed media file in seconds.")
+@click.option("--video/--audio", default=False, help="Type of the transcribed media file.")
+@click.option("--model-backend", type=click.Choice(MODEL_BACKENDS), default="stub", help="See `_models`.")
+@click.option("--model-name", type=str, default="tiny", help="Model of the random and checkpoint backends.")
+@click.option(
+    "--stub-real-time-factor", type=float, default=0.1, help="Seconds of the stub inference per second of the audio."
+)
+@click.option("--timeout", type=float, default=3600, help="Max duration of a run in seconds.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    redis_url: Optional[str],
+    workers: str,
+    jobs: int,
+    clip_duration: float,
+    video: bool,
+    model_backend: str,
+    model_name: str,
+    stub_real_time_factor: float,
+    timeout: float,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Measure the end-to-end throughput (jobs per minute) and latency of the transcriptions with N workers.
+    """
+    # Every request would be logged otherwise.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    fixture_path = WORK_DIR / ("job_fixture.mp4" if video else "job_fixture.mp3")
+    generate_media_fixture(fixture_path, clip_duration, video)
+    content = fixture_path.read_bytes()
+    service_env = {"WHISPER_MODEL_NAME": model_name, "RESULT_CACHE_ENABLED": "false", "ADMISSION_MAX_BACKLOG_WAIT": "0"}
+    worker_env = {
+        "BENCHMARK_MODEL_BACKEND": model_backend,
+        "BENCHMARK_STUB_REAL_TIME_FACTOR": str(stub_real_time_factor),
+        # A core per worker.
+        "WORKER_TORCH_THREADS": "1",
+    }
+
+    runs = []
+    for workers_count in (int(workers_count) for workers_count in workers.split(",")):
+        run = _run(redis_url, workers_count, content, fixture_path.suffix, jobs, service_env, worker_env, timeout)
+        runs.append(run)
+        click.echo(
+            f"{workers_count:>3} workers: {run['jobs_per_minute']:.1f} jobs/min, "
+            f"latency p50 {run['latency']['p50_ms'] / 1000:.1f} s, p99 {run['latency']['p99_ms'] / 1000:.1f} s, "
+            f"{run['failed']} failed, {run['timed_out']} timed out"
+        )
+
+    results = {
+        "benchmark": "end_to_end",
+        "model_backend": model_backend,
+        "model": model_name,
+        "stub_real_time_factor": stub_real_time_factor if model_backend == "stub" else None,
+        "jobs": jobs,
+        "clip_duration_s": clip_duration,
+        "is_video": video,
+        "runs": runs,
+    }
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
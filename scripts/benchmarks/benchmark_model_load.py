@@ -0,0 +1,110 @@
+"""
+Benchmark of the worker cold start – loading the whisper model from its checkpoint vs. memory-mapping its pre-converted
+artifact, in N freshly started processes (as the workers of N containers on one host would).
+
+Every process loads the model and runs the encoder once (so the lazily mapped weights are actually read), reporting
+the time to load and the time to the first inference. Memory is measured as the total PSS (proportional set size, i.e.
+shared pages are split between the processes sharing them) of all the processes, once they all are ready. The files
+are likely in the page cache (they were just written) – drop it beforehand to measure the truly cold disk reads.
+"""
+import multiprocessing
+import time
+from dataclasses import asdict
+from pathlib import Path
+from typing import Optional
+
+import click
+import torch
+import whisper
+from _common import WORK_DIR, write_results
+from benchmark_worker_pool import RANDOM_WEIGHTS_MODELS_DIMS, _pss_mb
+
+from transcription_service.model_artifacts import convert_model_checkpoint, get_model_artifact_path, load_model_artifact
+
+MODES = ["checkpoint", "artifact"]
+
+
+def _run_worker(mode: str, model_source: str, ready_queue, exit_event) -> None:
+    started_at = time.perf_counter()
+    if mode == "artifact":
+        model = load_model_artifact(Path(model_source), "cpu")
+    else:
+        model = whisper.load_model(model_source, device="cpu")
+    loaded_at = time.perf_counter()
+    with torch.no_grad():
+        model.encoder(torch.zeros(1, model.dims.n_mels, 2 * model.dims.n_audio_ctx))
+    ready_queue.put((loaded_at - started_at, time.perf_counter() - started_at))
+    exit_event.wait()
+
+
+def _run_mode(mode: str, workers: int, model_source: str) -> dict:
+    context = multiprocessing.get_context("spawn")
+    ready_queue, exit_event = context.Queue(), context.Event()
+    processes = [
+        context.Process(target=_run_worker, args=(mode, model_source, ready_queue, exit_event)) for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    timings = [ready_queue.get() for _ in processes]
+    total_pss_mb = sum(_pss_mb(process.pid) for process in processes)
+    exit_event.set()
+    for process in processes:
+        process.join()
+
+    load_times = [load_time for load_time, _ in timings]
+    first_inference_times = [first_inference_time for _, first_inference_time in timings]
+    return {
+        "load_mean_s": sum(load_times) / len(load_times),
+        "load_max_s": max(load_times),
+        "first_inference_mean_s": sum(first_inference_times) / len(first_inference_times),
+        "first_inference_max_s": max(first_inference_times),
+        "total_pss_mb": total_pss_mb,
+    }
+
+
+@click.command()
+@click.option("--workers", type=int, default=4, help="Number of the processes loading the model at once.")
+@click.option("--model-name", default="tiny")
+@click.option("--random-weights", is_flag=True, help=f"Random weights (offline) – {', '.join(RANDOM_WEIGHTS_MODELS_DIMS)}.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(workers: int, model_name: str, random_weights: bool, output_json: Optional[Path]) -> None:
+    """
+    Compare the load time, time to the first inference and the memory of N workers loading the model from its
+    checkpoint with N workers memory-mapping its artifact.
+    """
+    checkpoint = model_name
+    if random_weights:
+        # Stored in half precision, as the official checkpoints are.
+        dims = whisper.model.ModelDimensions(
+            n_mels=80, n_audio_ctx=1500, n_vocab=51865, n_text_ctx=448, **RANDOM_WEIGHTS_MODELS_DIMS[model_name]
+        )
+        checkpoint = str(WORK_DIR / f"{model_name}.pt")
+        torch.save({"dims": asdict(dims), "model_state_dict": whisper.model.Whisper(dims).half().state_dict()}, checkpoint)
+
+    started_at = time.perf_counter()
+    convert_model_checkpoint(model_name, checkpoint if random_weights else None)
+    conversion_time = time.perf_counter() - started_at
+    model_sources = {"checkpoint": checkpoint, "artifact": str(get_model_artifact_path(model_name))}
+
+    results = {
+        "benchmark": "model_load",
+        "workers": workers,
+        "model_name": model_name,
+        "random_weights": random_weights,
+        "conversion_s": conversion_time,
+        "modes": {},
+    }
+    for mode in MODES:
+        result = _run_mode(mode, workers, model_sources[mode])
+        results["modes"][mode] = result
+        click.echo(
+            f"{mode:>10}: load {result['load_mean_s']:.2f} s (max {result['load_max_s']:.2f} s), first inference "
+            f"{result['first_inference_mean_s']:.2f} s (max {result['first_inference_max_s']:.2f} s), "
+            f"total PSS {result['total_pss_mb']:.0f} MB"
+        )
+
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
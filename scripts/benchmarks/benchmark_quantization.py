@@ -0,0 +1,178 @@
+"""
+Benchmark of the quantized CPU inference – speed, memory and word error rate (WER) of every quantization mode on a fixed
+local corpus of media files, each optionally with its reference transcript (a `.txt` file of the same name). Without
+the reference, the WER is measured against the transcript of the full-precision model, i.e. it's the quality lost by
+the quantization.
+
+Every mode runs in a freshly started process, loading the model the same way as the workers do. Besides the
+transcription of the corpus, the encoder pass of a single 30 s window is timed on its own – a fixed workload,
+unlike the decoding (its length depends on the transcripts), so it's comparable even with random weights.
+"""
+import multiprocessing
+import resource
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import ffmpeg
+import torch
+import whisper
+from _common import WORK_DIR, write_results
+from benchmark_worker_pool import RANDOM_WEIGHTS_MODELS_DIMS
+from whisper.normalizers import BasicTextNormalizer
+
+from transcription_service import transcription
+from transcription_service.audio import decode_audio
+from transcription_service.model_cache import ModelCache, get_model_memory
+from transcription_service.quantization import QUANTIZATION_NONE, QUANTIZATIONS, quantize_whisper_model
+
+MEDIA_EXTENSIONS = {".mp3", ".wav", ".m4a", ".flac", ".ogg", ".opus", ".mp4", ".mkv", ".webm"}
+
+
+def _word_error_rate(reference: str, hypothesis: str) -> float:
+    """Word-level edit distance between the (normalized) transcripts, divided by the number of the reference words."""
+    normalizer = BasicTextNormalizer()
+    reference_words = normalizer(reference).split()
+    hypothesis_words = normalizer(hypothesis).split()
+    if not reference_words:
+        return float(bool(hypothesis_words))
+    distances = list(range(len(hypothesis_words) + 1))
+    for i, reference_word in enumerate(reference_words, start=1):
+        previous_diagonal, distances[0] = distances[0], i
+        for j, hypothesis_word in enumerate(hypothesis_words, start=1):
+            previous_diagonal, distances[j] = distances[j], min(
+                distances[j] + 1,
+                distances[j - 1] + 1,
+                previous_diagonal + (reference_word != hypothesis_word),
+            )
+    return distances[-1] / len(reference_words)
+
+
+def _run_mode(
+    quantization: str, model_name: str, random_weights: bool, torch_threads: int, media_paths: List[Path], results_queue
+) -> None:
+    torch.set_num_threads(torch_threads)
+    started_at = time.perf_counter()
+    transcription.MODEL_CACHE = ModelCache("cpu", 0, quantization)
+    if random_weights:
+        dims = whisper.model.ModelDimensions(
+            n_mels=80, n_audio_ctx=1500, n_vocab=51865, n_text_ctx=448, **RANDOM_WEIGHTS_MODELS_DIMS[model_name]
+        )
+        torch.manual_seed(0)
+        model = transcription.MODEL_CACHE.put(model_name, quantize_whisper_model(whisper.model.Whisper(dims), quantization))
+    else:
+        model = transcription.MODEL_CACHE.get(model_name)
+    load_time = time.perf_counter() - started_at
+
+    mel = torch.zeros(1, model.dims.n_mels, 2 * model.dims.n_audio_ctx)
+    with torch.no_grad():
+        model.encoder(mel)
+        encoder_times = []
+        for _ in range(3):
+            encoder_started_at = time.perf_counter()
+            model.encoder(mel)
+            encoder_times.append(time.perf_counter() - encoder_started_at)
+
+    transcripts, processing_time, media_duration = {}, 0.0, 0.0
+    for media_path in media_paths:
+        audio = decode_audio(media_path)
+        transcribe_started_at = time.perf_counter()
+        _, transcripts[media_path.name], _, _ = transcription._transcribe_audio(audio, False, model_name=model_name)
+        processing_time += time.perf_counter() - transcribe_started_at
+        media_duration += len(audio) / whisper.audio.SAMPLE_RATE
+
+    results_queue.put(
+        {
+            "load_s": load_time,
+            "model_memory_mb": get_model_memory(model) / 1024 / 1024,
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "encoder_window_s": statistics.median(encoder_times),
+            "processing_s": processing_time,
+            "real_time_factor": processing_time / media_duration,
+            "transcripts": transcripts,
+        }
+    )
+
+
+def _get_corpus(corpus_dir: Optional[Path], clip_duration: float) -> List[Path]:
+    if corpus_dir is not None:
+        return sorted(path for path in corpus_dir.iterdir() if path.suffix.lower() in MEDIA_EXTENSIONS)
+    # Without a corpus, only the speed and the memory are meaningful.
+    audio_path = WORK_DIR / "clip.wav"
+    stream = ffmpeg.input(f"sine=frequency=440:duration={clip_duration}", f="lavfi").output(str(audio_path))
+    ffmpeg.run(stream.overwrite_output(), capture_stdout=True, capture_stderr=True)
+    return [audio_path]
+
+
+@click.command()
+@click.option(
+    "--corpus",
+    "corpus_dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    default=None,
+    help="Directory of the media files (with optional .txt reference transcripts). A generated tone if not given.",
+)
+@click.option("--model-name", default="base")
+@click.option("--random-weights", is_flag=True, help=f"Random weights (offline) – {', '.join(RANDOM_WEIGHTS_MODELS_DIMS)}.")
+@click.option("--torch-threads", type=int, default=torch.get_num_threads())
+@click.option("--clip-duration", type=float, default=30, help="Duration of the generated clip without a corpus.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    corpus_dir: Optional[Path],
+    model_name: str,
+    random_weights: bool,
+    torch_threads: int,
+    clip_duration: float,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Compare the speed, the memory and the WER of the model with every quantization mode.
+    """
+    media_paths = _get_corpus(corpus_dir, clip_duration)
+    context = multiprocessing.get_context("spawn")
+    modes: Dict[str, dict] = {}
+    for quantization in QUANTIZATIONS:
+        results_queue = context.Queue()
+        process = context.Process(
+            target=_run_mode, args=(quantization, model_name, random_weights, torch_threads, media_paths, results_queue)
+        )
+        process.start()
+        modes[quantization] = results_queue.get()
+        process.join()
+
+    transcripts = {quantization: result.pop("transcripts") for quantization, result in modes.items()}
+    references = {
+        media_path.name: (
+            media_path.with_suffix(".txt").read_text(encoding="utf-8")
+            if media_path.with_suffix(".txt").exists()
+            else transcripts[QUANTIZATION_NONE][media_path.name]
+        )
+        for media_path in media_paths
+    }
+    for quantization, result in modes.items():
+        result["word_error_rate"] = statistics.fmean(
+            _word_error_rate(reference, transcripts[quantization][name]) for name, reference in references.items()
+        )
+        result["encoder_speedup"] = modes[QUANTIZATION_NONE]["encoder_window_s"] / result["encoder_window_s"]
+        click.echo(
+            f"{quantization:>5}: encoder {result['encoder_window_s']:.2f} s/window ({result['encoder_speedup']:.2f}x), "
+            f"real-time factor {result['real_time_factor']:.3f}, model {result['model_memory_mb']:.0f} MB, "
+            f"peak RSS {result['peak_rss_mb']:.0f} MB, WER {result['word_error_rate']:.3f}"
+        )
+
+    results = {
+        "benchmark": "quantization",
+        "model_name": model_name,
+        "random_weights": random_weights,
+        "torch_threads": torch_threads,
+        "corpus": [media_path.name for media_path in media_paths],
+        "references": [media_path.name for media_path in media_paths if media_path.with_suffix(".txt").exists()],
+        "modes": modes,
+    }
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
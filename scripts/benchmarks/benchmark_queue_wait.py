@@ -0,0 +1,193 @@
+"""
+Benchmark of the queue wait times under a mixed synthetic workload (many short voice notes, some meetings and a few
+multi-hour recordings) – the single FIFO queue vs. the size-class queues drained by the worker queue policies.
+
+It's a discrete-event simulation (the queue waits of real transcriptions take hours to observe) – the jobs are routed
+and ordered by the same functions the API and the workers use, with the processing time being the media duration
+times the real-time factor.
+"""
+import heapq
+import random
+import statistics
+from collections import deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import click
+from _common import write_results
+
+from transcription_service import config
+from transcription_service.scheduling import (
+    LONG_QUEUE_NAME,
+    MEDIUM_QUEUE_NAME,
+    SHORT_QUEUE_NAME,
+    FairShareScheduler,
+    get_size_class_queue_name,
+    order_by_shortest_job_first,
+    parse_fair_share_weights,
+)
+
+SIZE_CLASS_QUEUE_NAMES = [SHORT_QUEUE_NAME, MEDIUM_QUEUE_NAME, LONG_QUEUE_NAME]
+FIFO_QUEUE_NAME = "fifo"
+POLICIES = ["fifo", "sjf", "sjf-no-aging", "fair"]
+
+# (arrival time, media duration)
+Job = Tuple[float, float]
+
+
+def _generate_workload(
+    jobs_count: int, mix: List[Tuple[float, float]], workers: int, real_time_factor: float, utilization: float, seed: int
+) -> List[Job]:
+    """Generate the jobs with Poisson arrivals, at the rate giving the target utilization of the workers."""
+    rng = random.Random(seed)
+    durations = [
+        rng.choices([duration for duration, _ in mix], weights=[share for _, share in mix])[0] * rng.uniform(0.5, 1.5)
+        for _ in range(jobs_count)
+    ]
+    mean_processing_time = statistics.fmean(durations) * real_time_factor
+    arrival_rate = utilization * workers / mean_processing_time
+    arrival_time = 0.0
+    jobs = []
+    for duration in durations:
+        arrival_time += rng.expovariate(arrival_rate)
+        jobs.append((arrival_time, duration))
+    return jobs
+
+
+def _simulate(policy: str, jobs: List[Job], workers: int, real_time_factor: float) -> Dict[str, List[float]]:
+    """Simulate the processing of the jobs, returning the queue waits of the jobs of every size class."""
+    queues: Dict[str, Deque[Job]] = {
+        queue_name: deque() for queue_name in (SIZE_CLASS_QUEUE_NAMES if policy != "fifo" else [FIFO_QUEUE_NAME])
+    }
+    # Every worker orders the queues on its own, as the real ones do.
+    fair_share_schedulers = [
+        FairShareScheduler(parse_fair_share_weights(config.QUEUE_FAIR_SHARE_WEIGHTS)) for _ in range(workers)
+    ]
+    aging_interval = config.QUEUE_AGING_INTERVAL if policy == "sjf" else 0
+    waits: Dict[str, List[float]] = {queue_name: [] for queue_name in SIZE_CLASS_QUEUE_NAMES}
+
+    def dequeue(worker: int, now: float) -> Optional[Tuple[str, Job]]:
+        non_empty_queue_names = {queue_name for queue_name, queue in queues.items() if queue}
+        if not non_empty_queue_names:
+            return None
+        if policy == "fifo":
+            ordered_queue_names = [FIFO_QUEUE_NAME]
+        elif policy == "fair":
+            ordered_queue_names = fair_share_schedulers[worker].order(SIZE_CLASS_QUEUE_NAMES, non_empty_queue_names)
+        else:
+            head_waits = {queue_name: now - queue[0][0] if queue else None for queue_name, queue in queues.items()}
+            ordered_queue_names = order_by_shortest_job_first(SIZE_CLASS_QUEUE_NAMES, head_waits, aging_interval)
+        queue_name = next(queue_name for queue_name in ordered_queue_names if queues[queue_name])
+        return queue_name, queues[queue_name].popleft()
+
+    # Events are (time, order, worker) of the workers becoming free.
+    free_at: List[Tuple[float, int, int]] = []
+    idle_workers = list(range(workers))
+    order = 0
+
+    def start(worker: int, queue_name: str, job: Job, now: float) -> None:
+        nonlocal order
+        arrival_time, duration = job
+        waits[get_size_class_queue_name(duration)].append(now - arrival_time)
+        processing_time = duration * real_time_factor
+        fair_share_schedulers[worker].record(queue_name, processing_time)
+        order += 1
+        heapq.heappush(free_at, (now + processing_time, order, worker))
+
+    for job in jobs:
+        arrival_time, duration = job
+        # Workers becoming free before the arrival take the waiting jobs.
+        while free_at and free_at[0][0] <= arrival_time:
+            now, _, worker = heapq.heappop(free_at)
+            dequeued = dequeue(worker, now)
+            if dequeued is None:
+                idle_workers.append(worker)
+            else:
+                start(worker, *dequeued, now)
+
+        queue_name = FIFO_QUEUE_NAME if policy == "fifo" else get_size_class_queue_name(duration)
+        if idle_workers:
+            start(idle_workers.pop(), queue_name, job, arrival_time)
+        else:
+            queues[queue_name].append(job)
+
+    while free_at:
+        now, _, worker = heapq.heappop(free_at)
+        dequeued = dequeue(worker, now)
+        if dequeued is not None:
+            start(worker, *dequeued, now)
+    return waits
+
+
+def _summarize_waits(waits: List[float]) -> Dict[str, float]:
+    waits = sorted(waits)
+    if not waits:
+        return {"count": 0}
+    return {
+        "count": len(waits),
+        "mean_s": statistics.fmean(waits),
+        "p50_s": waits[int(0.50 * (len(waits) - 1))],
+        "p99_s": waits[int(0.99 * (len(waits) - 1))],
+        "max_s": waits[-1],
+    }
+
+
+@click.command()
+@click.option("--jobs", "jobs_count", type=int, default=20000)
+@click.option("--workers", type=int, default=4)
+@click.option(
+    "--mix",
+    default="30:0.8,900:0.17,10800:0.03",
+    help="Workload mix as comma separated <media duration in seconds>:<share> pairs (durations are jittered ±50%).",
+)
+@click.option("--real-time-factor", type=float, default=0.1, help="Processing time per second of media.")
+@click.option("--utilization", type=float, default=0.85, help="Target utilization of the workers.")
+@click.option("--seed", type=int, default=0)
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    jobs_count: int,
+    workers: int,
+    mix: str,
+    real_time_factor: float,
+    utilization: float,
+    seed: int,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Measure the p50/p99 queue waits of every size class with every queue policy.
+    """
+    parsed_mix = [(float(duration), float(share)) for duration, share in (pair.split(":") for pair in mix.split(","))]
+    jobs = _generate_workload(jobs_count, parsed_mix, workers, real_time_factor, utilization, seed)
+
+    results = {
+        "benchmark": "queue_wait",
+        "jobs": jobs_count,
+        "workers": workers,
+        "mix": mix,
+        "real_time_factor": real_time_factor,
+        "utilization": utilization,
+        "aging_interval_s": config.QUEUE_AGING_INTERVAL,
+        "fair_share_weights": config.QUEUE_FAIR_SHARE_WEIGHTS,
+        "policies": {},
+    }
+    for policy in POLICIES:
+        waits = _simulate(policy, jobs, workers, real_time_factor)
+        all_waits = [wait for queue_waits in waits.values() for wait in queue_waits]
+        results["policies"][policy] = {
+            "all": _summarize_waits(all_waits),
+            **{queue_name: _summarize_waits(queue_waits) for queue_name, queue_waits in waits.items()},
+        }
+        click.echo(
+            f"{policy:>12}: "
+            + ", ".join(
+                f"{queue_name} p50/p99 {summary['p50_s']:.0f}/{summary['p99_s']:.0f} s"
+                for queue_name, summary in results["policies"][policy].items()
+                if summary["count"]
+            )
+        )
+
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark of the reference existence check used by `/status` and `/download` – the legacy scan of the uploads
+directory vs. the lookup in the uploads index – as the number of uploads grows.
+"""
+import asyncio
+from pathlib import Path
+from typing import Optional
+
+import click
+from _common import get_redis_connection, measure, summarize, write_results
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from transcription_service import config
+from transcription_service.uploads_index import UPLOADS_INDEX_KEY, add_to_uploads_index, is_in_uploads_index
+
+
+def _get_async_redis_connection(redis_conn: Redis) -> AsyncRedis:
+    """Get an async connection to the same Redis (or the same fakeredis server) as the given one."""
+    connection_kwargs = redis_conn.connection_pool.connection_kwargs
+    if "server" in connection_kwargs:
+        from fakeredis import FakeAsyncRedis
+
+        return FakeAsyncRedis(server=connection_kwargs["server"])
+    return AsyncRedis(
+        **{key: connection_kwargs[key] for key in ("host", "port", "db", "password") if key in connection_kwargs}
+    )
+
+
+def _legacy_exists(reference_id: str) -> bool:
+    return reference_id in (path.name for path in config.UPLOADS_DIR.iterdir())
+
+
+@click.command()
+@click.option("--redis-url", type=str, default=None, help="Redis to use (a dedicated DB), defaults to fakeredis.")
+@click.option("--sizes", type=str, default="100,1000,10000,100000", help="Comma separated numbers of uploads.")
+@click.option("--repeats", type=int, default=100, help="Number of lookups measured per size and method.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(redis_url: Optional[str], sizes: str, repeats: int, output_json: Optional[Path]) -> None:
+    """
+    Measure the latency of the reference existence check for growing numbers of uploads.
+    """
+    redis_conn = get_redis_connection(redis_url)
+    redis_conn.delete(UPLOADS_INDEX_KEY)
+    async_redis_conn = _get_async_redis_connection(redis_conn)
+    # The lookup is async (as in the API), a single loop runs all the measured calls.
+    loop = asyncio.new_event_loop()
+
+    results = {"benchmark": "reference_lookup", "repeats": repeats, "sizes": []}
+    uploaded = 0
+    try:
+        for size in sorted(int(size) for size in sizes.split(",")):
+            # Grow the uploads directory (and the index) up to the given size.
+            with redis_conn.pipeline(transaction=False) as pipeline:
+                for i in range(uploaded, size):
+                    reference_id = f"upload_{i:08d}.mp3"
+                    (config.UPLOADS_DIR / reference_id).touch()
+                    add_to_uploads_index(pipeline, reference_id, uploaded_at=float(i))
+                pipeline.execute()
+            uploaded = size
+
+            # The worst case for the scan – a reference which is not present at all (e.g. a typo in the client).
+            missing_reference_id = "missing.mp3"
+            results["sizes"].append(
+                {
+                    "uploads": size,
+                    "directory_scan": summarize(measure(lambda: _legacy_exists(missing_reference_id), repeats)),
+                    "uploads_index": summarize(
+                        measure(
+                            lambda: loop.run_until_complete(is_in_uploads_index(async_redis_conn, missing_reference_id)),
+                            repeats,
+                        )
+                    ),
+                }
+            )
+            click.echo(
+                f"{size:>8} uploads: directory scan p50 {results['sizes'][-1]['directory_scan']['p50_ms']:.3f} ms, "
+                f"uploads index p50 {results['sizes'][-1]['uploads_index']['p50_ms']:.3f} ms"
+            )
+    finally:
+        redis_conn.delete(UPLOADS_INDEX_KEY)
+        loop.run_until_complete(async_redis_conn.aclose())
+        loop.close()
+
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""
+End-to-end latency of the live streaming transcription – a local media file is replayed to the streaming worker in real
+time (as if it was captured live) by N concurrent streams, reporting how long after a word was sent it was received as
+final (and as interim), how long the rest of the stream took to transcribe once it ended, and how far the replay fell
+behind the real time because of the backpressure.
+
+The streaming worker runs in a subprocess with `--model` (`--url` of an already running one can be given instead).
+"""
+import asyncio
+import bisect
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import numpy as np
+import websockets
+from _common import REPO_DIR, get_free_port, start_service, summarize, write_results
+
+from transcription_service.audio import SAMPLE_RATE, decode_audio
+from transcription_service.streaming import BYTES_PER_SAMPLE, STREAMS_LIMIT_CLOSE_CODE
+
+
+def _start_streaming_worker(port: int, model_name: str, max_streams: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "STREAMING_PORT": str(port),
+        "WHISPER_MODEL_NAME": model_name,
+        "STREAM_MAX_CONCURRENT": str(max_streams),
+        "PYTHONPATH": str(REPO_DIR),
+        "LOG_LEVEL": "WARNING",
+    }
+    # The model is loaded before the worker starts serving.
+    return start_service([sys.executable, "-m", "transcription_service.streaming"], env, f"http://127.0.0.1:{port}/ping")
+
+
+async def _replay(url: str, pcm: bytes, frame_duration: float, speed: float) -> Optional[Dict[str, object]]:
+    """
+    Replay the audio as a single stream, at `speed` times the real time.
+
+    Returns:
+        Optional[Dict[str, object]]: The latencies (and the replay lag) of the stream, None if it was rejected.
+    """
+    frame_size = int(frame_duration * SAMPLE_RATE) * BYTES_PER_SAMPLE
+    # Stream time of the end of every frame sent, and the time it was sent at.
+    sent_audio_ends: List[float] = []
+    sent_ats: List[float] = []
+    final_latencies: List[float] = []
+    interim_latencies: List[float] = []
+    final_text: List[str] = []
+    max_lag = 0.0
+
+    def get_sent_at(stream_time: float) -> float:
+        # The word was sent with the first frame ending after it.
+        return sent_ats[min(bisect.bisect_left(sent_audio_ends, stream_time), len(sent_ats) - 1)]
+
+    # Without the keepalive pings – their replies wait behind the audio while the replay is held off by the backpressure.
+    async with websockets.connect(url, max_size=None, ping_interval=None) as ws:
+
+        async def send() -> float:
+            nonlocal max_lag
+            started_at = time.perf_counter()
+            for i, offset in enumerate(range(0, len(pcm), frame_size)):
+                delay = started_at + i * frame_duration / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                max_lag = max(max_lag, -delay)
+                # Blocks once the worker stops reading the stream (backpressure).
+                await ws.send(pcm[offset : offset + frame_size])
+                sent_audio_ends.append((offset + len(pcm[offset : offset + frame_size])) / BYTES_PER_SAMPLE / SAMPLE_RATE)
+                sent_ats.append(time.perf_counter())
+            await ws.send(json.dumps({"type": "end"}))
+            return time.perf_counter()
+
+        send_task = asyncio.ensure_future(send())
+        try:
+            while True:
+                message = json.loads(await ws.recv())
+                received_at = time.perf_counter()
+                if message["type"] == "end":
+                    end_latency = received_at - await send_task
+                    break
+                if message["type"] == "final":
+                    final_text.append(message["text"])
+                    final_latencies.extend(received_at - get_sent_at(word["end"]) for word in message["words"])
+                elif message["end"] is not None:
+                    interim_latencies.append(received_at - get_sent_at(message["end"]))
+        except websockets.ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == STREAMS_LIMIT_CLOSE_CODE:
+                return None
+            raise click.ClickException(f"The stream was closed unexpectedly: {e}")
+        finally:
+            send_task.cancel()
+    return {
+        "final_latencies": final_latencies,
+        "interim_latencies": interim_latencies,
+        "end_latency": end_latency,
+        "max_lag": max_lag,
+        "text": "".join(final_text),
+    }
+
+
+async def _run_streams(url: str, pcm: bytes, streams: int, frame_duration: float, speed: float) -> List[Optional[dict]]:
+    return await asyncio.gather(*(_replay(url, pcm, frame_duration, speed) for _ in range(streams)))
+
+
+@click.command()
+@click.option(
+    "--media",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    required=True,
+    help="Media file replayed as the live audio.",
+)
+@click.option("--url", type=str, default=None, help="WebSocket URL of a running streaming worker (started otherwise).")
+@click.option("--model", "model_name", type=str, default="base", help="Model of the started streaming worker.")
+@click.option("--streams", type=str, default="1,2,4", help="Comma separated numbers of the concurrent streams.")
+@click.option("--max-streams", type=int, default=4, help="Max concurrent streams of the started streaming worker.")
+@click.option("--duration", type=float, default=60, help="Max duration of the replayed audio in seconds.")
+@click.option("--frame-ms", type=float, default=100, help="Duration of the audio frames in milliseconds.")
+@click.option("--speed", type=float, default=1.0, help="Replay speed, relative to the real time.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    media: Path,
+    url: Optional[str],
+    model_name: str,
+    streams: str,
+    max_streams: int,
+    duration: float,
+    frame_ms: float,
+    speed: float,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Measure the end-to-end latency of the live streaming transcription, replaying a local media file in real time.
+    """
+    audio = decode_audio(media, duration=duration)
+    pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2").tobytes()
+    audio_duration = len(audio) / SAMPLE_RATE
+
+    worker_process = None
+    try:
+        if url is None:
+            port = get_free_port()
+            worker_process = _start_streaming_worker(port, model_name, max_streams)
+            url = f"ws://127.0.0.1:{port}/stream"
+
+        runs = []
+        for streams_count in (int(streams_count) for streams_count in streams.split(",")):
+            started_at = time.perf_counter()
+            results = asyncio.run(_run_streams(url, pcm, streams_count, frame_ms / 1000, speed))
+            served_results = [result for result in results if result is not None]
+            run: Dict[str, object] = {
+                "streams": streams_count,
+                "rejected_streams": len(results) - len(served_results),
+                "wall_time_s": time.perf_counter() - started_at,
+            }
+            if served_results:
+                final_latencies = [d for result in served_results for d in result["final_latencies"]]
+                interim_latencies = [d for result in served_results for d in result["interim_latencies"]]
+                run.update(
+                    final_word_latency=summarize(final_latencies) if final_latencies else None,
+                    interim_latency=summarize(interim_latencies) if interim_latencies else None,
+                    end_latency=summarize([result["end_latency"] for result in served_results]),
+                    max_replay_lag_ms=max(result["max_lag"] for result in served_results) * 1000,
+                    text=served_results[0]["text"],
+                )
+            runs.append(run)
+            if run.get("final_word_latency") is not None:
+                click.echo(
+                    f"{streams_count:>3} streams: final word p50 {run['final_word_latency']['p50_ms']:.0f} ms, "
+                    f"p99 {run['final_word_latency']['p99_ms']:.0f} ms, end {run['end_latency']['max_ms']:.0f} ms, "
+                    f"replay lag {run['max_replay_lag_ms']:.0f} ms, {run['rejected_streams']} rejected"
+                )
+    finally:
+        if worker_process is not None:
+            worker_process.terminate()
+            worker_process.wait()
+
+    results = {
+        "benchmark": "streaming_latency",
+        "media": str(media),
+        "audio_duration_s": audio_duration,
+        "model": model_name if worker_process is not None else None,
+        "frame_ms": frame_ms,
+        "speed": speed,
+        "runs": runs,
+    }
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Benchmark of the upload path – concurrent clients uploading synthetic media files (generated with ffmpeg) to a single
+uvicorn worker, one file per `/upload` request or `--batch-sizes` files per `/upload/batch` request, reporting the
+uploads and the megabytes per second and the latency percentiles of the requests.
+
+The API runs in a subprocess against the Redis under `--redis-url`, or against a TCP fakeredis server started by the
+benchmark. No workers run, so the uploads stay queued – the admission control (`ADMISSION_MAX_BACKLOG_WAIT`) is
+disabled for the API of the benchmark.
+"""
+import asyncio
+import itertools
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import click
+import httpx
+from _common import (
+    REPO_DIR,
+    WORK_DIR,
+    generate_media_fixture,
+    get_free_port,
+    get_service_env,
+    start_api,
+    start_fake_redis_server,
+    summarize,
+    wait_for_redis,
+    write_results,
+)
+from redis import Redis
+
+
+async def _upload(client: httpx.AsyncClient, content: bytes, suffix: str, filenames: itertools.count, batch_size: int) -> None:
+    names = [f"upload_{next(filenames):08d}{suffix}" for _ in range(batch_size)]
+    files = [("file", (name, content)) for name in names]
+    response = await client.post("/upload/batch" if batch_size > 1 else "/upload", files=files)
+    response.raise_for_status()
+
+
+async def _run_uploads(
+    base_url: str, content: bytes, suffix: str, uploads: int, concurrency: int, batch_size: int, filenames: itertools.count
+) -> Dict[str, object]:
+    durations: List[float] = []
+    errors = 0
+    requests = iter(range(0, uploads, batch_size))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+
+        async def run_client() -> None:
+            nonlocal errors
+            for offset in requests:
+                request_started_at = time.perf_counter()
+                try:
+                    await _upload(client, content, suffix, filenames, min(batch_size, uploads - offset))
+                    durations.append(time.perf_counter() - request_started_at)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started_at = time.perf_counter()
+        await asyncio.gather(*(run_client() for _ in range(concurrency)))
+        wall_time = time.perf_counter() - started_at
+    uploaded = uploads - errors * batch_size
+    return {
+        "wall_time_s": wall_time,
+        "uploads_per_second": uploaded / wall_time,
+        "mb_per_second": uploaded * len(content) / 2**20 / wall_time,
+        "errors": errors,
+        "requests": summarize(durations) if durations else None,
+    }
+
+
+@click.command()
+@click.option("--redis-url", type=str, default=None, help="Redis to use (a dedicated DB), defaults to TCP fakeredis.")
+@click.option(
+    "--app-dir",
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    default=REPO_DIR,
+    help="Checkout of the service to run (the current one by default).",
+)
+@click.option("--uploads", type=int, default=500, help="Number of the files uploaded by every run.")
+@click.option("--concurrency", type=str, default="1,8,32", help="Comma separated numbers of the concurrent clients.")
+@click.option(
+    "--batch-sizes", type=str, default="1,50", help="Comma separated numbers of the files per request (1 – `/upload`)."
+)
+@click.option("--duration", type=float, default=60, help="Duration of the uploaded media file in seconds.")
+@click.option("--video/--audio", default=False, help="Type of the uploaded media file.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    redis_url: Optional[str],
+    app_dir: Path,
+    uploads: int,
+    concurrency: str,
+    batch_sizes: str,
+    duration: float,
+    video: bool,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Measure the upload throughput (single and batch uploads) under growing numbers of concurrent clients.
+    """
+    # Every request would be logged otherwise.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    fixture_path = WORK_DIR / ("upload_fixture.mp4" if video else "upload_fixture.mp3")
+    generate_media_fixture(fixture_path, duration, video)
+    content = fixture_path.read_bytes()
+
+    fake_redis_process = None
+    if redis_url is None:
+        fake_redis_process, redis_url = start_fake_redis_server()
+
+    api_process = None
+    try:
+        redis_conn = Redis.from_url(redis_url)
+        wait_for_redis(redis_conn)
+        redis_conn.flushdb()
+        api_port = get_free_port()
+        env = get_service_env(redis_url, app_dir, fake_redis_process is not None, ADMISSION_MAX_BACKLOG_WAIT="0")
+        api_process = start_api(env, api_port, cwd=app_dir)
+
+        # The file names (so the reference IDs) are unique across the runs.
+        filenames = itertools.count()
+        runs = []
+        for batch_size in (int(batch_size) for batch_size in batch_sizes.split(",")):
+            for clients in (int(clients) for clients in concurrency.split(",")):
+                run = {
+                    "batch_size": batch_size,
+                    "concurrency": clients,
+                    **asyncio.run(
+                        _run_uploads(
+                            f"http://127.0.0.1:{api_port}",
+                            content,
+                            fixture_path.suffix,
+                            uploads,
+                            clients,
+                            batch_size,
+                            filenames,
+                        )
+                    ),
+                }
+                runs.append(run)
+                click.echo(
+                    f"batches of {batch_size:>4}, {clients:>4} clients: {run['uploads_per_second']:.1f} uploads/s, "
+                    f"{run['mb_per_second']:.1f} MB/s, {run['errors']} errors"
+                    + (
+                        f", request p50 {run['requests']['p50_ms']:.1f} ms, p99 {run['requests']['p99_ms']:.1f} ms"
+                        if run["requests"]
+                        else ""
+                    )
+                )
+    finally:
+        if api_process is not None:
+            api_process.terminate()
+            api_process.wait()
+        if fake_redis_process is not None:
+            fake_redis_process.terminate()
+
+    results = {
+        "benchmark": "upload",
+        "app_dir": str(app_dir),
+        "media_duration_s": duration,
+        "is_video": video,
+        "file_size_mb": len(content) / 2**20,
+        "uploads": uploads,
+        "runs": runs,
+    }
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Benchmark of the worker pool (workers forked from a process with the preloaded model, sharing it copy-on-write) vs.
+the same number of separate workers, each loading its own copy of the model.
+
+Workers transcribe the same (generated) audio clip a given number of times – without Redis, the queueing overhead is
+the same for both modes. Memory is measured as the total PSS (proportional set size, i.e. shared pages are split
+between the processes sharing them) of all the processes, once the models are loaded and once the work is done.
+"""
+import gc
+import multiprocessing
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import click
+import ffmpeg
+import torch
+import whisper
+from _common import WORK_DIR, write_results
+
+from transcription_service import transcription
+from transcription_service.audio import decode_audio
+from transcription_service.model_cache import ModelCache
+
+# Dimensions of the smallest models, so the benchmark can be run offline (without downloading the checkpoints) with
+# random weights – the memory footprint and the inference cost are the same, only the transcriptions are garbage.
+RANDOM_WEIGHTS_MODELS_DIMS = {
+    "tiny": dict(n_audio_state=384, n_audio_head=6, n_audio_layer=4, n_text_state=384, n_text_head=6, n_text_layer=4),
+    "base": dict(n_audio_state=512, n_audio_head=8, n_audio_layer=6, n_text_state=512, n_text_head=8, n_text_layer=6),
+}
+
+
+def _load_model(model_name: str, random_weights: bool) -> None:
+    if random_weights:
+        dims = whisper.model.ModelDimensions(
+            n_mels=80, n_audio_ctx=1500, n_vocab=51865, n_text_ctx=448, **RANDOM_WEIGHTS_MODELS_DIMS[model_name]
+        )
+        transcription.MODEL_CACHE = ModelCache("cpu", 0)
+        transcription.MODEL_CACHE.put(model_name, whisper.model.Whisper(dims).eval())
+    else:
+        transcription.init_whisper_model(model_name, "cpu")
+
+
+def _pss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _run_worker(
+    load_model: bool,
+    model_name: str,
+    random_weights: bool,
+    torch_threads: int,
+    audio_path: Path,
+    jobs: int,
+    ready_queue,
+    start_event,
+    exit_event,
+) -> None:
+    if load_model:
+        _load_model(model_name, random_weights)
+    torch.set_num_threads(torch_threads)
+    audio = decode_audio(audio_path)
+    ready_queue.put(None)
+
+    start_event.wait()
+    for _ in range(jobs):
+        transcription._transcribe_audio(audio, False, model_name=model_name)
+    ready_queue.put(None)
+    exit_event.wait()
+
+
+def _run_mode(
+    mode: str, workers: int, torch_threads: int, model_name: str, random_weights: bool, audio_path: Path, jobs: int
+) -> dict:
+    if mode == "pool":
+        # The same as in the worker's entrypoint – the model is loaded once and inherited by the forked workers.
+        _load_model(model_name, random_weights)
+        gc.freeze()
+    context = multiprocessing.get_context("fork" if mode == "pool" else "spawn")
+    ready_queue, start_event, exit_event = context.Queue(), context.Event(), context.Event()
+
+    load_start = time.perf_counter()
+    processes: List[multiprocessing.Process] = [
+        context.Process(
+            target=_run_worker,
+            args=(
+                mode == "separate",
+                model_name,
+                random_weights,
+                torch_threads,
+                audio_path,
+                jobs,
+                ready_queue,
+                start_event,
+                exit_event,
+            ),
+        )
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for _ in processes:
+        ready_queue.get()
+    startup_time = time.perf_counter() - load_start
+    pids = [multiprocessing.current_process().pid] + [process.pid for process in processes]
+    loaded_pss_mb = sum(_pss_mb(pid) for pid in pids)
+
+    work_start = time.perf_counter()
+    start_event.set()
+    for _ in processes:
+        ready_queue.get()
+    work_time = time.perf_counter() - work_start
+    done_pss_mb = sum(_pss_mb(pid) for pid in pids)
+
+    exit_event.set()
+    for process in processes:
+        process.join()
+    if mode == "pool":
+        gc.unfreeze()
+        transcription.MODEL_CACHE = None
+        gc.collect()
+
+    return {
+        "workers_startup_s": startup_time,
+        "total_pss_loaded_mb": loaded_pss_mb,
+        "total_pss_after_work_mb": done_pss_mb,
+        "work_time_s": work_time,
+        "jobs_per_second": workers * jobs / work_time,
+    }
+
+
+@click.command()
+@click.option("--workers", type=int, default=4)
+@click.option("--torch-threads", type=int, default=1, help="Torch threads of every worker.")
+@click.option("--model-name", default="tiny")
+@click.option("--random-weights", is_flag=True, help=f"Random weights (offline) – {', '.join(RANDOM_WEIGHTS_MODELS_DIMS)}.")
+@click.option("--clip-duration", type=float, default=10, help="Duration of the transcribed clip in seconds.")
+@click.option("--jobs", type=int, default=3, help="Number of the clips transcribed by every worker.")
+@click.option("--output-json", type=click.Path(dir_okay=False, path_type=Path), default=None)
+def main(
+    workers: int,
+    torch_threads: int,
+    model_name: str,
+    random_weights: bool,
+    clip_duration: float,
+    jobs: int,
+    output_json: Optional[Path],
+) -> None:
+    """
+    Compare the memory and the throughput of N forked workers sharing the model with N separate workers.
+    """
+    audio_path = WORK_DIR / "clip.wav"
+    stream = ffmpeg.input(f"sine=frequency=440:duration={clip_duration}", f="lavfi").output(str(audio_path))
+    ffmpeg.run(stream.overwrite_output(), capture_stdout=True, capture_stderr=True)
+
+    results = {
+        "benchmark": "worker_pool",
+        "workers": workers,
+        "torch_threads": torch_threads,
+        "model_name": model_name,
+        "random_weights": random_weights,
+        "modes": {},
+    }
+    for mode in ("separate", "pool"):
+        result = _run_mode(mode, workers, torch_threads, model_name, random_weights, audio_path, jobs)
+        results["modes"][mode] = result
+        click.echo(
+            f"{mode:>8}: total PSS {result['total_pss_loaded_mb']:.0f} MB loaded / "
+            f"{result['total_pss_after_work_mb']:.0f} MB after work, {result['jobs_per_second']:.2f} jobs/s, "
+            f"workers ready in {result['workers_startup_s']:.1f} s"
+        )
+
+    write_results(results, output_json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Runner of the benchmark suite – every benchmark of the preset runs in its own process (offline, on a single machine,
+against fakeredis and with the stub or random-weights models unless `--checkpoint-models`), and their results are
+collected into a single `summary.json` along with the commit and the machine they ran on, so the runs of different
+commits can be compared (`--baseline` prints the changes against the summary of a previous run).
+
+`benchmark_streaming_latency.py` is not a part of the suite – it needs a recording of speech and a real model.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import click
+from _common import REPO_DIR
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+# Arguments of every benchmark of the presets – the quick one runs in minutes, the full one at the scale of production.
+PRESETS: Dict[str, Dict[str, List[str]]] = {
+    "quick": {
+        "reference_lookup": ["--sizes", "100,1000,10000", "--repeats", "20"],
+        "queue_wait": ["--jobs", "2000"],
+        "audio_decode": ["--duration", "600", "--repeats", "1"],
+        "api_load": ["--uploads", "1000,10000", "--concurrency", "1,16", "--duration", "5", "--warmup", "1"],
+        "upload": ["--uploads", "100", "--concurrency", "1,8", "--batch-sizes", "1,20", "--duration", "10"],
+        "end_to_end": ["--workers", "1,2", "--jobs", "20", "--clip-duration", "10"],
+    },
+    "full": {
+        "reference_lookup": ["--sizes", "100,1000,10000,100000"],
+        "queue_wait": [],
+        "audio_decode": [],
+        "api_load": ["--uploads", "1000,10000,100000"],
+        "upload": [],
+        "end_to_end": ["--workers", "1,2,4", "--jobs", "200"],
+        "worker_pool": [],
+        "model_load": [],
+        "quantization": ["--model-name", "tiny"],
+    },
+}
+# Benchmarks of the model itself, run with random weights unless `--checkpoint-models`.
+MODEL_BENCHMARKS = ["worker_pool", "model_load", "quantization"]
+# Numeric results compared with the baseline, by the suffix of their keys.
+COMPARED_KEYS_SUFFIXES = ("_ms", "_s", "_mb", "per_second", "per_minute")
+
+
+def _get_git_info() -> Dict[str, object]:
+    def git(*args: str) -> str:
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+
+    return {"commit": git("rev-parse", "HEAD") or None, "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def _get_machine_info() -> Dict[str, object]:
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "memory_mb": os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**20,
+    }
+
+
+def _get_benchmark_args(name: str, preset: str, checkpoint_models: bool) -> List[str]:
+    args = list(PRESETS[preset][name])
+    if name in MODEL_BENCHMARKS and not checkpoint_models:
+        args.append("--random-weights")
+    if name == "end_to_end" and checkpoint_models:
+        args.extend(["--model-backend", "checkpoint"])
+    return args
+
+
+def _run_benchmark(name: str, args: List[str], output_dir: Path) -> Dict[str, object]:
+    output_path = output_dir / f"{name}.json"
+    started_at = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, str(BENCHMARKS_DIR / f"benchmark_{name}.py"), *args, "--output-json", str(output_path)],
+        cwd=REPO_DIR,
+        env={**os.environ, "PYTHONPATH": str(REPO_DIR)},
+    )
+    return {
+        "args": args,
+        "returncode": process.returncode,
+        "duration_s": time.perf_counter() - started_at,
+        "results": json.loads(output_path.read_text(encoding="utf-8")) if process.returncode == 0 else None,
+    }
+
+
+def _iter_compared_values(value: object, path: str = "") -> Iterator[Tuple[str, float]]:
+    """Iterate over the compared numeric results (see `COMPARED_KEYS_SUFFIXES`), under their paths."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            item_path = f"{path}.{key}" if path else key
+            if isinstance(item, (int, float)) and not isinstance(item, bool):
+                if key.endswith(COMPARED_KEYS_SUFFIXES):
+                    yield item_path, item
+            else:
+                yield from _iter_compared_values(item, item_path)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from _iter_compared_values(item, f"{path}[{i}]")
+
+
+def _compare(summary: dict, baseline: dict) -> None:
+    click.echo(f"\nChanges against {baseline['git']['commit']} (from {baseline['started_at']}):")
+    for name, benchmark in summary["benchmarks"].items():
+        baseline_benchmark = baseline["benchmarks"].get(name)
+        if not benchmark["results"] or not baseline_benchmark or not baseline_benchmark["results"]:
+            continue
+        if benchmark["args"] != baseline_benchmark["args"]:
+            click.echo(f"{name}: skipped, run with different arguments")
+            continue
+        baseline_values = dict(_iter_compared_values(baseline_benchmark["results"]))
+        for path, value in _iter_compared_values(benchmark["results"]):
+            baseline_value = baseline_values.get(path)
+            if baseline_value:
+                click.echo(f"{name}.{path}: {baseline_value:.4g} -> {value:.4g} ({(value / baseline_value - 1) * 100:+.1f}%)")
+
+
+@click.command()
+@click.option("--preset", type=click.Choice(list(PRESETS)), default="quick")
+@click.option("--only", type=str, default=None, help="Comma separated names of the benchmarks to run (of the preset).")
+@click.option(
+    "--checkpoint-models",
+    is_flag=True,
+    help="Run the model benchmarks and the workers with the real models (their checkpoints have to be downloaded).",
+)
+@click.option(
+    "--output-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    default=None,
+    help="Directory of the results (benchmark-results/<timestamp>_<commit> by default).",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="summary.json of a previous run to compare with.",
+)
+def main(
+    preset: str, only: Optional[str], checkpoint_models: bool, output_dir: Optional[Path], baseline: Optional[Path]
+) -> None:
+    """
+    Run the benchmark suite and save the results of all the benchmarks as a single JSON summary.
+    """
+    names = list(PRESETS[preset])
+    if only is not None:
+        names = [name for name in map(str.strip, only.split(",")) if name]
+        unknown_names = [name for name in names if name not in PRESETS[preset]]
+        if unknown_names:
+            raise click.UsageError(f"Unknown benchmarks of the {preset} preset: {', '.join(unknown_names)}")
+
+    git_info = _get_git_info()
+    started_at = datetime.now(timezone.utc)
+    if output_dir is None:
+        output_dir = REPO_DIR / "benchmark-results" / f"{started_at:%Y%m%dT%H%M%S}_{(git_info['commit'] or 'unknown')[:12]}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary_path = output_dir / "summary.json"
+
+    summary = {
+        "preset": preset,
+        "checkpoint_models": checkpoint_models,
+        "started_at": started_at.isoformat(),
+        "git": git_info,
+        "machine": _get_machine_info(),
+        "benchmarks": {},
+    }
+    for name in names:
+        click.echo(f"Running {name}...")
+        summary["benchmarks"][name] = _run_benchmark(name, _get_benchmark_args(name, preset, checkpoint_models), output_dir)
+        # Saved after every benchmark, so the results of the finished ones are kept even if the suite is interrupted.
+        summary_path.write_text(json.dumps(summary, indent=4), encoding="utf-8")
+
+    failed_names = [name for name, benchmark in summary["benchmarks"].items() if benchmark["returncode"] != 0]
+    click.echo(f"\nSummary saved to {summary_path}")
+    if baseline is not None:
+        _compare(summary, json.loads(baseline.read_text(encoding="utf-8")))
+    if failed_names:
+        raise click.ClickException(f"Failed benchmarks: {', '.join(failed_names)}")
+
+
+if __name__ == "__main__":
+    main()
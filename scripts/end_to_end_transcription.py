@@ -1,11 +1,27 @@
+import glob
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from urllib.parse import parse_qs, urlparse
 
 import click
 import requests
 import yt_dlp
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Extensions of the media accepted by the API.
+MEDIA_SUFFIXES = (".mp4", ".mov", ".avi", ".mkv", ".mp3", ".wav", ".flac")
+# Max size of the files of a single batch form – larger files are uploaded in resumable chunks instead.
+BATCH_FORM_MAX_SIZE = 64 * 1024 * 1024
+# Max number of the reference IDs of a status request (the default limit of the service).
+STATUS_BATCH_MAX_SIZE = 10000
+# Progress of a batch run, in its output directory.
+BATCH_STATE_FILENAME = ".batch_state.json"
 
 
 def is_youtube_url(url: str) -> bool:
@@ -89,6 +105,104 @@ def upload_file(api_url: str, file_path: Path, data: Optional[dict] = None) -> s
         raise Exception(f"Upload failed: {e}")
 
 
+def upload_to_session(
+    api_url: str,
+    file_path: Path,
+    data: Optional[dict] = None,
+    chunk_size: int = 16 * 1024 * 1024,
+    max_retries: int = 5,
+    session_id: Optional[str] = None,
+    http: Optional[requests.Session] = None,
+    on_session_created: Optional[Callable[[str], None]] = None,
+) -> str:
+    """
+    Upload a file to a resumable upload session in chunks, without finalizing it – a failed chunk is retried from the
+    data the API already received, rather than uploading the whole file again.
+
+    Args:
+        api_url: The base URL of the API.
+        file_path: The path to the file to upload.
+        data: Optional metadata to send with the request.
+        chunk_size: Size of the chunks in bytes.
+        max_retries: Number of consecutive failures of a chunk before giving up.
+        session_id: The session to continue (e.g. of an interrupted run), a new one is created if not given (or it
+            expired).
+        http: The HTTP session (connection pool) to use.
+        on_session_created: Called with the ID of the new session, before anything is uploaded to it.
+
+    Returns:
+        str: The ID of the upload session, with all the file received.
+    """
+    http = http or requests.Session()
+    size = file_path.stat().st_size
+    offset = None
+    if session_id is not None:
+        response = http.get(f"{api_url}/upload/sessions/{session_id}", timeout=(10, 60))
+        if response.status_code == 200:
+            offset = response.json()["offset"]
+        elif response.status_code != 404:
+            response.raise_for_status()
+    if offset is None:
+        response = http.post(f"{api_url}/upload/sessions", json={"filename": file_path.name, "size": size, **(data or {})})
+        response.raise_for_status()
+        session_id, offset = response.json()["session_id"], 0
+        if on_session_created is not None:
+            on_session_created(session_id)
+    session_url = f"{api_url}/upload/sessions/{session_id}"
+
+    retries = 0
+    with open(file_path, "rb") as f:
+        while offset < size:
+            f.seek(offset)
+            chunk = f.read(chunk_size)
+            try:
+                response = http.patch(
+                    session_url,
+                    data=chunk,
+                    headers={"Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{size}"},
+                    timeout=(10, 300),
+                )
+                response.raise_for_status()
+                offset, retries = response.json()["offset"], 0
+            except requests.exceptions.RequestException as e:
+                retries += 1
+                if retries > max_retries:
+                    raise
+                print(f"Chunk upload of {file_path.name} failed ({e}), resuming...")
+                time.sleep(min(2**retries, 30))
+                # Continue from what the API received, whatever part of the chunk it was.
+                response = http.get(session_url, timeout=(10, 60))
+                response.raise_for_status()
+                offset = response.json()["offset"]
+            print(f"Uploaded {offset} of {size} bytes of {file_path.name}")
+    return session_id
+
+
+def upload_file_resumable(
+    api_url: str, file_path: Path, data: Optional[dict] = None, chunk_size: int = 16 * 1024 * 1024, max_retries: int = 5
+) -> str:
+    """
+    Upload a file to the transcription service API in resumable chunks (see `upload_to_session`).
+
+    Args:
+        api_url: The base URL of the API.
+        file_path: The path to the file to upload.
+        data: Optional metadata to send with the request.
+        chunk_size: Size of the chunks in bytes.
+        max_retries: Number of consecutive failures of a chunk before giving up.
+
+    Returns:
+        str: The reference ID from the API.
+    """
+    try:
+        session_id = upload_to_session(api_url, file_path, data, chunk_size, max_retries)
+        response = requests.post(f"{api_url}/upload/sessions/{session_id}/finalize")
+        response.raise_for_status()
+        return response.json()["reference_id"]
+    except requests.exceptions.RequestException as e:
+        raise Exception(f"Upload failed: {e}")
+
+
 def check_status(api_url: str, reference_id: str) -> Optional[str]:
     """
     Check the status of a transcription request.
@@ -109,6 +223,45 @@ def check_status(api_url: str, reference_id: str) -> Optional[str]:
         raise Exception(f"Failed to check status: {e}")
 
 
+def wait_for_final_status(api_url: str, reference_id: str) -> Optional[str]:
+    """
+    Wait for the transcription to finish, listening to the status events streamed by the API (server-sent events).
+
+    Args:
+        api_url: The base URL of the API.
+        reference_id: The reference ID of the transcription request.
+
+    Returns:
+        Optional[str]: The final status of the transcription, or None if the events stream is not available or was
+        interrupted (the status should be polled then).
+    """
+    try:
+        # The stream sends at least a keep-alive comment every 15 seconds.
+        with requests.get(f"{api_url}/events/{reference_id}", stream=True, timeout=(10, 60)) as response:
+            if response.status_code != 200:
+                return None
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                status = json.loads(line[len("data:") :])["status"]
+                print(f"Current status: {status}")
+                if status in ["COMPLETED", "FAILED", "UNKNOWN"]:
+                    return status
+    except requests.exceptions.RequestException as e:
+        print(f"Status events stream interrupted: {e}")
+    return None
+
+
+def _download_result(http: requests.Session, api_url: str, reference_id: str, output_path: Path) -> None:
+    response = http.get(f"{api_url}/download/{reference_id}", timeout=(10, 300))
+    response.raise_for_status()
+    # Written to a temporary file first, so an interrupted download is not mistaken for a finished one.
+    temporary_path = output_path.with_name(f".{output_path.name}.tmp")
+    with open(temporary_path, "wb") as f:
+        f.write(response.content)
+    os.replace(temporary_path, output_path)
+
+
 def download_transcription(api_url: str, reference_id: str, output_path: Path) -> None:
     """
     Download the transcription result from the API.
@@ -122,36 +275,307 @@ def download_transcription(api_url: str, reference_id: str, output_path: Path) -
         Exception: If the download fails.
     """
     try:
-        response = requests.get(f"{api_url}/download/{reference_id}")
-        response.raise_for_status()
-
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-
+        _download_result(requests.Session(), api_url, reference_id, output_path)
         print(f"Transcription downloaded to {output_path}")
     except requests.exceptions.RequestException as e:
         raise Exception(f"Download failed: {e}")
 
 
+def collect_batch_files(input_source: str) -> Tuple[List[Path], Path]:
+    """
+    Collect the media files of a batch – of a directory (recursively), or matching a glob pattern.
+
+    Args:
+        input_source: The directory, or the glob pattern.
+
+    Returns:
+        Tuple[List[Path], Path]: The files (sorted), and the directory their output paths are relative to.
+    """
+    if Path(input_source).is_dir():
+        base_dir = Path(input_source)
+        paths = list(base_dir.rglob("*"))
+    else:
+        paths = [Path(path) for path in glob.glob(input_source, recursive=True)]
+        base_dir = Path(os.path.commonpath([path.parent for path in paths])) if paths else Path.cwd()
+    return sorted(path for path in paths if path.is_file() and path.suffix.lower() in MEDIA_SUFFIXES), base_dir
+
+
+class BatchState:
+    """
+    Progress of a batch run, saved along its outputs to resume the run when interrupted – the reference IDs (and the
+    batches) of the submitted files, the upload sessions of the ones being uploaded in chunks, and the failed ones.
+    The downloaded files are the ones whose output exists.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.files: Dict[str, dict] = json.loads(path.read_text())["files"] if path.exists() else {}
+
+    def get(self, file_path: Path) -> dict:
+        return self.files.get(str(file_path), {})
+
+    def update(self, updates: Dict[Path, dict]) -> None:
+        with self._lock:
+            for file_path, fields in updates.items():
+                self.files.setdefault(str(file_path), {}).update(fields)
+            temporary_path = self.path.with_name(f".{self.path.name}.tmp")
+            temporary_path.write_text(json.dumps({"files": self.files}))
+            os.replace(temporary_path, self.path)
+
+
+def _has_file_name(file_paths: List[Path], name: str) -> bool:
+    return any(file_path.name == name for file_path in file_paths)
+
+
+def _group_files(file_paths: List[Path], batch_size: int, max_size: int) -> Iterator[List[Path]]:
+    """
+    Group the files into batches of at most `batch_size` files and `max_size` bytes (unless a file is larger). The files
+    of a batch have distinct names – the service derives the reference IDs from them, rejecting the batches repeating
+    a name (e.g. of the files in different subdirectories).
+    """
+    group: List[Path] = []
+    group_size = 0
+    for file_path in file_paths:
+        size = file_path.stat().st_size
+        if group and (len(group) >= batch_size or group_size + size > max_size or _has_file_name(group, file_path.name)):
+            yield group
+            group, group_size = [], 0
+        group.append(file_path)
+        group_size += size
+    if group:
+        yield group
+
+
+def _post_batch(http: requests.Session, api_url: str, **kwargs) -> dict:
+    """Submit a batch – while the service rejects it due to its backlog (429), it's retried after `Retry-After`."""
+    while True:
+        response = http.post(f"{api_url}/upload/batch", timeout=(10, 600), **kwargs)
+        if response.status_code != 429:
+            response.raise_for_status()
+            return response.json()
+        retry_after = int(response.headers.get("Retry-After", 60))
+        print(f"The service is busy, submitting the batch again in {retry_after}s...")
+        time.sleep(retry_after)
+
+
+def submit_files_batch(http: requests.Session, api_url: str, file_paths: List[Path], data: dict, state: BatchState) -> None:
+    """Upload the (small) files in a single batch form."""
+    files = [("file", (file_path.name, file_path.read_bytes())) for file_path in file_paths]
+    batch = _post_batch(http, api_url, files=files, data=data)
+    state.update(
+        {
+            file_path: {"reference_id": item["reference_id"], "batch_id": batch["batch_id"]}
+            for file_path, item in zip(file_paths, batch["items"])
+        }
+    )
+    print(f"Submitted a batch of {len(file_paths)} files: {batch['batch_id']}")
+
+
+def submit_sessions_batch(http: requests.Session, api_url: str, file_paths: List[Path], state: BatchState) -> None:
+    """Finalize the upload sessions of the (large) files, uploaded in chunks, in a single batch manifest."""
+    batch = _post_batch(http, api_url, json={"session_ids": [state.get(file_path)["session_id"] for file_path in file_paths]})
+    state.update(
+        {
+            file_path: {"reference_id": item["reference_id"], "batch_id": batch["batch_id"]}
+            for file_path, item in zip(file_paths, batch["items"])
+        }
+    )
+    print(f"Submitted a batch of {len(file_paths)} uploaded files: {batch['batch_id']}")
+
+
+def _get_statuses(http: requests.Session, api_url: str, reference_ids: List[str]) -> Dict[str, dict]:
+    """Get the statuses of the uploads, by reference ID – the ones not found are missing."""
+    statuses = {}
+    for offset in range(0, len(reference_ids), STATUS_BATCH_MAX_SIZE):
+        response = http.post(
+            f"{api_url}/status/batch",
+            json={"reference_ids": reference_ids[offset : offset + STATUS_BATCH_MAX_SIZE]},
+            timeout=(10, 60),
+        )
+        response.raise_for_status()
+        statuses.update({item["reference_id"]: item for item in response.json()["items"]})
+    return statuses
+
+
+def run_batch(
+    api_url: str,
+    input_source: str,
+    output_dir: Path,
+    data: dict,
+    batch_size: int,
+    concurrency: int,
+    chunk_size: int,
+    poll_interval: float,
+) -> None:
+    """
+    Transcribe all the media files of a directory (or matching a glob pattern) – the files are submitted in batches,
+    by `concurrency` parallel uploads over pooled connections, and their transcriptions are downloaded to the output
+    directory (as `<file name>.txt`, keeping the directory structure) as they are completed. An interrupted run
+    continues where it stopped, when run again with the same output directory.
+    """
+    file_paths, base_dir = collect_batch_files(input_source)
+    if not file_paths:
+        raise click.ClickException(f"No media files found in {input_source}.")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_paths = {
+        file_path: output_dir / file_path.relative_to(base_dir).parent / f"{file_path.name}.txt" for file_path in file_paths
+    }
+    for output_path in output_paths.values():
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+    state = BatchState(output_dir / BATCH_STATE_FILENAME)
+
+    http = requests.Session()
+    # The reads are retried on the transient failures, the submissions are not (their state is checked instead).
+    adapter = HTTPAdapter(
+        pool_maxsize=concurrency,
+        max_retries=Retry(total=5, backoff_factor=1, status_forcelist=(502, 503, 504), allowed_methods=("GET",)),
+    )
+    http.mount("http://", adapter)
+    http.mount("https://", adapter)
+
+    pending = [
+        file_path
+        for file_path in file_paths
+        if "reference_id" not in state.get(file_path) and not output_paths[file_path].exists()
+    ]
+    print(f"Found {len(file_paths)} files, {len(file_paths) - len(pending)} of them already submitted")
+    small_files = [file_path for file_path in pending if file_path.stat().st_size <= chunk_size]
+    large_files = [file_path for file_path in pending if file_path.stat().st_size > chunk_size]
+
+    def upload_large_file(file_path: Path) -> None:
+        upload_to_session(
+            api_url,
+            file_path,
+            data,
+            chunk_size,
+            session_id=state.get(file_path).get("session_id"),
+            http=http,
+            on_session_created=lambda session_id: state.update({file_path: {"session_id": session_id}}),
+        )
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        files_batches = [
+            executor.submit(submit_files_batch, http, api_url, group, data, state)
+            for group in _group_files(small_files, batch_size, BATCH_FORM_MAX_SIZE)
+        ]
+        # The large files are uploaded in resumable chunks, and finalized in batches as they are uploaded.
+        uploads = {executor.submit(upload_large_file, file_path): file_path for file_path in large_files}
+        uploaded: List[Path] = []
+        for upload in as_completed(uploads):
+            upload.result()
+            # Finalized in separate batches, as the names of the files of a batch have to be distinct.
+            if _has_file_name(uploaded, uploads[upload].name):
+                submit_sessions_batch(http, api_url, uploaded, state)
+                uploaded = []
+            uploaded.append(uploads[upload])
+            if len(uploaded) >= batch_size:
+                submit_sessions_batch(http, api_url, uploaded, state)
+                uploaded = []
+        if uploaded:
+            submit_sessions_batch(http, api_url, uploaded, state)
+        for files_batch in files_batches:
+            files_batch.result()
+
+        while True:
+            remaining = [
+                file_path
+                for file_path in file_paths
+                if not output_paths[file_path].exists() and state.get(file_path).get("status") != "FAILED"
+            ]
+            if not remaining:
+                break
+            statuses = _get_statuses(http, api_url, [state.get(file_path)["reference_id"] for file_path in remaining])
+            completed, failed = [], {}
+            for file_path in remaining:
+                status = statuses.get(state.get(file_path)["reference_id"], {"status": "UNKNOWN", "error_message": None})
+                if status["status"] == "COMPLETED":
+                    completed.append(file_path)
+                elif status["status"] in ("FAILED", "UNKNOWN"):
+                    failed[file_path] = {"status": "FAILED", "error_message": status["error_message"]}
+            for download in [
+                executor.submit(_download_result, http, api_url, state.get(file_path)["reference_id"], output_paths[file_path])
+                for file_path in completed
+            ]:
+                download.result()
+            if failed:
+                state.update(failed)
+            print(
+                f"Downloaded {sum(output_path.exists() for output_path in output_paths.values())} of {len(file_paths)} "
+                f"transcriptions, {len(remaining) - len(completed) - len(failed)} in progress, "
+                f"{sum(state.get(file_path).get('status') == 'FAILED' for file_path in file_paths)} failed"
+            )
+            if len(completed) + len(failed) < len(remaining):
+                time.sleep(poll_interval)
+
+    failed_files = [file_path for file_path in file_paths if state.get(file_path).get("status") == "FAILED"]
+    for file_path in failed_files:
+        print(f"Transcription of {file_path} failed: {state.get(file_path)['error_message']}")
+    if failed_files:
+        raise click.ClickException(f"{len(failed_files)} of {len(file_paths)} transcriptions failed.")
+    print("Batch transcription completed.")
+
+
 @click.command()
 @click.argument("api_url", type=str)
 @click.argument("input_source", type=str)
-@click.argument("output_path", type=click.Path(dir_okay=False, path_type=Path))
+@click.argument("output_path", type=click.Path(path_type=Path))
 @click.option(
     "--include-word-timestamps",
     is_flag=True,
     help="Return the transcription in rich format, " "including word-level timestamps in the transcription.",
 )
-def main(api_url: str, input_source: str, output_path: Path, include_word_timestamps: bool) -> None:
+@click.option("--model", default=None, help="Whisper model to transcribe with (the service's default one if not given).")
+@click.option(
+    "--chunk-size-mb",
+    type=float,
+    default=None,
+    help="Upload the file in resumable chunks of that size (for large files over unreliable connections). In the "
+    "batch mode, the files larger than that (16 MB by default) are uploaded in chunks.",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Transcribe all the media files of the INPUT_SOURCE directory (or glob pattern) to the OUTPUT_PATH directory.",
+)
+@click.option("--batch-size", type=int, default=100, help="Max number of the files submitted in a single batch.")
+@click.option("--concurrency", type=int, default=4, help="Number of the parallel uploads (and downloads) of the batch.")
+@click.option("--poll-interval", type=float, default=10, help="Interval of checking the batch statuses in seconds.")
+def main(
+    api_url: str,
+    input_source: str,
+    output_path: Path,
+    include_word_timestamps: bool,
+    model: Optional[str],
+    chunk_size_mb: Optional[float],
+    batch: bool,
+    batch_size: int,
+    concurrency: int,
+    poll_interval: float,
+) -> None:
     """
     Transcribe a video file or YouTube video using the transcription service API.
 
     Args:
         api_url: Base URL of the transcription service API.
-        input_source: Path to the input video file or YouTube URL.
-        output_path: Path to save the transcription result.
+        input_source: Path to the input video file or YouTube URL (a directory or a glob pattern in the batch mode).
+        output_path: Path to save the transcription result (the directory of the results in the batch mode).
         include_word_timestamps: Whether to include word-level timestamps in the transcription.
+        model: Whisper model to transcribe with.
+        chunk_size_mb: Size of the resumable upload chunks in MB (the file is uploaded at once if not given).
+        batch: Whether to transcribe many files in batches.
+        batch_size: Max number of the files of a batch.
+        concurrency: Number of the parallel uploads and downloads.
+        poll_interval: Interval of checking the batch statuses in seconds.
     """
+    data = {"include_word_timestamps": include_word_timestamps}
+    if model is not None:
+        data["model"] = model
+    if batch:
+        chunk_size = int((chunk_size_mb or 16) * 1024 * 1024)
+        run_batch(api_url, input_source, output_path, data, batch_size, concurrency, chunk_size, poll_interval)
+        return
+
     youtube_dir = Path.cwd() / "youtube_downloads"
     youtube_dir.mkdir(exist_ok=True)
 
@@ -165,20 +589,24 @@ def main(api_url: str, input_source: str, output_path: Path, include_word_timest
             raise FileNotFoundError(f"Input file not found: {input_file}")
 
     print(f"Uploading file: {input_file}")
-    data = {"include_word_timestamps": include_word_timestamps}
-    reference_id = upload_file(api_url, input_file, data)
+    if chunk_size_mb is not None:
+        reference_id = upload_file_resumable(api_url, input_file, data, chunk_size=int(chunk_size_mb * 1024 * 1024))
+    else:
+        reference_id = upload_file(api_url, input_file, data)
     print(f"File uploaded. Reference ID: {reference_id}")
 
-    while True:
+    status = wait_for_final_status(api_url, reference_id)
+    if status is None:
+        print("Falling back to polling the status...")
+    while status is None:
         status = check_status(api_url, reference_id)
         print(f"Current status: {status}")
+        if status not in ["COMPLETED", "FAILED", "UNKNOWN"]:
+            status = None
+            time.sleep(10)  # Wait for 10 seconds before checking again
 
-        if status == "COMPLETED":
-            break
-        elif status in ["FAILED", "UNKNOWN"]:
-            raise Exception(f"Transcription failed with status: {status}")
-
-        time.sleep(10)  # Wait for 10 seconds before checking again
+    if status in ["FAILED", "UNKNOWN"]:
+        raise Exception(f"Transcription failed with status: {status}")
 
     download_transcription(api_url, reference_id, output_path)
     print("Transcription process completed.")
@@ -0,0 +1,40 @@
+"""
+Pre-convert the whisper models into the memory-mapped model artifacts (in MODEL_ARTIFACTS_DIR), so the workers don't
+convert them on their first start – e.g. when building the worker image or before scaling the workers out:
+```bash
+docker compose run --rm worker python scripts/prewarm_models.py large-v3
+```
+The service configuration (the Redis and the directories environment variables) has to be set, as for the worker.
+"""
+import time
+from typing import Tuple
+
+import click
+
+from transcription_service import config
+from transcription_service.model_artifacts import convert_model_checkpoint, get_model_artifact_path, load_model_artifact
+
+
+@click.command()
+@click.argument("model_names", nargs=-1)
+@click.option("--force", is_flag=True, help="Convert the models even if their artifacts already exist.")
+def main(model_names: Tuple[str, ...], force: bool) -> None:
+    """
+    Convert the given models (all the ones served by the workers by default) and check their load time.
+    """
+    for model_name in model_names or config.WORKER_WHISPER_MODELS:
+        artifact_path = get_model_artifact_path(model_name)
+        if artifact_path.exists() and not force:
+            click.echo(f"{model_name}: {artifact_path} already exists")
+        else:
+            started_at = time.monotonic()
+            convert_model_checkpoint(model_name)
+            click.echo(f"{model_name}: converted to {artifact_path} in {time.monotonic() - started_at:.1f}s")
+
+        started_at = time.monotonic()
+        load_model_artifact(artifact_path, "cpu")
+        click.echo(f"{model_name}: loaded in {time.monotonic() - started_at:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Defaults for the environment variables required by `transcription_service.config` (pointing to a temporary working
+directory), so the tests run without any service configuration – conftest is imported before the test modules.
+"""
+import atexit
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+WORK_DIR = Path(tempfile.mkdtemp(prefix="transcription_service_tests_"))
+atexit.register(shutil.rmtree, WORK_DIR, ignore_errors=True)
+
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_DB", "15")
+os.environ.setdefault("UPLOADS_DIR", str(WORK_DIR / "uploads"))
+os.environ.setdefault("TRANSCRIPTIONS_DIR", str(WORK_DIR / "transcriptions"))
+os.environ.setdefault("MODEL_ARTIFACTS_DIR", str(WORK_DIR / "models"))
+Path(os.environ["UPLOADS_DIR"]).mkdir(parents=True, exist_ok=True)
+Path(os.environ["TRANSCRIPTIONS_DIR"]).mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,119 @@
+import pytest
+
+from transcription_service.chunking import merge_windows_segments, normalize_word, split_into_windows
+
+
+def _word(word: str, start: float, end: float) -> dict:
+    return {"word": word, "start": start, "end": end}
+
+
+def _segment(*words: dict) -> dict:
+    return {
+        "start": words[0]["start"],
+        "end": words[-1]["end"],
+        "text": "".join(w["word"] for w in words),
+        "words": list(words),
+    }
+
+
+def _merged_words(segments: list) -> list:
+    return [(word["word"], word["start"], word["end"]) for segment in segments for word in segment["words"]]
+
+
+def test_split_into_windows_shorter_than_one_window():
+    assert split_into_windows(5, 30, 5) == [(0.0, 5)]
+
+
+def test_split_into_windows_exactly_one_window():
+    assert split_into_windows(30, 30, 5) == [(0.0, 30)]
+
+
+def test_split_into_windows_covers_the_whole_media():
+    windows = split_into_windows(70, 30, 5)
+    assert windows == [(0.0, 30), (25.0, 30), (50.0, 20)]
+    for (start, duration), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start == start + duration - 5
+
+
+@pytest.mark.parametrize("duration", [30.01, 30.5, 55.01, 80.001])
+def test_split_into_windows_last_window_is_longer_than_the_overlap(duration):
+    # Otherwise, the last window would lie within the overlap of the previous one, transcribed twice for nothing.
+    windows = split_into_windows(duration, 30, 5)
+    last_start, last_duration = windows[-1]
+    assert last_duration > 5
+    assert last_start + last_duration == pytest.approx(duration)
+
+
+def test_split_into_windows_rejects_overlap_not_shorter_than_the_windows():
+    with pytest.raises(ValueError):
+        split_into_windows(100, 10, 10)
+
+
+def test_merge_single_window_shifts_nothing():
+    windows = [(0.0, 10)]
+    segments = [[_segment(_word(" Hello", 0.0, 0.5), _word(" world", 0.6, 1.0))]]
+    merged = merge_windows_segments(windows, segments, 2)
+    assert merged == [
+        {"start": 0.0, "end": 1.0, "text": " Hello world", "words": [_word(" Hello", 0.0, 0.5), _word(" world", 0.6, 1.0)]}
+    ]
+
+
+def test_merge_keeps_every_word_of_the_overlap_once():
+    # Windows (0, 10) and (8, 10) – the overlap 8-10 is cut at 9.
+    windows = [(0.0, 10), (8.0, 10)]
+    first = [_segment(_word(" one", 7.0, 7.5), _word(" two", 8.2, 8.6), _word(" three", 9.2, 9.6))]
+    # Timed from the window start (8).
+    second = [_segment(_word(" two", 0.2, 0.6), _word(" three", 1.2, 1.6), _word(" four", 2.5, 3.0))]
+    merged = merge_windows_segments(windows, [first, second], 2)
+    assert _merged_words(merged) == [
+        (" one", 7.0, 7.5),
+        (" two", 8.2, 8.6),
+        (" three", 9.2, 9.6),
+        (" four", 10.5, 11.0),
+    ]
+
+
+def test_merge_word_in_the_middle_of_the_cut_belongs_to_the_later_window():
+    windows = [(0.0, 10), (8.0, 10)]
+    first = [_segment(_word(" cut", 8.8, 9.2))]
+    second = [_segment(_word(" cut", 0.8, 1.2))]
+    merged = merge_windows_segments(windows, [first, second], 2)
+    assert _merged_words(merged) == [(" cut", 8.8, 9.2)]
+    # Taken from the later window, so the segment of the first one is dropped entirely.
+    assert len(merged) == 1
+
+
+def test_merge_deduplicates_a_word_repeated_across_the_cut():
+    # The windows time the same word slightly differently, its middles falling on both sides of the cut at 9.
+    windows = [(0.0, 10), (8.0, 10)]
+    first = [_segment(_word(" Word,", 8.5, 9.3))]
+    second = [_segment(_word(" word", 0.9, 1.5), _word(" next", 1.6, 2.0))]
+    merged = merge_windows_segments(windows, [first, second], 2)
+    assert _merged_words(merged) == [(" Word,", 8.5, 9.3), (" next", 9.6, 10.0)]
+
+
+def test_merge_keeps_different_words_overlapping_in_time():
+    windows = [(0.0, 10), (8.0, 10)]
+    first = [_segment(_word(" red", 8.5, 9.3))]
+    second = [_segment(_word(" green", 0.9, 1.5))]
+    merged = merge_windows_segments(windows, [first, second], 2)
+    assert _merged_words(merged) == [(" red", 8.5, 9.3), (" green", 8.9, 9.5)]
+
+
+def test_merge_keeps_a_repeated_word_not_overlapping_in_time():
+    windows = [(0.0, 10), (8.0, 10)]
+    first = [_segment(_word(" no", 8.0, 8.4))]
+    second = [_segment(_word(" no", 1.2, 1.6))]
+    merged = merge_windows_segments(windows, [first, second], 2)
+    assert _merged_words(merged) == [(" no", 8.0, 8.4), (" no", 9.2, 9.6)]
+
+
+def test_merge_skips_segments_without_words():
+    windows = [(0.0, 10), (8.0, 10)]
+    merged = merge_windows_segments(windows, [[{"start": 0, "end": 1, "text": "", "words": []}], []], 2)
+    assert merged == []
+
+
+@pytest.mark.parametrize("word, normalized", [(" Hello,", "hello"), ("WORLD!", "world"), (" it's", "it's"), (" -", "")])
+def test_normalize_word(word, normalized):
+    assert normalize_word(word) == normalized
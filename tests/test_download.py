@@ -0,0 +1,182 @@
+import gzip
+from types import SimpleNamespace
+
+import fakeredis.aioredis
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from transcription_service import api
+from transcription_service.models import TranscriptionStatusEnum
+from transcription_service.result_formats import ResultFormat, get_result_path
+
+REFERENCE_ID = "20240101000000_test.mp3"
+TEXT = b"Hello world, the transcription of the test file.\n"
+JSON = b'{"text": "Hello world"}'
+
+
+@pytest.mark.parametrize(
+    "range_header, expected",
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=10-", (10, 99)),
+        # Suffix ranges – the last N bytes, the whole file if it's shorter.
+        ("bytes=-10", (90, 99)),
+        ("bytes=-1000", (0, 99)),
+        # The end past the end of the file is cut to it.
+        ("bytes=90-1000", (90, 99)),
+        (" bytes=5-5 ", (5, 5)),
+    ],
+)
+def test_parse_range(range_header, expected):
+    assert api._parse_range(range_header, 100) == expected
+
+
+@pytest.mark.parametrize(
+    "range_header",
+    ["bytes=5-3", "bytes=-", "bytes=0-1,5-6", "items=0-9", "bytes=a-b", ""],
+)
+def test_parse_range_ignores_invalid_and_multiple_ranges(range_header):
+    assert api._parse_range(range_header, 100) is None
+
+
+@pytest.mark.parametrize("range_header", ["bytes=100-", "bytes=100-200", "bytes=-0"])
+def test_parse_range_past_the_end_is_not_satisfiable(range_header):
+    with pytest.raises(HTTPException) as exc_info:
+        api._parse_range(range_header, 100)
+    assert exc_info.value.status_code == 416
+    assert exc_info.value.headers == {"Content-Range": "bytes */100"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def is_in_uploads_index(redis_conn, reference_id):
+        return reference_id == REFERENCE_ID
+
+    async def get_transcription_status(reference_id, redis_conn):
+        return SimpleNamespace(status=TranscriptionStatusEnum.COMPLETED)
+
+    monkeypatch.setattr(api, "is_in_uploads_index", is_in_uploads_index)
+    monkeypatch.setattr(api, "_get_transcription_status", get_transcription_status)
+    # The txt result is stored plain and gzipped, the json one only gzipped.
+    get_result_path(REFERENCE_ID, ResultFormat.TXT).write_bytes(TEXT)
+    get_result_path(REFERENCE_ID, ResultFormat.TXT, "gzip").write_bytes(gzip.compress(TEXT))
+    get_result_path(REFERENCE_ID, ResultFormat.JSON, "gzip").write_bytes(gzip.compress(JSON))
+
+    app = FastAPI()
+    app.include_router(api.api_router)
+    app.state.async_redis_conn = fakeredis.aioredis.FakeRedis()
+    with TestClient(app) as client:
+        yield client
+    for path in (
+        get_result_path(REFERENCE_ID, ResultFormat.TXT),
+        get_result_path(REFERENCE_ID, ResultFormat.TXT, "gzip"),
+        get_result_path(REFERENCE_ID, ResultFormat.JSON, "gzip"),
+    ):
+        path.unlink()
+
+
+def _download(client: TestClient, accept_encoding: str = "identity", **headers: str):
+    return client.get(f"/download/{REFERENCE_ID}", headers={"Accept-Encoding": accept_encoding, **headers})
+
+
+def test_download_plain(client):
+    response = _download(client)
+    assert response.status_code == 200
+    assert response.content == TEXT
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+
+def test_download_precompressed_when_accepted(client):
+    response = _download(client, "gzip;q=0.9, identity;q=0.5")
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    # Decoded by the client.
+    assert response.content == TEXT
+
+
+def test_download_plain_when_the_encoding_is_refused(client):
+    response = _download(client, "gzip;q=0, br")
+    assert "content-encoding" not in response.headers
+    assert response.content == TEXT
+
+
+def test_download_format_by_accept_header(client):
+    response = _download(client, Accept="text/plain;q=0.5, application/json")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    # Stored only gzipped, decompressed on the fly for the client not accepting it (no ranges then).
+    assert response.content == JSON
+    assert "content-encoding" not in response.headers
+    assert "etag" not in response.headers
+
+
+def test_download_format_query_parameter_wins_over_accept_header(client):
+    response = client.get(
+        f"/download/{REFERENCE_ID}",
+        params={"format": "txt"},
+        headers={"Accept": "application/json", "Accept-Encoding": "identity"},
+    )
+    assert response.content == TEXT
+
+
+def test_download_unavailable_format(client):
+    response = client.get(f"/download/{REFERENCE_ID}", params={"format": "srt"})
+    assert response.status_code == 404
+
+
+def test_download_range(client):
+    response = _download(client, Range="bytes=6-10")
+    assert response.status_code == 206
+    assert response.content == TEXT[6:11]
+    assert response.headers["content-range"] == f"bytes 6-10/{len(TEXT)}"
+    assert response.headers["content-length"] == "5"
+
+
+def test_download_range_of_the_precompressed_file(client):
+    compressed = gzip.compress(TEXT)
+    get_result_path(REFERENCE_ID, ResultFormat.TXT, "gzip").write_bytes(compressed)
+    headers = {"Accept-Encoding": "gzip", "Range": "bytes=-10"}
+    with client.stream("GET", f"/download/{REFERENCE_ID}", headers=headers) as response:
+        # The range is of the stored (compressed) file, not decodable on its own.
+        content = b"".join(response.iter_raw())
+    assert response.status_code == 206
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["content-range"] == f"bytes {len(compressed) - 10}-{len(compressed) - 1}/{len(compressed)}"
+    assert content == compressed[-10:]
+
+
+def test_download_invalid_range_sends_the_whole_file(client):
+    response = _download(client, Range="bytes=5-3")
+    assert response.status_code == 200
+    assert response.content == TEXT
+
+
+def test_download_range_past_the_end(client):
+    response = _download(client, Range=f"bytes={len(TEXT)}-")
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(TEXT)}"
+
+
+def test_download_if_range_matching_etag(client):
+    etag = _download(client).headers["etag"]
+    response = _download(client, Range="bytes=0-4", **{"If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == TEXT[:5]
+
+
+def test_download_if_range_stale_etag_sends_the_whole_file(client):
+    response = _download(client, Range="bytes=0-4", **{"If-Range": '"stale"'})
+    assert response.status_code == 200
+    assert response.content == TEXT
+
+
+def test_download_etag_differs_by_encoding(client):
+    assert _download(client).headers["etag"] != _download(client, "gzip").headers["etag"]
+
+
+def test_download_unknown_reference(client):
+    assert client.get("/download/unknown").status_code == 404
@@ -0,0 +1,157 @@
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+from transcription_service import streaming
+from transcription_service.audio import SAMPLE_RATE
+from transcription_service.streaming import StreamTranscriber
+
+
+def _words(*words: tuple) -> List[dict]:
+    return [{"word": word, "start": start, "end": end} for word, start, end in words]
+
+
+def _texts(words: List[dict]) -> List[str]:
+    return [word["word"] for word in words]
+
+
+def _timed(*words: tuple) -> List[dict]:
+    """The expected words, with their timestamps compared approximately."""
+    return [{"word": word, "start": pytest.approx(start), "end": pytest.approx(end)} for word, start, end in words]
+
+
+class ScriptedWindows:
+    """Stand-in for the model – returns the scripted words (timed from the window start) of the consecutive passes."""
+
+    def __init__(self, monkeypatch):
+        self.passes: List[List[dict]] = []
+        self.prompts: List[Optional[str]] = []
+        self.window_durations: List[float] = []
+        monkeypatch.setattr(streaming, "transcribe_stream_window", self)
+
+    def __call__(self, audio: np.ndarray, model_name: Optional[str] = None, initial_prompt: Optional[str] = None):
+        self.prompts.append(initial_prompt)
+        self.window_durations.append(len(audio) / SAMPLE_RATE)
+        return self.passes.pop(0)
+
+
+@pytest.fixture
+def windows(monkeypatch) -> ScriptedWindows:
+    return ScriptedWindows(monkeypatch)
+
+
+@pytest.fixture
+def transcriber() -> StreamTranscriber:
+    return StreamTranscriber("tiny", max_buffer_duration=10)
+
+
+def _insert_seconds(transcriber: StreamTranscriber, seconds: float) -> None:
+    transcriber.insert_audio(np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32))
+
+
+def test_first_pass_is_interim(windows, transcriber):
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" Hello", 0.0, 0.4), (" world", 0.5, 0.9)))
+    committed, interim = transcriber.process()
+    assert committed == []
+    assert _texts(interim) == [" Hello", " world"]
+
+
+def test_common_prefix_of_two_passes_is_committed_and_trimmed(windows, transcriber):
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" Hello", 0.0, 0.4), (" word", 0.5, 0.9)))
+    transcriber.process()
+    _insert_seconds(transcriber, 1)
+    # The punctuation and the casing of a word don't matter, the changed word ends the agreement.
+    windows.passes.append(_words((" hello,", 0.0, 0.4), (" world", 0.5, 0.9), (" again", 1.2, 1.6)))
+    committed, interim = transcriber.process()
+    assert _texts(committed) == [" hello,"]
+    assert _texts(interim) == [" world", " again"]
+    # The committed audio is trimmed off the window, the next pass transcribes the rest with the committed prompt.
+    assert transcriber.duration == pytest.approx(2.0)
+    _insert_seconds(transcriber, 0.5)
+    windows.passes.append(_words((" world", 0.1, 0.5), (" again", 0.8, 1.2)))
+    committed, interim = transcriber.process()
+    assert windows.window_durations[-1] == pytest.approx(2.1)
+    assert windows.prompts[-1] == " hello,"
+    assert committed == _timed((" world", 0.5, 0.9), (" again", 1.2, 1.6))
+    assert interim == []
+
+
+def test_no_agreement_commits_nothing(windows, transcriber):
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" one", 0.0, 0.4)))
+    transcriber.process()
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" won", 0.0, 0.4), (" two", 0.5, 0.9)))
+    committed, interim = transcriber.process()
+    assert committed == []
+    assert _texts(interim) == [" won", " two"]
+    assert windows.window_durations[-1] == pytest.approx(2.0)
+
+
+def test_apostrophes_are_kept_by_the_agreement(windows, transcriber):
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" its", 0.0, 0.4)))
+    transcriber.process()
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" it's", 0.0, 0.4)))
+    committed, _ = transcriber.process()
+    assert committed == []
+
+
+def test_final_pass_commits_everything(windows, transcriber):
+    _insert_seconds(transcriber, 1.5)
+    windows.passes.append(_words((" The", 0.0, 0.3), (" end", 0.4, 0.8)))
+    committed, interim = transcriber.process(is_final=True)
+    assert _texts(committed) == [" The", " end"]
+    assert interim == []
+    # The whole window is trimmed, the duration of the stream is kept.
+    assert transcriber.duration == pytest.approx(1.5)
+    assert transcriber._buffer_start == pytest.approx(1.5)
+
+
+def test_window_over_max_duration_commits_the_latest_hypothesis(windows, transcriber):
+    _insert_seconds(transcriber, 11)
+    windows.passes.append(_words((" too", 0.0, 0.5), (" long", 9.0, 9.5)))
+    committed, interim = transcriber.process()
+    assert _texts(committed) == [" too", " long"]
+    assert interim == []
+    assert transcriber._buffer_start == pytest.approx(9.5)
+
+
+def test_window_over_max_duration_without_words_drops_its_older_half(windows, transcriber):
+    _insert_seconds(transcriber, 12)
+    windows.passes.append([])
+    committed, interim = transcriber.process()
+    assert committed == interim == []
+    assert transcriber._buffer_start == pytest.approx(7.0)
+    assert transcriber.duration == pytest.approx(12.0)
+
+
+def test_committed_words_transcribed_again_are_dropped(windows, transcriber):
+    _insert_seconds(transcriber, 2)
+    windows.passes.append(_words((" good", 0.0, 0.4), (" morning", 0.5, 1.0)))
+    transcriber.process()
+    windows.passes.append(_words((" good", 0.0, 0.4), (" morning", 0.5, 1.0)))
+    committed, _ = transcriber.process()
+    assert _texts(committed) == [" good", " morning"]
+    # The last committed word is cut in the middle – transcribed again at the start of the next window.
+    _insert_seconds(transcriber, 1)
+    windows.passes.append(_words((" Morning.", 0.0, 0.3), (" everyone", 0.4, 0.9)))
+    committed, interim = transcriber.process()
+    assert committed == []
+    assert interim == _timed((" everyone", 1.4, 1.9))
+
+
+def test_words_ending_before_the_committed_end_are_dropped(windows, transcriber):
+    _insert_seconds(transcriber, 2)
+    windows.passes.extend([_words((" first", 0.0, 1.0)), _words((" first", 0.0, 1.0))])
+    transcriber.process()
+    transcriber.process()
+    _insert_seconds(transcriber, 1)
+    # Timed from the window start (1.0), the word ending at 0.9 ended before the committed one.
+    windows.passes.append(_words((" noise", 0.0, -0.1), (" second", 0.5, 1.0)))
+    _, interim = transcriber.process()
+    assert _texts(interim) == [" second"]
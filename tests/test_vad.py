@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from transcription_service.audio import SAMPLE_RATE
+from transcription_service.vad import SpeechTimeline, detect_speech_spans
+
+
+def _samples(seconds: float) -> int:
+    return int(seconds * SAMPLE_RATE)
+
+
+@pytest.fixture
+def timeline() -> SpeechTimeline:
+    # Speech 1-3 s and 6-7 s of 10 s of audio – 0-2 s and 2-3 s of the speech-only audio.
+    return SpeechTimeline([(_samples(1), _samples(3)), (_samples(6), _samples(7))], _samples(10))
+
+
+def test_timeline_durations(timeline):
+    assert timeline.duration == 10
+    assert timeline.speech_length == _samples(3)
+    assert timeline.skipped_duration == 7
+
+
+@pytest.mark.parametrize("timestamp, expected", [(0.0, 1.0), (0.5, 1.5), (2.5, 6.5), (3.0, 7.0)])
+def test_to_original_within_spans(timeline, timestamp, expected):
+    assert timeline.to_original(timestamp) == pytest.approx(expected)
+
+
+def test_to_original_start_on_the_boundary_belongs_to_the_latter_span(timeline):
+    assert timeline.to_original(2.0) == pytest.approx(6.0)
+
+
+def test_to_original_end_on_the_boundary_belongs_to_the_former_span(timeline):
+    assert timeline.to_original(2.0, is_end=True) == pytest.approx(3.0)
+    # Away from the boundaries, the ends are mapped as the starts.
+    assert timeline.to_original(2.5, is_end=True) == pytest.approx(6.5)
+    assert timeline.to_original(0.0, is_end=True) == pytest.approx(1.0)
+
+
+def test_remap_segments_keeps_the_words_within_their_spans(timeline):
+    segments = [
+        {
+            "start": 1.5,
+            "end": 2.5,
+            "text": " before after",
+            "words": [{"word": " before", "start": 1.5, "end": 2.0}, {"word": " after", "start": 2.0, "end": 2.5}],
+            "tokens": [1, 2],
+        }
+    ]
+    remapped = timeline.remap_segments(segments)
+    assert remapped[0]["start"] == pytest.approx(2.5)
+    assert remapped[0]["end"] == pytest.approx(6.5)
+    assert [(word["start"], word["end"]) for word in remapped[0]["words"]] == [
+        pytest.approx((2.5, 3.0)),
+        pytest.approx((6.0, 6.5)),
+    ]
+    # The other fields are kept, the input is not modified.
+    assert remapped[0]["tokens"] == [1, 2]
+    assert segments[0]["start"] == 1.5
+
+
+def test_remap_segments_without_words(timeline):
+    assert timeline.remap_segments([{"start": 0.0, "end": 2.0, "text": ""}]) == [{"start": 1.0, "end": 3.0, "text": ""}]
+
+
+def test_single_span_of_the_whole_audio_is_identity():
+    timeline = SpeechTimeline([(0, _samples(5))], _samples(5))
+    assert timeline.skipped_duration == 0
+    assert [timeline.to_original(timestamp) for timestamp in (0.0, 2.5, 5.0)] == [0.0, 2.5, 5.0]
+    assert timeline.to_original(5.0, is_end=True) == 5.0
+
+
+def test_single_span_shifts_by_its_start():
+    timeline = SpeechTimeline([(_samples(2), _samples(4))], _samples(10))
+    assert timeline.to_original(0.0) == pytest.approx(2.0)
+    assert timeline.to_original(2.0, is_end=True) == pytest.approx(4.0)
+
+
+def test_no_speech_keeps_the_timestamps():
+    timeline = SpeechTimeline([], _samples(5))
+    assert timeline.speech_length == 0
+    assert timeline.skipped_duration == 5
+    assert timeline.to_original(1.0) == 1.0
+    assert timeline.remap_segments([]) == []
+
+
+def test_detect_speech_spans_of_silence_and_tone():
+    # Aligned to the frames (30 ms) – the spans start and end with them.
+    silence = np.zeros(_samples(2.1), dtype=np.float32)
+    tone = (0.5 * np.sin(2 * np.pi * 440 * np.arange(_samples(0.96)) / SAMPLE_RATE)).astype(np.float32)
+    audio = np.concatenate([silence, tone, silence])
+    spans = detect_speech_spans(audio, threshold_db=-40, min_silence_duration=0.5, padding=0.1)
+    assert spans == [(_samples(2.0), _samples(3.16))]
+    assert detect_speech_spans(silence, threshold_db=-40, min_silence_duration=0.5, padding=0.1) == []
@@ -1,161 +1,1276 @@
+import os
+import re
 import shutil
-from datetime import datetime
+import time
+import zlib
+from collections import Counter, defaultdict
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, Tuple
-from urllib.parse import unquote
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import quote, unquote
 
-from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
+from multipart.multipart import parse_options_header
+from pydantic import TypeAdapter, ValidationError
 from redis import Redis
-from rq.job import Job
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.client import PubSub as AsyncPubSub
+from rq.job import Job, JobStatus
+from rq.queue import EnqueueData, Queue
+from rq.results import Result
+from rq.serializers import resolve_serializer
+from rq.utils import as_text, utcnow, utcparse
+from starlette.requests import ClientDisconnect
 
 from transcription_service import config
+from transcription_service.audio import get_media_duration
+from transcription_service.batches import add_batch, create_batch_id, get_batch
+from transcription_service.estimation import BacklogEstimate, add_queued_duration, get_backlog_estimate
+from transcription_service.events import ALL_JOB_EVENTS_PATTERN, get_job_events_channel, publish_job_event
+from transcription_service.ingest import (
+    FILE_FIELD_NAME,
+    MAX_FORM_FIELDS_SIZE,
+    MAX_UPLOAD_SIZE,
+    MalformedUploadError,
+    UploadTooLargeError,
+    UploadWriter,
+    hash_file,
+    receive_multipart_upload,
+    receive_multipart_uploads,
+)
+from transcription_service.job_archive import get_archived_statuses
+from transcription_service.logger import TRACE_ID, log
+from transcription_service.metrics import METRICS_CONTENT_TYPE, STAGE_DURATION, render_metrics
 from transcription_service.models import (
+    BatchStatusResponse,
+    BatchTranscriptionStatusesRequest,
+    BatchTranscriptionStatusesResponse,
+    BatchUploadRequest,
+    BatchUploadResponse,
+    CreateUploadSessionRequest,
     HealthCheckResponse,
     ListTranscriptionStatusesPaginatedResponse,
     MediaType,
+    PartialTranscriptionResponse,
+    ResultCacheStatsResponse,
     TranscriptionStatus,
     TranscriptionStatusEnum,
     UploadResponse,
+    UploadSessionResponse,
+)
+from transcription_service.progress import get_partial_transcript
+from transcription_service.result_cache import (
+    count_result_cache_lookup,
+    get_cached_reference_id,
+    get_result_cache_key,
+    get_result_cache_stats,
+    invalidate_cached_result,
+)
+from transcription_service.result_formats import (
+    RESULT_ENCODING_SUFFIXES,
+    RESULT_MEDIA_TYPES,
+    ResultFormat,
+    get_decompressor,
+    get_result_path,
+    get_result_paths,
+)
+from transcription_service.scheduling import (
+    get_job_retry,
+    get_job_timeout,
+    get_model_queue_name,
+    get_size_class_queue_name,
+    parse_model_queue_name,
 )
 from transcription_service.transcription import determine_media_type, transcribe_audio_task, transcribe_video_task
+from transcription_service.upload_sessions import (
+    UploadSession,
+    UploadSessionBusyError,
+    create_upload_session,
+    delete_upload_session,
+    extend_upload_session,
+    get_upload_session,
+    get_upload_session_expiration,
+    get_upload_session_key,
+    lock_upload_session,
+)
+from transcription_service.uploads_index import (
+    add_to_uploads_index,
+    are_in_uploads_index,
+    decode_cursor,
+    encode_cursor,
+    get_uploads_page,
+    get_uploads_page_after,
+    is_in_uploads_index,
+)
 
 api_router = APIRouter()
 
+# `Content-Range` of the appends to the resumable uploads.
+CONTENT_RANGE_PATTERN = re.compile(r"bytes (\d+)-(\d+)/(\d+|\*)")
+# Booleans of the upload form ("true", "false", "1", "0", etc.).
+_BOOL_ADAPTER = TypeAdapter(bool)
+# Formats of the downloads selected by the `Accept` header (unless the `format` query parameter is given).
+RESULT_FORMATS_BY_MEDIA_TYPE = {
+    "text/plain": ResultFormat.TXT,
+    "application/json": ResultFormat.JSON,
+    "application/x-ndjson": ResultFormat.NDJSON,
+    "application/x-subrip": ResultFormat.SRT,
+    "text/vtt": ResultFormat.VTT,
+}
+# Single byte range of the downloads (`bytes=first-last`, `bytes=first-` or `bytes=-suffix_length`).
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)")
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Max time without any data sent on the events streams.
+EVENTS_KEEPALIVE_INTERVAL = 15
+FINISHED_TRANSCRIPTION_STATUSES = (TranscriptionStatusEnum.COMPLETED, TranscriptionStatusEnum.FAILED)
 
-@api_router.post("/upload", response_model=UploadResponse)
-def upload(request: Request, file: UploadFile = File(...), include_word_timestamps: bool = Form(False)):
+
+def _link_cached_transcription(cached_reference_id: str, reference_id: str) -> bool:
     """
-    Upload a file for transcription.
+    Make the transcription of an already transcribed (cached) upload available under the new reference ID – all the
+    files of its result (in all the formats it was written in).
+
+    Returns:
+        bool: Whether the cached transcription still exists and was linked.
     """
-    # Important: can't be async.
-    timestamp = datetime.now().astimezone().replace(microsecond=0).isoformat()
-    filename = Path(file.filename).name
-    reference_id = f"{timestamp}_{filename}"
+    for i, (cached_transcription_path, transcription_path) in enumerate(
+        zip(get_result_paths(cached_reference_id), get_result_paths(reference_id))
+    ):
+        # Only the legacy result is always written, the other formats may be missing (e.g. the older results).
+        is_required = i == 0
+        try:
+            os.link(cached_transcription_path, transcription_path)
+        except FileNotFoundError:
+            if is_required:
+                return False
+        except OSError:
+            # Hard links are not supported by every filesystem – fall back to a copy.
+            try:
+                shutil.copyfile(cached_transcription_path, transcription_path)
+            except FileNotFoundError:
+                if is_required:
+                    return False
+            except shutil.SameFileError:
+                # Re-upload under the same reference ID (same file name within the same second) – already linked.
+                pass
+    return True
+
 
-    media_type = determine_media_type(config.UPLOADS_DIR / filename)
-    if media_type == MediaType.OTHER:
+def _get_model_name(model: Optional[str]) -> str:
+    model_name = model or config.WHISPER_MODEL_NAME
+    if model_name not in config.WHISPER_MODELS:
+        raise HTTPException(
+            status_code=400, detail=f"Unsupported model. Available models: {', '.join(config.WHISPER_MODELS)}."
+        )
+    return model_name
+
+
+def _check_media_type(filename: str) -> None:
+    if determine_media_type(config.UPLOADS_DIR / filename) == MediaType.OTHER:
         raise HTTPException(
             status_code=415, detail="Unsupported media type. Only " "limited audio and video formats are supported."
         )
-    # TODO: also possibly ad a check for the file size here / configurable max size.
 
-    try:
-        with open(config.UPLOADS_DIR / reference_id, "wb") as f:
-            # We utilize shutil.copyfileobj from stdlib as it handles the chunking of larger files underneath.
-            shutil.copyfileobj(file.file, f)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail="Error uploading the file.")
-    finally:
-        file.file.close()
 
-    if media_type == MediaType.VIDEO:
-        job_type = transcribe_video_task
-    elif media_type == MediaType.AUDIO:
-        job_type = transcribe_audio_task
-    # Else shouldn't ever happen as we handle the OTHER type earlier/before with different error code.
+def _get_upload_too_large_error() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"The file is too large, the max size is {config.UPLOAD_MAX_SIZE_MB:g} MB.")
+
+
+def _check_backlog(redis_conn: Redis) -> BacklogEstimate:
+    """
+    Backpressure – the uploads are rejected before storing their files, while the backlog takes too long to transcribe.
+    """
+    backlog_estimate = get_backlog_estimate(redis_conn)
+    retry_after = backlog_estimate.get_retry_after()
+    if retry_after is not None:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many transcriptions queued, try again later.",
+            headers={"Retry-After": str(retry_after)},
+        )
+    return backlog_estimate
+
+
+@dataclass
+class _Upload:
+    """An uploaded file (already in the uploads directory) to be enqueued for transcription."""
+
+    reference_id: str
+    include_word_timestamps: bool
+    model_name: str
+    content_hash: Optional[str]
+
+
+def _enqueue_uploads(
+    request: Request,
+    uploads: List[_Upload],
+    backlog_estimate: BacklogEstimate,
+    upload_write_duration: Optional[float] = None,
+    batch_id: Optional[str] = None,
+) -> List[UploadResponse]:
+    """
+    Enqueue the transcriptions of the uploaded files – or, if the same content was already transcribed, finish them
+    right away, reusing the existing transcriptions. All of them are enqueued in a single pipeline (along with their
+    batch, if given), so either all of them are enqueued or none.
+    """
+    # Important: runs in the threadpool – the files are probed, and the jobs enqueued by (the synchronous) RQ.
+    redis_conn = request.app.state.redis_conn
+    # Probed and looked up in the results cache before anything is written to Redis.
+    jobs_types, durations, queues, cached_reference_ids = [], [], [], []
+    for upload in uploads:
+        media_type = determine_media_type(config.UPLOADS_DIR / upload.reference_id)
+        if media_type == MediaType.VIDEO:
+            jobs_types.append(transcribe_video_task)
+        elif media_type == MediaType.AUDIO:
+            jobs_types.append(transcribe_audio_task)
+        # Else shouldn't ever happen as we handle the OTHER type earlier/before with different error code.
+
+        # Jobs are routed to the size-class queues of their model by the media duration.
+        duration = get_media_duration(config.UPLOADS_DIR / upload.reference_id)
+        durations.append(duration)
+        queues.append(request.app.state.queues[get_model_queue_name(get_size_class_queue_name(duration), upload.model_name)])
+        cached_reference_id = None
+        if config.RESULT_CACHE_ENABLED:
+            cache_key = get_result_cache_key(upload.content_hash, upload.model_name, upload.include_word_timestamps)
+            cached_reference_id = get_cached_reference_id(redis_conn, cache_key)
+            if cached_reference_id is not None and not _link_cached_transcription(cached_reference_id, upload.reference_id):
+                invalidate_cached_result(redis_conn, cache_key)
+                cached_reference_id = None
+            count_result_cache_lookup(redis_conn, hit=cached_reference_id is not None)
+        cached_reference_ids.append(cached_reference_id)
 
     # Create a job with a custom ID – otherwise, RQ will generate a random one that won't match the reference ID
     # TTLs are set to -1 to prevent the job from being removed from the queue after processing as we use them
-    # for listing
-    request.app.state.queue.enqueue(
-        job_type,
-        reference_id,
+    # for listing. The upload is recorded in the uploads index within the same pipeline.
+    with redis_conn.pipeline() as pipeline:
+        # Enqueued per queue, all the jobs at once.
+        queues_jobs_data: Dict[str, List[EnqueueData]] = defaultdict(list)
+        for upload, job_type, duration, queue, cached_reference_id in zip(
+            uploads, jobs_types, durations, queues, cached_reference_ids
+        ):
+            if cached_reference_id is not None:
+                # The same content was already transcribed – the job is saved as finished right away, without enqueueing.
+                job = Job.create(
+                    job_type,
+                    args=(upload.reference_id, upload.include_word_timestamps),
+                    kwargs={"model_name": upload.model_name},
+                    connection=redis_conn,
+                    id=upload.reference_id,
+                    origin=queue.name,
+                    result_ttl=-1,
+                    failure_ttl=-1,
+                    status=JobStatus.FINISHED,
+                    meta={"duration": duration, "deduplicated_from": cached_reference_id, "trace_id": TRACE_ID.get()},
+                )
+                job.ended_at = utcnow()
+                job.save(pipeline=pipeline)
+                queue.finished_job_registry.add(job, ttl=-1, pipeline=pipeline)
+                status = TranscriptionStatusEnum.COMPLETED
+            else:
+                queues_jobs_data[queue.name].append(
+                    Queue.prepare_data(
+                        job_type,
+                        args=(upload.reference_id, upload.include_word_timestamps),
+                        kwargs={
+                            "content_hash": upload.content_hash if config.RESULT_CACHE_ENABLED else None,
+                            "model_name": upload.model_name,
+                        },
+                        job_id=upload.reference_id,
+                        result_ttl=-1,
+                        failure_ttl=-1,
+                        timeout=get_job_timeout(duration),
+                        retry=get_job_retry(),
+                        meta={"duration": duration, "trace_id": TRACE_ID.get()},
+                    )
+                )
+                add_queued_duration(pipeline, queue.name, upload.reference_id, duration)
+                status = TranscriptionStatusEnum.QUEUED
+            add_to_uploads_index(pipeline, upload.reference_id)
+            publish_job_event(
+                pipeline, TranscriptionStatus(reference_id=upload.reference_id, status=status, error_message=None)
+            )
+        for queue_name, jobs_data in queues_jobs_data.items():
+            request.app.state.queues[queue_name].enqueue_many(jobs_data, pipeline=pipeline)
+        if batch_id is not None:
+            add_batch(pipeline, batch_id, [upload.reference_id for upload in uploads])
+        if upload_write_duration is not None:
+            STAGE_DURATION.observe(pipeline, upload_write_duration, stage="upload_write")
+        pipeline.execute()
+
+    upload_responses = []
+    now = datetime.now(timezone.utc)
+    for upload, duration, queue, cached_reference_id in zip(uploads, durations, queues, cached_reference_ids):
+        if cached_reference_id is not None:
+            upload_responses.append(UploadResponse(reference_id=upload.reference_id))
+            continue
+        # The backlog was estimated before these uploads, so all of it is ahead of them (and the previous ones of them).
+        estimated_start_at = backlog_estimate.estimate_start(now, backlog_estimate.get_work_ahead(queue.name))
+        processing_time = backlog_estimate.estimate_processing_time(duration, upload.model_name)
+        backlog_estimate.add_queued(queue.name, duration, upload.model_name)
+        upload_responses.append(
+            UploadResponse(
+                reference_id=upload.reference_id,
+                estimated_start_at=estimated_start_at,
+                estimated_finish_at=estimated_start_at + processing_time if estimated_start_at and processing_time else None,
+            )
+        )
+    return upload_responses
+
+
+def _enqueue_upload(
+    request: Request,
+    reference_id: str,
+    include_word_timestamps: bool,
+    model_name: str,
+    content_hash: Optional[str],
+    backlog_estimate: BacklogEstimate,
+    upload_write_duration: Optional[float] = None,
+) -> UploadResponse:
+    """Enqueue the transcription of a single uploaded file (see `_enqueue_uploads`)."""
+    upload = _Upload(reference_id, include_word_timestamps, model_name, content_hash)
+    return _enqueue_uploads(request, [upload], backlog_estimate, upload_write_duration)[0]
+
+
+# The form of `/upload` is parsed by the endpoint itself (streaming its file to the disk), so it's documented here.
+_UPLOAD_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [FILE_FIELD_NAME],
+                    "properties": {
+                        FILE_FIELD_NAME: {"type": "string", "format": "binary"},
+                        "include_word_timestamps": {"type": "boolean", "default": False},
+                        "model": {
+                            "type": "string",
+                            "description": "Whisper model to transcribe with (the default one if not given).",
+                        },
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+@api_router.post("/upload", response_model=UploadResponse, openapi_extra=_UPLOAD_OPENAPI_EXTRA)
+async def upload(request: Request):
+    """
+    Upload a file for transcription (with one of the configured whisper models). The response includes the estimated
+    start and finish of the transcription – while the backlog is estimated to take longer than the configured limit,
+    uploads are rejected with 429 (and `Retry-After`).
+
+    The file is written to the disk as it's received, up to `UPLOAD_MAX_SIZE_MB` (rejected with 413 above that). Large
+    files over unreliable connections can be uploaded in resumable ranges instead, see `/upload/sessions`.
+    """
+    # The form is parsed here rather than by FastAPI, which would spool the file to a temporary file first. Only the
+    # blocking work (writing the file, enqueueing the job by the synchronous RQ) runs in the threadpool.
+    timestamp = datetime.now().astimezone().replace(microsecond=0).isoformat()
+    content_length = request.headers.get("content-length", "")
+    # Rejected right away, if the whole form is too large even without the file.
+    if (
+        MAX_UPLOAD_SIZE is not None
+        and content_length.isdigit()
+        and int(content_length) > MAX_UPLOAD_SIZE + MAX_FORM_FIELDS_SIZE
+    ):
+        raise _get_upload_too_large_error()
+    backlog_estimate = await run_in_threadpool(_check_backlog, request.app.state.redis_conn)
+
+    upload_path: Optional[Path] = None
+
+    def open_file(filename: str, fields: Dict[str, str]) -> UploadWriter:
+        nonlocal upload_path
+        filename = Path(filename).name
+        _check_media_type(filename)
+        # The fields sent before the file are validated before it's received.
+        if "model" in fields:
+            _get_model_name(fields["model"])
+        upload_path = config.UPLOADS_DIR / f"{timestamp}_{filename}"
+        # The content hash is needed only for the deduplication.
+        return UploadWriter(upload_path, MAX_UPLOAD_SIZE, hash_content=config.RESULT_CACHE_ENABLED)
+
+    started_at = time.monotonic()
+    try:
+        try:
+            fields, writer = await receive_multipart_upload(request, open_file)
+            upload_write_duration = time.monotonic() - started_at
+            model_name = _get_model_name(fields.get("model"))
+            include_word_timestamps = _BOOL_ADAPTER.validate_python(fields.get("include_word_timestamps", False))
+        except BaseException:
+            if upload_path is not None:
+                upload_path.unlink(missing_ok=True)
+            raise
+    except HTTPException:
+        raise
+    except UploadTooLargeError:
+        raise _get_upload_too_large_error()
+    except MalformedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError:
+        raise HTTPException(status_code=422, detail="Invalid include_word_timestamps, a boolean is expected.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Error uploading the file.")
+
+    return await run_in_threadpool(
+        _enqueue_upload,
+        request,
+        upload_path.name,
         include_word_timestamps,
-        job_id=reference_id,
-        result_ttl=-1,
-        failure_ttl=-1,
-        job_timeout=60 * 60,
+        model_name,
+        writer.get_content_hash(),
+        backlog_estimate,
+        upload_write_duration,
     )
 
-    return {"reference_id": reference_id}
 
+def _get_upload_session_offset(session: UploadSession) -> int:
+    try:
+        return session.path.stat().st_size
+    except FileNotFoundError:
+        # Nothing was appended yet.
+        return 0
 
-def _get_job_status_and_error_message(reference_id: str, redis_conn: Redis) -> Tuple[TranscriptionStatusEnum, Optional[str]]:
-    # Check the transcription job status
-    job = Job.fetch(reference_id, connection=redis_conn)
-    if job.is_queued:
-        status = TranscriptionStatusEnum.QUEUED
-        message = None
-    elif job.is_started:
-        status = TranscriptionStatusEnum.PROCESSING
-        message = None
-    elif job.is_finished:
-        status = TranscriptionStatusEnum.COMPLETED
-        message = None
-    elif job.is_failed:
-        status = TranscriptionStatusEnum.FAILED
-        message = job.exc_info
-    else:
-        status = TranscriptionStatusEnum.UNKNOWN
+
+def _move_upload_session_file(session: UploadSession, upload_path: Path) -> Optional[str]:
+    """
+    Move the file of the finished upload session to the uploads directory (within the same filesystem, so it's not
+    copied).
+
+    Returns:
+        Optional[str]: The SHA-256 hex digest of the file content, if needed for the deduplication.
+    """
+    os.replace(session.path, upload_path)
+    return hash_file(upload_path) if config.RESULT_CACHE_ENABLED else None
+
+
+async def _get_upload_session_or_404(redis_conn: AsyncRedis, session_id: str) -> UploadSession:
+    session = await get_upload_session(redis_conn, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found (or expired).")
+    return session
+
+
+async def _get_upload_session_response(redis_conn: AsyncRedis, session: UploadSession, offset: int) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        session_id=session.session_id,
+        filename=session.filename,
+        size=session.size,
+        offset=offset,
+        expires_at=datetime.fromtimestamp(await get_upload_session_expiration(redis_conn, session.session_id), timezone.utc),
+    )
+
+
+@api_router.post("/upload/sessions", response_model=UploadSessionResponse, status_code=201)
+async def start_upload_session(request: Request, session_request: CreateUploadSessionRequest):
+    """
+    Start a resumable upload of a file for transcription. Its data is appended in ranges
+    (`PATCH /upload/sessions/{session_id}`) – after a failure, the upload continues from the data already received –
+    and it's enqueued once finalized (`POST /upload/sessions/{session_id}/finalize`). Unfinished uploads are discarded
+    `UPLOAD_SESSION_TTL` seconds after their last append.
+    """
+    filename = Path(session_request.filename).name
+    _check_media_type(filename)
+    model_name = _get_model_name(session_request.model)
+    if MAX_UPLOAD_SIZE is not None and session_request.size is not None and session_request.size > MAX_UPLOAD_SIZE:
+        raise _get_upload_too_large_error()
+    # Rejected before the data is sent, the finalization is rejected as well while the backlog is too long.
+    await run_in_threadpool(_check_backlog, request.app.state.redis_conn)
+
+    redis_conn = request.app.state.async_redis_conn
+    session = await create_upload_session(
+        redis_conn, filename, model_name, session_request.include_word_timestamps, session_request.size
+    )
+    return await _get_upload_session_response(redis_conn, session, 0)
+
+
+@api_router.get("/upload/sessions/{session_id}", response_model=UploadSessionResponse)
+async def get_upload_session_status(request: Request, session_id: str):
+    """
+    Get the state of the resumable upload – its `offset` is where the next append has to start.
+    """
+    redis_conn = request.app.state.async_redis_conn
+    session = await _get_upload_session_or_404(redis_conn, session_id)
+    offset = await run_in_threadpool(_get_upload_session_offset, session)
+    return await _get_upload_session_response(redis_conn, session, offset)
+
+
+@api_router.patch("/upload/sessions/{session_id}", response_model=UploadSessionResponse)
+async def append_to_upload_session(request: Request, session_id: str):
+    """
+    Append a range of the file (the request body) to the resumable upload, its position given by the `Content-Range`
+    header (`bytes <first>-<last>/<size or *>`). The range has to start at the current offset of the upload (409
+    otherwise). If the request is interrupted, the data received till then is kept – the offset to continue from is
+    returned by `GET /upload/sessions/{session_id}`.
+    """
+    redis_conn = request.app.state.async_redis_conn
+    session = await _get_upload_session_or_404(redis_conn, session_id)
+    content_range = CONTENT_RANGE_PATTERN.fullmatch(request.headers.get("content-range", ""))
+    if content_range is None or int(content_range[2]) < int(content_range[1]):
+        raise HTTPException(
+            status_code=400, detail="Missing or malformed Content-Range header, `bytes <first>-<last>/<size or *>`."
+        )
+    first, last = int(content_range[1]), int(content_range[2])
+    size = int(content_range[3]) if content_range[3] != "*" else session.size
+    if size is not None and (last >= size or (session.size is not None and size != session.size)):
+        raise HTTPException(status_code=400, detail="The range doesn't match the size of the file.")
+    if MAX_UPLOAD_SIZE is not None and last >= MAX_UPLOAD_SIZE:
+        raise _get_upload_too_large_error()
+
+    try:
+        async with lock_upload_session(redis_conn, session_id) as lock:
+            writer = UploadWriter(session.path, last + 1, append=True, hash_content=False, on_flush=lock.reacquire)
+            await writer.open()
+            try:
+                if writer.size != first:
+                    raise HTTPException(
+                        status_code=409, detail=f"The range has to start at the current offset of the upload, {writer.size}."
+                    )
+                async for chunk in request.stream():
+                    await writer.write(chunk)
+            except ClientDisconnect:
+                # The data received till then is kept, the client continues from there.
+                log.info(f"Append to the upload session {session_id} interrupted at {writer.size} bytes")
+            finally:
+                await writer.close()
+            await extend_upload_session(redis_conn, session_id)
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="Another append to the upload is in progress.")
+    except UploadTooLargeError:
+        raise HTTPException(status_code=400, detail="The request body is longer than its range.")
+    return await _get_upload_session_response(redis_conn, session, writer.size)
+
+
+@api_router.post("/upload/sessions/{session_id}/finalize", response_model=UploadResponse)
+async def finalize_upload_session(request: Request, session_id: str):
+    """
+    Finish the resumable upload – its file is enqueued for transcription, as with `/upload` (while the backlog is too
+    long, it's rejected with 429 and the session is kept, so the finalization can be retried).
+    """
+    redis_conn = request.app.state.async_redis_conn
+    session = await _get_upload_session_or_404(redis_conn, session_id)
+    try:
+        async with lock_upload_session(redis_conn, session_id):
+            offset = await run_in_threadpool(_get_upload_session_offset, session)
+            if offset == 0 or (session.size is not None and offset != session.size):
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"The upload is not complete, {offset} of {session.size or 'unknown number of'} bytes received.",
+                )
+            backlog_estimate = await run_in_threadpool(_check_backlog, request.app.state.redis_conn)
+
+            timestamp = datetime.now().astimezone().replace(microsecond=0).isoformat()
+            upload_path = config.UPLOADS_DIR / f"{timestamp}_{session.filename}"
+            content_hash = await run_in_threadpool(_move_upload_session_file, session, upload_path)
+            try:
+                upload_response = await run_in_threadpool(
+                    _enqueue_upload,
+                    request,
+                    upload_path.name,
+                    session.include_word_timestamps,
+                    session.model_name,
+                    content_hash,
+                    backlog_estimate,
+                )
+            except BaseException:
+                # Back to the session, so the finalization can be retried.
+                await run_in_threadpool(os.replace, upload_path, session.path)
+                raise
+            await delete_upload_session(redis_conn, session_id)
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="The upload is being appended to.")
+    return upload_response
+
+
+@api_router.delete("/upload/sessions/{session_id}", status_code=204)
+async def abort_upload_session(request: Request, session_id: str):
+    """
+    Abort the resumable upload, discarding the data received so far.
+    """
+    redis_conn = request.app.state.async_redis_conn
+    session = await _get_upload_session_or_404(redis_conn, session_id)
+    try:
+        async with lock_upload_session(redis_conn, session_id):
+            await delete_upload_session(redis_conn, session_id)
+            await run_in_threadpool(session.path.unlink, missing_ok=True)
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="The upload is being appended to.")
+
+
+# The body of `/upload/batch` is parsed by the endpoint itself (either a form, or a JSON manifest), documented here.
+_UPLOAD_BATCH_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": [FILE_FIELD_NAME],
+                    "properties": {
+                        FILE_FIELD_NAME: {
+                            "type": "array",
+                            "items": {"type": "string", "format": "binary"},
+                            "maxItems": config.UPLOAD_BATCH_MAX_SIZE,
+                        },
+                        "include_word_timestamps": {"type": "boolean", "default": False},
+                        "model": {
+                            "type": "string",
+                            "description": "Whisper model to transcribe with (the default one if not given).",
+                        },
+                    },
+                }
+            },
+            "application/json": {"schema": BatchUploadRequest.model_json_schema()},
+        },
+    }
+}
+
+
+async def _receive_batch_files(request: Request, backlog_estimate: BacklogEstimate) -> BatchUploadResponse:
+    """Receive the files of a batch upload form (streamed to the disk, as by `/upload`) and enqueue them."""
+    timestamp = datetime.now().astimezone().replace(microsecond=0).isoformat()
+    upload_paths: List[Path] = []
+
+    def open_file(filename: str, fields: Dict[str, str]) -> UploadWriter:
+        filename = Path(filename).name
+        _check_media_type(filename)
+        # The fields sent before the files are validated before they're received.
+        if "model" in fields:
+            _get_model_name(fields["model"])
+        upload_path = config.UPLOADS_DIR / f"{timestamp}_{filename}"
+        # Would be the same reference ID.
+        if upload_path in upload_paths:
+            raise HTTPException(status_code=400, detail=f"Duplicate file name in the batch: {filename}.")
+        upload_paths.append(upload_path)
+        # The content hash is needed only for the deduplication.
+        return UploadWriter(upload_path, MAX_UPLOAD_SIZE, hash_content=config.RESULT_CACHE_ENABLED)
+
+    started_at = time.monotonic()
+    try:
+        try:
+            fields, writers = await receive_multipart_uploads(request, open_file, config.UPLOAD_BATCH_MAX_SIZE)
+            upload_write_duration = time.monotonic() - started_at
+            model_name = _get_model_name(fields.get("model"))
+            include_word_timestamps = _BOOL_ADAPTER.validate_python(fields.get("include_word_timestamps", False))
+        except BaseException:
+            for upload_path in upload_paths:
+                upload_path.unlink(missing_ok=True)
+            raise
+    except HTTPException:
+        raise
+    except UploadTooLargeError:
+        raise _get_upload_too_large_error()
+    except MalformedUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ValidationError:
+        raise HTTPException(status_code=422, detail="Invalid include_word_timestamps, a boolean is expected.")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Error uploading the files.")
+
+    uploads = [
+        _Upload(upload_path.name, include_word_timestamps, model_name, writer.get_content_hash())
+        for upload_path, writer in zip(upload_paths, writers)
+    ]
+    batch_id = create_batch_id()
+    # The write duration of the batch is observed as the average per file.
+    items = await run_in_threadpool(
+        _enqueue_uploads, request, uploads, backlog_estimate, upload_write_duration / len(uploads), batch_id
+    )
+    return BatchUploadResponse(batch_id=batch_id, items=items)
+
+
+def _move_upload_sessions_files(sessions: List[UploadSession], upload_paths: List[Path]) -> List[Optional[str]]:
+    """
+    Move the files of the finished upload sessions to the uploads directory – all of them, or none (the ones already
+    moved are moved back on a failure).
+
+    Returns:
+        List[Optional[str]]: The SHA-256 hex digests of the files content, if needed for the deduplication.
+    """
+    content_hashes = []
+    try:
+        for session, upload_path in zip(sessions, upload_paths):
+            content_hashes.append(_move_upload_session_file(session, upload_path))
+    except BaseException:
+        _restore_upload_sessions_files(sessions[: len(content_hashes)], upload_paths)
+        raise
+    return content_hashes
+
+
+def _restore_upload_sessions_files(sessions: List[UploadSession], upload_paths: List[Path]) -> None:
+    for session, upload_path in zip(sessions, upload_paths):
+        os.replace(upload_path, session.path)
+
+
+async def _finalize_batch_sessions(
+    request: Request, batch_request: BatchUploadRequest, backlog_estimate: BacklogEstimate
+) -> BatchUploadResponse:
+    """Finalize the resumable uploads of a batch manifest at once (see `/upload/sessions/{session_id}/finalize`)."""
+    redis_conn = request.app.state.async_redis_conn
+    sessions = []
+    for session_id in dict.fromkeys(batch_request.session_ids):
+        session = await get_upload_session(redis_conn, session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Upload session {session_id} not found (or expired).")
+        sessions.append(session)
+
+    timestamp = datetime.now().astimezone().replace(microsecond=0).isoformat()
+    upload_paths = [config.UPLOADS_DIR / f"{timestamp}_{session.filename}" for session in sessions]
+    if len(set(upload_paths)) != len(upload_paths):
+        raise HTTPException(status_code=400, detail="Duplicate file names in the batch.")
+    try:
+        async with AsyncExitStack() as stack:
+            for session in sessions:
+                await stack.enter_async_context(lock_upload_session(redis_conn, session.session_id))
+            offsets = await run_in_threadpool(lambda: [_get_upload_session_offset(session) for session in sessions])
+            for session, offset in zip(sessions, offsets):
+                if offset == 0 or (session.size is not None and offset != session.size):
+                    raise HTTPException(
+                        status_code=409,
+                        detail=f"The upload {session.session_id} is not complete, {offset} of "
+                        f"{session.size or 'unknown number of'} bytes received.",
+                    )
+
+            content_hashes = await run_in_threadpool(_move_upload_sessions_files, sessions, upload_paths)
+            uploads = [
+                _Upload(upload_path.name, session.include_word_timestamps, session.model_name, content_hash)
+                for session, upload_path, content_hash in zip(sessions, upload_paths, content_hashes)
+            ]
+            batch_id = create_batch_id()
+            try:
+                items = await run_in_threadpool(_enqueue_uploads, request, uploads, backlog_estimate, None, batch_id)
+            except BaseException:
+                # Back to the sessions, so the finalization can be retried.
+                await run_in_threadpool(_restore_upload_sessions_files, sessions, upload_paths)
+                raise
+            await redis_conn.delete(*(get_upload_session_key(session.session_id) for session in sessions))
+    except UploadSessionBusyError:
+        raise HTTPException(status_code=409, detail="An upload of the batch is being appended to.")
+    return BatchUploadResponse(batch_id=batch_id, items=items)
+
+
+@api_router.post("/upload/batch", response_model=BatchUploadResponse, openapi_extra=_UPLOAD_BATCH_OPENAPI_EXTRA)
+async def upload_batch(request: Request):
+    """
+    Submit many files for transcription at once – either uploaded in a single form (up to `UPLOAD_BATCH_MAX_SIZE`
+    files in the `file` fields, with the options shared by all of them), or as a JSON manifest of the resumable
+    uploads to finalize (`{"session_ids": [...]}`, all of their data received). All of them are enqueued together,
+    in a single round trip to Redis, under a batch ID to follow their aggregate status with (`/upload/batch/{batch_id}`).
+
+    As with `/upload`, while the backlog is estimated to take longer than the configured limit, the batches are
+    rejected with 429 (the files are not received then, the upload sessions are kept).
+    """
+    backlog_estimate = await run_in_threadpool(_check_backlog, request.app.state.redis_conn)
+    content_type, _ = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"multipart/form-data":
+        return await _receive_batch_files(request, backlog_estimate)
+    if content_type != b"application/json":
+        raise HTTPException(status_code=415, detail="A multipart form or a JSON manifest is expected.")
+    try:
+        batch_request = BatchUploadRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(e.errors(include_url=False))
+    return await _finalize_batch_sessions(request, batch_request, backlog_estimate)
+
+
+@api_router.get("/upload/batch/{batch_id}", response_model=BatchStatusResponse)
+async def get_batch_status(request: Request, batch_id: str, include_items: bool = Query(False)):
+    """
+    Get the aggregate status of a batch – the number of its uploads by their status, and whether all of them are
+    finished. The statuses of all the uploads are included with `include_items`.
+    """
+    redis_conn = request.app.state.async_redis_conn
+    batch = await get_batch(redis_conn, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found (or expired).")
+    transcription_statuses = await _get_transcription_statuses(batch.reference_ids, redis_conn)
+    counts = Counter(transcription_status.status for transcription_status in transcription_statuses)
+    return BatchStatusResponse(
+        batch_id=batch.batch_id,
+        created_at=datetime.fromtimestamp(batch.created_at, timezone.utc),
+        total=len(batch.reference_ids),
+        counts={status: counts.get(status, 0) for status in TranscriptionStatusEnum},
+        # The unknown ones (e.g. deleted) are not going to change either.
+        finished=all(
+            transcription_status.status in (*FINISHED_TRANSCRIPTION_STATUSES, TranscriptionStatusEnum.UNKNOWN)
+            for transcription_status in transcription_statuses
+        ),
+        items=transcription_statuses if include_items else None,
+    )
+
+
+_JOB_STATUS_TO_TRANSCRIPTION_STATUS = {
+    JobStatus.QUEUED: TranscriptionStatusEnum.QUEUED,
+    JobStatus.STARTED: TranscriptionStatusEnum.PROCESSING,
+    JobStatus.FINISHED: TranscriptionStatusEnum.COMPLETED,
+    JobStatus.FAILED: TranscriptionStatusEnum.FAILED,
+}
+
+
+async def _get_transcription_statuses(reference_ids: List[str], redis_conn: AsyncRedis) -> List[TranscriptionStatus]:
+    """
+    Resolve the transcription statuses of many jobs at once. Instead of fetching (and deserializing) the whole job
+    one by one, only the status fields (and the meta with the progress of the processed jobs, or the silence skipping
+    report of the completed ones) are read, with all the jobs in a single pipelined round trip. Error messages are
+    fetched in a second round trip, only for the failed jobs. The jobs missing in Redis are looked up in the archive
+    (see `transcription_service.retention`), the ones missing there as well get the UNKNOWN status.
+    """
+    async with redis_conn.pipeline(transaction=False) as pipeline:
+        for reference_id in reference_ids:
+            pipeline.hmget(Job.key_for(reference_id), "status", "exc_info", "meta")
+        jobs_fields = await pipeline.execute()
+
+    transcription_statuses = []
+    failed_without_message = []
+    for reference_id, (raw_status, raw_exc_info, raw_meta) in zip(reference_ids, jobs_fields):
+        job_status = JobStatus(as_text(raw_status)) if raw_status else None
+        status = _JOB_STATUS_TO_TRANSCRIPTION_STATUS.get(job_status, TranscriptionStatusEnum.UNKNOWN)
         message = None
+        progress = None
+        silence_skipping = None
+        if status == TranscriptionStatusEnum.FAILED:
+            if raw_exc_info:
+                # Redis servers without streams support keep the (compressed) exception in the job hash itself.
+                try:
+                    message = as_text(zlib.decompress(raw_exc_info))
+                except zlib.error:
+                    message = as_text(raw_exc_info)
+            else:
+                failed_without_message.append(len(transcription_statuses))
+        elif status == TranscriptionStatusEnum.PROCESSING and raw_meta:
+            progress = resolve_serializer().loads(raw_meta).get("progress")
+        elif status == TranscriptionStatusEnum.COMPLETED and raw_meta:
+            silence_skipping = resolve_serializer().loads(raw_meta).get("silence_skipping")
+        transcription_statuses.append(
+            TranscriptionStatus(
+                reference_id=reference_id,
+                status=status,
+                error_message=message,
+                progress=progress,
+                silence_skipping=silence_skipping,
+            )
+        )
+
+    if failed_without_message:
+        # Otherwise, the exception is stored as the latest job result in the results stream.
+        async with redis_conn.pipeline(transaction=False) as pipeline:
+            for i in failed_without_message:
+                pipeline.xrevrange(Result.get_key(reference_ids[i]), "+", "-", count=1)
+            latest_results = await pipeline.execute()
+        for i, latest_result in zip(failed_without_message, latest_results):
+            if latest_result:
+                result_id, payload = latest_result[0]
+                result = Result.restore(reference_ids[i], as_text(result_id), payload, connection=redis_conn)
+                transcription_statuses[i].error_message = result.exc_string
 
-    return status, message
+    # The jobs compacted by the retention are in the archive instead.
+    unknown = [
+        i
+        for i, transcription_status in enumerate(transcription_statuses)
+        if transcription_status.status == TranscriptionStatusEnum.UNKNOWN
+    ]
+    if unknown:
+        archived_statuses = await run_in_threadpool(get_archived_statuses, [reference_ids[i] for i in unknown])
+        for i in unknown:
+            transcription_statuses[i] = archived_statuses.get(reference_ids[i], transcription_statuses[i])
+
+    return transcription_statuses
+
+
+async def _get_transcription_status(reference_id: str, redis_conn: AsyncRedis) -> TranscriptionStatus:
+    # Check the transcription job status
+    return (await _get_transcription_statuses([reference_id], redis_conn))[0]
+
+
+def _estimate_transcription_times(transcription_status: TranscriptionStatus, redis_conn: Redis) -> None:
+    """
+    Fill in the estimated start and finish times of a queued or processed transcription. A queued job is expected to
+    wait for the backlog ahead of it (the queues drained before its one and the part of its queue before it), while
+    the rest of a processed job takes as long as its processing so far suggests.
+    """
+    if transcription_status.status not in (TranscriptionStatusEnum.QUEUED, TranscriptionStatusEnum.PROCESSING):
+        return
+    raw_origin, raw_meta, raw_started_at = redis_conn.hmget(
+        Job.key_for(transcription_status.reference_id), "origin", "meta", "started_at"
+    )
+    if raw_origin is None:
+        return
+    duration = resolve_serializer().loads(raw_meta).get("duration") if raw_meta else None
+    backlog_estimate = get_backlog_estimate(redis_conn)
+    now = datetime.now(timezone.utc)
+
+    if transcription_status.status == TranscriptionStatusEnum.PROCESSING:
+        progress = transcription_status.progress
+        if raw_started_at:
+            transcription_status.estimated_start_at = utcparse(as_text(raw_started_at)).replace(tzinfo=timezone.utc)
+        if progress is not None and progress.real_time_factor is not None:
+            remaining_duration = progress.duration_seconds - progress.processed_seconds
+            transcription_status.estimated_finish_at = now + timedelta(seconds=remaining_duration * progress.real_time_factor)
+        return
+
+    queue = Queue(as_text(raw_origin), connection=redis_conn)
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.lpos(queue.key, transcription_status.reference_id)
+        pipeline.llen(queue.key)
+        position, queue_length = pipeline.execute()
+    # Jobs not in the queue anymore are already claimed by a worker (prefetched), so they are next.
+    queued_ahead_fraction = position / queue_length if position is not None and queue_length else 0.0
+    estimated_start_at = backlog_estimate.estimate_start(
+        now, backlog_estimate.get_work_ahead(queue.name, queued_ahead_fraction)
+    )
+    processing_time = backlog_estimate.estimate_processing_time(duration, parse_model_queue_name(queue.name)[1])
+    transcription_status.estimated_start_at = estimated_start_at
+    if estimated_start_at is not None and processing_time is not None:
+        transcription_status.estimated_finish_at = estimated_start_at + processing_time
 
 
 @api_router.get("/list", response_model=ListTranscriptionStatusesPaginatedResponse)
-def list_transcriptions(
+async def list_transcriptions(
     request: Request,
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
-    sort_order: str = Query("asc", regex="^(asc|desc)$", description="Sort order by file creation time."),
+    sort_order: str = Query("asc", regex="^(asc|desc)$", description="Sort order by file upload time."),
+    cursor: Optional[str] = Query(
+        None, description="Cursor returned as `next_cursor` by the previous call – takes precedence over `page`."
+    ),
 ):
     """
     Get a paginated list of all files to transcribe and their transcription status.
     """
-    transcription_statuses = []
+    redis_conn = request.app.state.async_redis_conn
+    descending = sort_order == "desc"
 
-    # List all files for transcription in the upload directory
-    reference_ids = sorted(
-        (path.name for path in config.UPLOADS_DIR.iterdir()),
-        key=lambda x: (config.UPLOADS_DIR / x).stat().st_ctime,
-        reverse=sort_order == "desc",
-    )
-    total = len(reference_ids)
+    # Page through the uploads index – either from the cursor or from the offset of the requested page.
+    if cursor is not None:
+        try:
+            reference_ids, start, total = await get_uploads_page_after(redis_conn, decode_cursor(cursor), size, descending)
+        except (ValueError, KeyError):
+            raise HTTPException(status_code=400, detail="Invalid or expired cursor.")
+        page = None
+    else:
+        start = (page - 1) * size
+        reference_ids, total = await get_uploads_page(redis_conn, start, size, descending)
 
-    # Calculate start and end indices for the current page
-    start = (page - 1) * size
-    end = start + size
+    next_cursor = encode_cursor(reference_ids[-1]) if reference_ids and start + size < total else None
 
-    # Get only the transcriptions for the current page
-    reference_ids = reference_ids[start:end]
+    transcription_statuses = await _get_transcription_statuses(reference_ids, redis_conn)
 
-    for reference_id in reference_ids:
-        status, error_message = _get_job_status_and_error_message(reference_id, request.app.state.redis_conn)
-        transcription_statuses.append(
-            TranscriptionStatus(reference_id=reference_id, status=status, error_message=error_message)
-        )
+    return ListTranscriptionStatusesPaginatedResponse(
+        items=transcription_statuses, total=total, page=page, size=size, next_cursor=next_cursor
+    )
 
-    return ListTranscriptionStatusesPaginatedResponse(items=transcription_statuses, total=total, page=page, size=size)
+
+@api_router.post("/status/batch", response_model=BatchTranscriptionStatusesResponse)
+async def get_statuses_batch(request: Request, batch_request: BatchTranscriptionStatusesRequest):
+    """
+    Get the transcription statuses for many files at once. Reference IDs which were never uploaded are returned
+    in the `not_found` list.
+    """
+    redis_conn = request.app.state.async_redis_conn
+    reference_ids = list(dict.fromkeys(batch_request.reference_ids))
+    indexed = await are_in_uploads_index(redis_conn, reference_ids)
+    found_reference_ids = [reference_id for reference_id, is_indexed in zip(reference_ids, indexed) if is_indexed]
+    not_found_reference_ids = [reference_id for reference_id, is_indexed in zip(reference_ids, indexed) if not is_indexed]
+
+    items = await _get_transcription_statuses(found_reference_ids, redis_conn)
+    return BatchTranscriptionStatusesResponse(items=items, not_found=not_found_reference_ids)
 
 
 @api_router.get("/status/{reference_id}", response_model=TranscriptionStatus)
 async def get_status(request: Request, reference_id: str):
     """
-    Get the transcription status for a specific file.
+    Get the transcription status for a specific file, along with the estimated start and finish of the queued or
+    processed transcription.
+    """
+    reference_id = unquote(reference_id)
+    redis_conn = request.app.state.async_redis_conn
+    if not await is_in_uploads_index(redis_conn, reference_id):
+        raise HTTPException(status_code=404, detail="Reference not found.")
+    transcription_status = await _get_transcription_status(reference_id, redis_conn)
+    if transcription_status.status in (TranscriptionStatusEnum.QUEUED, TranscriptionStatusEnum.PROCESSING):
+        # The estimation reads the state of all the queues and workers – only for the unfinished jobs, off the loop.
+        await run_in_threadpool(_estimate_transcription_times, transcription_status, request.app.state.redis_conn)
+    return transcription_status
+
+
+@api_router.get("/partial/{reference_id}", response_model=PartialTranscriptionResponse)
+async def get_partial_transcription(request: Request, reference_id: str, offset: int = Query(0, ge=0)):
+    """
+    Get the transcript produced so far for a specific file (the segments starting from the given offset, so it can be
+    followed incrementally), along with the transcription progress. For the finished transcriptions, the complete
+    result is available for download.
     """
     reference_id = unquote(reference_id)
-    if reference_id not in (path.name for path in config.UPLOADS_DIR.iterdir()):
+    redis_conn = request.app.state.async_redis_conn
+    if not await is_in_uploads_index(redis_conn, reference_id):
         raise HTTPException(status_code=404, detail="Reference not found.")
-    status, error_message = _get_job_status_and_error_message(reference_id, request.app.state.redis_conn)
-    return TranscriptionStatus(reference_id=reference_id, status=status, error_message=error_message)
+    transcription_status = await _get_transcription_status(reference_id, redis_conn)
+    return PartialTranscriptionResponse(
+        reference_id=reference_id,
+        status=transcription_status.status,
+        progress=transcription_status.progress,
+        offset=offset,
+        segments=await get_partial_transcript(redis_conn, reference_id, offset),
+    )
+
+
+def _format_server_sent_event(transcription_status: TranscriptionStatus) -> str:
+    return f"event: status\ndata: {transcription_status.model_dump_json()}\n\n"
+
+
+async def _stream_job_events(
+    request: Request, pubsub: AsyncPubSub, current_status: Optional[TranscriptionStatus] = None
+) -> AsyncIterator[str]:
+    """
+    Stream the job status transitions received by the (already subscribed) pub/sub as server-sent events. If the
+    current status of a single job is given, it's sent first, and the stream ends once the job is finished.
+    """
+    try:
+        if current_status is not None:
+            yield _format_server_sent_event(current_status)
+            if current_status.status in FINISHED_TRANSCRIPTION_STATUSES:
+                return
+
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=EVENTS_KEEPALIVE_INTERVAL)
+            if message is None:
+                # Comment line, so the idle connections are not closed by the proxies.
+                yield ": keepalive\n\n"
+                continue
+
+            transcription_status = TranscriptionStatus.model_validate_json(message["data"])
+            yield _format_server_sent_event(transcription_status)
+            if current_status is not None and transcription_status.status in FINISHED_TRANSCRIPTION_STATUSES:
+                return
+    finally:
+        await pubsub.aclose()
+
+
+@api_router.get("/events")
+async def stream_all_events(request: Request):
+    """
+    Stream the status transitions of all the transcription jobs as server-sent events (`status` events with the same
+    data as returned by `/status/{reference_id}`).
+    """
+    pubsub = request.app.state.async_redis_conn.pubsub()
+    await pubsub.psubscribe(ALL_JOB_EVENTS_PATTERN)
+    return StreamingResponse(
+        _stream_job_events(request, pubsub), media_type="text/event-stream", headers={"Cache-Control": "no-cache"}
+    )
+
+
+@api_router.get("/events/{reference_id}")
+async def stream_events(request: Request, reference_id: str):
+    """
+    Stream the status transitions of a specific file's transcription as server-sent events (`status` events with the
+    same data as returned by `/status/{reference_id}`) – starting with the current status, until it's completed or
+    failed. Events are not persisted, so on reconnect the current status is sent again.
+    """
+    reference_id = unquote(reference_id)
+    redis_conn = request.app.state.async_redis_conn
+    if not await is_in_uploads_index(redis_conn, reference_id):
+        raise HTTPException(status_code=404, detail="Reference not found.")
+
+    # Subscribed before checking the current status, so no transition in between is missed.
+    pubsub = redis_conn.pubsub()
+    await pubsub.subscribe(get_job_events_channel(reference_id))
+    current_status = await _get_transcription_status(reference_id, redis_conn)
+    return StreamingResponse(
+        _stream_job_events(request, pubsub, current_status),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+def _parse_quality_values(header: str) -> Dict[str, float]:
+    """Parse the `Accept`-like header to the quality values of its (lowercase) items, in the order they are listed."""
+    quality_values: Dict[str, float] = {}
+    for item in header.split(","):
+        name, *params = item.split(";")
+        quality_value = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality_value = float(value)
+                except ValueError:
+                    quality_value = 0.0
+        if name.strip():
+            quality_values[name.strip().lower()] = quality_value
+    return quality_values
+
+
+def _negotiate_result_format(accept: str) -> ResultFormat:
+    """Get the format of the result preferred by the `Accept` header – the legacy one if none of them is accepted."""
+    accepted_formats = [
+        (quality_value, RESULT_FORMATS_BY_MEDIA_TYPE[media_type])
+        for media_type, quality_value in _parse_quality_values(accept).items()
+        if media_type in RESULT_FORMATS_BY_MEDIA_TYPE and quality_value > 0
+    ]
+    # The first one listed wins the ties.
+    return max(accepted_formats, key=lambda item: item[0], default=(0, ResultFormat.TXT))[1]
+
+
+def _negotiate_result_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Get the content coding (of the given ones, in the order of preference) accepted the most by the client."""
+    quality_values = _parse_quality_values(accept_encoding)
+    accepted_encodings = [
+        (quality_value, encoding)
+        for encoding in encodings
+        if (quality_value := quality_values.get(encoding, quality_values.get("*", 0))) > 0
+    ]
+    return max(accepted_encodings, key=lambda item: item[0], default=(0, None))[1]
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse the `Range` header to the first and the last byte requested. Only a single range is supported – the other
+    ones (and the invalid ones, e.g. ending before their start) are ignored, the whole file is sent then (RFC 9110).
+
+    Raises:
+        HTTPException: If the range is not satisfiable (416) – it starts past the end of the file.
+    """
+    match = RANGE_PATTERN.fullmatch(range_header.strip())
+    if match is None or match.group(1) == match.group(2) == "":
+        return None
+    if match.group(1) == "":
+        # Suffix range – the last N bytes.
+        start, end = max(size - int(match.group(2)), 0), size - 1
+    else:
+        start = int(match.group(1))
+        if match.group(2) and int(match.group(2)) < start:
+            return None
+        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    if start >= size:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable.", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+
+def _get_content_disposition(filename: str) -> str:
+    """Get the `Content-Disposition` of the download (the same one `FileResponse` sets)."""
+    quoted_filename = quote(filename)
+    if quoted_filename != filename:
+        return f"attachment; filename*=utf-8''{quoted_filename}"
+    return f'attachment; filename="{filename}"'
+
+
+def _get_result_files(reference_id: str, result_format: ResultFormat) -> Dict[Optional[str], os.stat_result]:
+    """Get the existing files of the result in the format, by their content coding (None for the plain one)."""
+    result_files = {}
+    for encoding in (None, *RESULT_ENCODING_SUFFIXES):
+        try:
+            result_files[encoding] = get_result_path(reference_id, result_format, encoding).stat()
+        except FileNotFoundError:
+            pass
+    return result_files
+
+
+def _iter_file_range(path: Path, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0 and (chunk := f.read(min(DOWNLOAD_CHUNK_SIZE, length))):
+            length -= len(chunk)
+            yield chunk
+
+
+def _iter_decompressed_file(path: Path, encoding: str) -> Iterator[bytes]:
+    decompressor = get_decompressor(encoding)
+    with open(path, "rb") as f:
+        while chunk := f.read(DOWNLOAD_CHUNK_SIZE):
+            if data := decompressor.decompress(chunk):
+                yield data
 
 
 @api_router.get("/download/{reference_id}", response_class=FileResponse)
-async def download_transcription(request: Request, reference_id: str):
+async def download_transcription(
+    request: Request,
+    reference_id: str,
+    result_format: Optional[ResultFormat] = Query(
+        None,
+        alias="format",
+        description="Format of the result, defaults to the one preferred by the `Accept` header, or the legacy `txt`.",
+    ),
+):
+    """
+    Download the transcription result. The results are stored precompressed, so they are sent as they are (with
+    `Content-Encoding`) to the clients accepting their content coding (`Accept-Encoding`) – decompressed on the fly
+    otherwise. Single byte ranges (`Range`, `If-Range`) of the stored files are supported, to resume the downloads.
+    """
     reference_id = unquote(reference_id)
-    if reference_id not in (path.name for path in config.UPLOADS_DIR.iterdir()):
+    redis_conn = request.app.state.async_redis_conn
+    if not await is_in_uploads_index(redis_conn, reference_id):
         raise HTTPException(status_code=404, detail="Reference not found.")
 
-    job_status, error_message = _get_job_status_and_error_message(reference_id, request.app.state.redis_conn)
+    job_status = (await _get_transcription_status(reference_id, redis_conn)).status
     if job_status != TranscriptionStatusEnum.COMPLETED:
         raise HTTPException(
             status_code=400, detail=f"Transcription not yet completed or failed. " f"Current status: {job_status}"
         )
 
-    transcription_path = config.TRANSCRIPTIONS_DIR / f"{reference_id}.txt"
+    if result_format is None:
+        result_format = _negotiate_result_format(request.headers.get("accept", ""))
+    result_files = await run_in_threadpool(_get_result_files, reference_id, result_format)
+    if not result_files:
+        # E.g. the results transcribed before the format was enabled.
+        raise HTTPException(status_code=404, detail=f"Transcription not available in the {result_format.value} format.")
+
+    encoding = _negotiate_result_encoding(
+        request.headers.get("accept-encoding", ""), [encoding for encoding in result_files if encoding is not None]
+    )
+    media_type = RESULT_MEDIA_TYPES[result_format]
+    headers = {
+        "Content-Disposition": _get_content_disposition(f"{reference_id}_transcription.{result_format.value}"),
+        "Vary": "Accept, Accept-Encoding",
+    }
+    if encoding is None and None not in result_files:
+        # Stored only compressed, with a content coding the client doesn't accept.
+        stored_encoding = next(iter(result_files))
+        return StreamingResponse(
+            _iter_decompressed_file(get_result_path(reference_id, result_format, stored_encoding), stored_encoding),
+            media_type=media_type,
+            headers=headers,
+        )
+
+    path = get_result_path(reference_id, result_format, encoding)
+    stat_result = result_files[encoding]
+    etag = f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}-{encoding or "identity"}"'
+    headers.update({"ETag": etag, "Accept-Ranges": "bytes"})
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    byte_range = _parse_range(range_header, stat_result.st_size) if range_header and if_range in (None, etag) else None
+    if byte_range is None:
+        return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result)
+    start, end = byte_range
+    headers.update({"Content-Range": f"bytes {start}-{end}/{stat_result.st_size}", "Content-Length": str(end - start + 1)})
+    return StreamingResponse(
+        _iter_file_range(path, start, end - start + 1), status_code=206, media_type=media_type, headers=headers
+    )
+
+
+@api_router.get("/cache/stats", response_model=ResultCacheStatsResponse)
+def result_cache_stats(request: Request):
+    """
+    Get the hit/miss counters and the number of entries of the transcription results (deduplication) cache.
+    """
+    return ResultCacheStatsResponse(**get_result_cache_stats(request.app.state.redis_conn))
 
-    return FileResponse(transcription_path, filename=f"{reference_id}_transcription.txt")
+
+@api_router.get("/metrics", response_class=PlainTextResponse)
+def metrics(request: Request):
+    """
+    Get the metrics of the whole service (the API and all the workers) in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(request.app.state.redis_conn), media_type=METRICS_CONTENT_TYPE)
 
 
 @api_router.get("/ping")
@@ -163,26 +1278,26 @@ def ping_check():
     return {"ping": "pong"}
 
 
-def check_redis_health(redis_conn: Redis) -> bool:
+async def check_redis_health(redis_conn: AsyncRedis) -> bool:
     """Check the health of the Redis connection/DB."""
     try:
-        redis_conn.ping()
+        await redis_conn.ping()
         return True
     except Exception as e:
         return False
 
 
-def check_redis_workers(redis_conn: Redis) -> bool:
+async def check_redis_workers(redis_conn: AsyncRedis) -> bool:
     """Check the health of the Redis workers."""
     try:
         # Check Redis workers' connectivity and status
-        worker_queues = redis_conn.smembers("rq:workers")
+        worker_queues = await redis_conn.smembers("rq:workers")
 
         if not worker_queues:
             return False  # No workers registered
 
         for worker_key in worker_queues:
-            worker_info = redis_conn.hgetall(worker_key)
+            worker_info = await redis_conn.hgetall(worker_key)
             if worker_info:
                 return True
 
@@ -192,10 +1307,10 @@ def check_redis_workers(redis_conn: Redis) -> bool:
 
 
 @api_router.get("/health", response_model=HealthCheckResponse)
-def health_check(request: Request):
-    redis_health = check_redis_health(request.app.state.redis_conn)
+async def health_check(request: Request):
+    redis_health = await check_redis_health(request.app.state.async_redis_conn)
     web_app_health = True  # We're running, so it's healthy
-    workers_health = check_redis_workers(request.app.state.redis_conn)
+    workers_health = await check_redis_workers(request.app.state.async_redis_conn)
 
     return HealthCheckResponse(
         redis_is_healthy=redis_health, web_app_is_healthy=web_app_health, at_least_one_worker_is_healthy=workers_health
@@ -0,0 +1,131 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import ffmpeg
+import numpy as np
+
+# Input format of the whisper models: mono, 16 kHz, float32 in the [-1, 1] range.
+SAMPLE_RATE = 16000
+# Capacity of the decoding buffer (in seconds of audio) if the expected duration is not known – it grows as needed.
+DEFAULT_BUFFER_DURATION = 10 * 60
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+def decode_audio(
+    path: Path,
+    start: Optional[float] = None,
+    duration: Optional[float] = None,
+    expected_duration: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Decode the audio (track) of a media file into the input format of the whisper models, in memory.
+
+    The raw PCM output of ffmpeg is piped straight into a preallocated float32 array – without temporary files, and
+    without whisper decoding it (with another ffmpeg process) again. Works the same for both audio and video files.
+
+    Args:
+        path (Path): Path to the media file.
+        start (Optional[float]): Start of the decoded part in seconds (from the beginning if not given).
+        duration (Optional[float]): Duration of the decoded part in seconds (till the end if not given).
+        expected_duration (Optional[float]): Expected duration of the decoded audio in seconds, if known upfront
+            (e.g. probed) – used to allocate the buffer at once.
+
+    Returns:
+        np.ndarray: Mono 16 kHz float32 audio samples.
+
+    Raises:
+        ffmpeg.Error: If ffmpeg fails to decode the file.
+    """
+    input_kwargs = {}
+    if start is not None:
+        # Seeking is done on the input side, so ffmpeg doesn't have to decode everything before the start.
+        input_kwargs["ss"] = start
+    if duration is not None:
+        input_kwargs["t"] = duration
+    process = (
+        ffmpeg.input(str(path), **input_kwargs)
+        .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=SAMPLE_RATE)
+        .global_args("-nostdin", "-loglevel", "error")
+        .run_async(pipe_stdout=True, pipe_stderr=True)
+    )
+
+    buffer_duration = duration or expected_duration or DEFAULT_BUFFER_DURATION
+    audio = np.empty(int(buffer_duration * SAMPLE_RATE) + SAMPLE_RATE, dtype=np.float32)
+    samples_count = 0
+    leftover = b""
+    while chunk := process.stdout.read(READ_CHUNK_SIZE):
+        chunk = leftover + chunk
+        # Chunks don't have to be aligned to the 2 bytes samples.
+        aligned_size = len(chunk) - len(chunk) % 2
+        chunk, leftover = chunk[:aligned_size], chunk[aligned_size:]
+
+        samples = np.frombuffer(chunk, dtype=np.int16)
+        if samples_count + len(samples) > len(audio):
+            audio.resize(max(2 * len(audio), samples_count + len(samples)), refcheck=False)
+        decoded = audio[samples_count : samples_count + len(samples)]
+        decoded[:] = samples
+        decoded *= 1 / 32768.0
+        samples_count += len(samples)
+
+    process.stdout.close()
+    stderr = process.stderr.read()
+    process.stderr.close()
+    if process.wait() != 0:
+        raise ffmpeg.Error("ffmpeg", b"", stderr)
+
+    # Release the unused part of the buffer.
+    audio.resize(samples_count, refcheck=False)
+    return audio
+
+
+def get_media_duration(path: Path) -> Optional[float]:
+    """Probe the duration of the media file in seconds (None if it can't be determined)."""
+    try:
+        return float(ffmpeg.probe(str(path))["format"]["duration"])
+    except (ffmpeg.Error, KeyError, ValueError):
+        return None
+
+
+# Audio of the jobs claimed ahead of time by the worker, decoded in the background while the current job is being
+# transcribed. Keyed by the job ID.
+_PREFETCHED_AUDIO: Dict[str, Future] = {}
+_PREFETCH_EXECUTOR: Optional[ThreadPoolExecutor] = None
+
+
+def start_audio_prefetch(job_id: str, load_audio: Callable[[], Optional[np.ndarray]]) -> None:
+    """
+    Start loading the audio of the given job on a background thread.
+
+    Args:
+        job_id (str): ID of the job the audio is loaded for.
+        load_audio (Callable[[], Optional[np.ndarray]]): Function loading the audio, it can return None if the job
+            turns out to not need it.
+    """
+    global _PREFETCH_EXECUTOR
+    if _PREFETCH_EXECUTOR is None:
+        _PREFETCH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-prefetch")
+    _PREFETCHED_AUDIO[job_id] = _PREFETCH_EXECUTOR.submit(load_audio)
+
+
+def take_prefetched_audio(job_id: str) -> Optional[np.ndarray]:
+    """
+    Get the prefetched audio of the given job (waiting for its loading to finish if needed).
+
+    Returns:
+        Optional[np.ndarray]: The audio, or None if it was not prefetched or the prefetching failed – the job should
+        load it on its own then (failing the regular way if the audio is broken).
+    """
+    future = _PREFETCHED_AUDIO.pop(job_id, None)
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception:
+        return None
+
+
+def discard_prefetched_audio(job_id: str) -> None:
+    future = _PREFETCHED_AUDIO.pop(job_id, None)
+    if future is not None:
+        future.cancel()
@@ -0,0 +1,53 @@
+import json
+import re
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.client import Pipeline
+from rq.utils import as_text
+
+from transcription_service import config
+
+# Hashes of the batches of the uploads submitted at once, by batch ID – the reference IDs of their uploads (in the
+# order they were submitted), expiring BATCH_TTL seconds after the submission.
+BATCH_KEY_PREFIX = "transcription_service:batch:"
+# Batch IDs are UUID4 hex – anything else is not looked up.
+BATCH_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+@dataclass
+class Batch:
+    batch_id: str
+    reference_ids: List[str]
+    # Unix timestamp.
+    created_at: float
+
+
+def get_batch_key(batch_id: str) -> str:
+    return f"{BATCH_KEY_PREFIX}{batch_id}"
+
+
+def create_batch_id() -> str:
+    return uuid.uuid4().hex
+
+
+def add_batch(redis_conn: Union[Redis, Pipeline], batch_id: str, reference_ids: List[str]) -> None:
+    """Record the batch – within the pipeline enqueueing its uploads, so it exists only if they were enqueued."""
+    redis_conn.hset(get_batch_key(batch_id), mapping={"reference_ids": json.dumps(reference_ids), "created_at": time.time()})
+    redis_conn.expire(get_batch_key(batch_id), config.BATCH_TTL)
+
+
+async def get_batch(redis_conn: AsyncRedis, batch_id: str) -> Optional[Batch]:
+    """Get the batch – None if it doesn't exist (e.g. it expired)."""
+    if not BATCH_ID_PATTERN.fullmatch(batch_id):
+        return None
+    raw_reference_ids, raw_created_at = await redis_conn.hmget(get_batch_key(batch_id), "reference_ids", "created_at")
+    if raw_reference_ids is None:
+        return None
+    return Batch(
+        batch_id=batch_id, reference_ids=json.loads(as_text(raw_reference_ids)), created_at=float(as_text(raw_created_at))
+    )
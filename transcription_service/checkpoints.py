@@ -0,0 +1,141 @@
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from transcription_service import config
+
+# Bumped whenever the layout of the checkpoints changes, so the stale ones are not resumed from.
+CHECKPOINT_FORMAT_VERSION = 1
+
+
+def get_checkpoint_path(reference_id: str) -> Path:
+    return config.CHECKPOINTS_DIR / f"{reference_id}.jsonl"
+
+
+def shift_segments(segments: List[dict], offset: float, include_words: bool) -> List[dict]:
+    """Get the segments (only the fields kept in the checkpoints) with their timestamps shifted by the offset."""
+    return [
+        {
+            "start": segment["start"] + offset,
+            "end": segment["end"] + offset,
+            "text": segment["text"],
+            **(
+                {
+                    "words": [
+                        {"word": word["word"], "start": word["start"] + offset, "end": word["end"] + offset}
+                        for word in segment.get("words", [])
+                    ]
+                }
+                if include_words
+                else {}
+            ),
+        }
+        for segment in segments
+    ]
+
+
+class TranscriptionCheckpoint:
+    """
+    Checkpoint of a running transcription – the segments transcribed so far are saved to a sidecar file (in
+    `CHECKPOINTS_DIR`), so a retried job continues from where the previous attempt stopped, rather than from the
+    beginning.
+
+    The file is a JSON object per line: the settings of the transcription (a checkpoint made with different ones is not
+    resumed from), followed by the saves – the new segments and the duration of the media processed so far. The saves
+    are appended, so they are cheap regardless of the length of the transcription, at most once per `min_interval`
+    seconds. A line written only partially (the worker killed while writing it) is ignored.
+    """
+
+    def __init__(
+        self,
+        reference_id: str,
+        model_name: str,
+        include_word_timestamps: bool,
+        min_interval: float = config.CHECKPOINT_INTERVAL,
+    ):
+        self.path = get_checkpoint_path(reference_id)
+        self.settings = {
+            "version": CHECKPOINT_FORMAT_VERSION,
+            "model_name": model_name,
+            "include_word_timestamps": include_word_timestamps,
+        }
+        self.min_interval = min_interval
+        self._last_saved_at: Optional[float] = None
+        self._saved_segments_count = 0
+
+    def _load(self) -> Tuple[float, List[dict]]:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return 0.0, []
+
+        processed_duration, segments = 0.0, []
+        for i, line in enumerate(lines):
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if i == 0:
+                if record != self.settings:
+                    return 0.0, []
+            else:
+                processed_duration = record["processed_seconds"]
+                segments.extend(record["segments"])
+        return processed_duration, segments
+
+    def start(self) -> Tuple[float, List[dict]]:
+        """
+        Start the checkpointing, resuming the progress of the previous attempts – the file is rewritten with it
+        (without a partially written line, if any), so the following saves are appended to it.
+
+        Returns:
+            Tuple[float, List[dict]]: The duration of the media processed by the previous attempts in seconds (0 if
+            there were none) and the segments transcribed by them.
+        """
+        processed_duration, segments = self._load()
+        records = [self.settings]
+        if segments:
+            records.append({"processed_seconds": processed_duration, "segments": segments})
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=self.path.parent, prefix=f".{self.path.name}.", delete=False
+        ) as f:
+            try:
+                f.writelines(json.dumps(record) + "\n" for record in records)
+            except BaseException:
+                os.unlink(f.name)
+                raise
+        os.replace(f.name, self.path)
+
+        self._last_saved_at = time.monotonic()
+        self._saved_segments_count = len(segments)
+        return processed_duration, segments
+
+    def save(self, processed_duration: float, segments: List[dict], force: bool = False) -> None:
+        """
+        Save the progress of the transcription.
+
+        Args:
+            processed_duration (float): Duration of the media processed so far in seconds.
+            segments (List[dict]): All the segments transcribed so far (as returned by `shift_segments`), including the
+                resumed ones – the ones already saved are expected to not change.
+            force (bool): Whether to save the progress regardless of the rate limiting.
+        """
+        now = time.monotonic()
+        if not force and self._last_saved_at is not None and now - self._last_saved_at < self.min_interval:
+            return
+        self._last_saved_at = now
+
+        record = {"processed_seconds": processed_duration, "segments": segments[self._saved_segments_count :]}
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._saved_segments_count = len(segments)
+
+    def delete(self) -> None:
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,92 @@
+import re
+from typing import List, Optional, Tuple
+
+
+def split_into_windows(duration: float, window_duration: float, overlap: float) -> List[Tuple[float, float]]:
+    """
+    Split the media timeline into overlapping windows, which can be transcribed independently.
+
+    Args:
+        duration (float): Duration of the whole media in seconds.
+        window_duration (float): Duration of a single window in seconds.
+        overlap (float): Duration of the overlap between the consecutive windows in seconds.
+
+    Returns:
+        List[Tuple[float, float]]: Start and duration of every window in seconds.
+    """
+    if overlap >= window_duration:
+        raise ValueError("Windows overlap has to be shorter than the windows themselves.")
+
+    windows = []
+    start = 0.0
+    while True:
+        windows.append((start, min(window_duration, duration - start)))
+        if start + window_duration >= duration:
+            break
+        start += window_duration - overlap
+    return windows
+
+
+def normalize_word(word: str) -> str:
+    """
+    Normalize the transcribed word for the comparison with another transcription of it – in the overlaps of the windows
+    and of the passes of the live streams (the casing, punctuation and whitespace of the same word vary with the
+    context), keeping the apostrophes (so "it's" is not "its").
+    """
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def merge_windows_segments(
+    windows: List[Tuple[float, float]], windows_segments: List[List[dict]], overlap: float
+) -> List[dict]:
+    """
+    Merge the segments transcribed from the overlapping windows into the segments of the whole media.
+
+    Timestamps are shifted by the window start. The overlap between two windows is split in the middle – a word is
+    kept only from the window in which its middle falls. Additionally, a word repeated on both sides of the cut
+    (the same word, overlapping in time) is de-duplicated.
+
+    Args:
+        windows (List[Tuple[float, float]]): Start and duration of every window, as returned by `split_into_windows`.
+        windows_segments (List[List[dict]]): Whisper segments (with words) of every window, timed from the window start.
+        overlap (float): Duration of the overlap between the consecutive windows in seconds.
+
+    Returns:
+        List[dict]: Merged segments (with `start`, `end`, `text` and `words`), timed from the media start.
+    """
+    merged_segments = []
+    last_word: Optional[dict] = None
+    for i, ((window_start, _), segments) in enumerate(zip(windows, windows_segments)):
+        lower_cut = window_start + overlap / 2 if i > 0 else float("-inf")
+        upper_cut = windows[i + 1][0] + overlap / 2 if i < len(windows) - 1 else float("inf")
+
+        for segment in segments:
+            words = []
+            for word_info in segment.get("words", []):
+                word = {
+                    "word": word_info["word"],
+                    "start": word_info["start"] + window_start,
+                    "end": word_info["end"] + window_start,
+                }
+                middle = (word["start"] + word["end"]) / 2
+                if not lower_cut <= middle < upper_cut:
+                    continue
+                if (
+                    last_word is not None
+                    and word["start"] < last_word["end"]
+                    and normalize_word(word["word"]) == normalize_word(last_word["word"])
+                ):
+                    continue
+                words.append(word)
+                last_word = word
+
+            if words:
+                merged_segments.append(
+                    {
+                        "start": words[0]["start"],
+                        "end": words[-1]["end"],
+                        "text": "".join(word["word"] for word in words),
+                        "words": words,
+                    }
+                )
+    return merged_segments
@@ -7,9 +7,143 @@ REDIS_DB = int(os.environ["REDIS_DB"])
 UPLOADS_DIR = Path(os.environ["UPLOADS_DIR"])
 TRANSCRIPTIONS_DIR = Path(os.environ["TRANSCRIPTIONS_DIR"])
 
+# Size of the threadpool of an API process, running the blocking work of its endpoints (e.g. writing the uploads to the
+# disk and enqueueing them) – and of its synchronous Redis connection pool – and the size of its async Redis
+# connection pool (used by the endpoints directly, the open events streams hold a connection each).
+API_THREADPOOL_SIZE = int(os.environ.get("API_THREADPOOL_SIZE", 40))
+API_REDIS_MAX_CONNECTIONS = int(os.environ.get("API_REDIS_MAX_CONNECTIONS", 200))
+
+# Transcription results – besides the legacy one (`<reference ID>.txt`), the workers write every one of RESULT_FORMATS
+# (comma separated: txt – the legacy one, json – compact, with numeric timestamps, ndjson – a segment per line, srt,
+# vtt) precompressed with every one of RESULT_ENCODINGS (gzip, and zstd if the `zstandard` package is installed), so
+# the downloads are served without serializing them again.
+RESULT_FORMATS = [
+    result_format
+    for result_format in map(str.strip, os.environ.get("RESULT_FORMATS", "txt,json,ndjson,srt,vtt").split(","))
+    if result_format
+]
+RESULT_ENCODINGS = [encoding for encoding in map(str.strip, os.environ.get("RESULT_ENCODINGS", "gzip").split(",")) if encoding]
+
+# Max size of an uploaded file in MB (0 for no limit). Unfinished resumable uploads (their data received so far kept in
+# UPLOAD_SESSIONS_DIR) are discarded UPLOAD_SESSION_TTL seconds after their last append.
+UPLOAD_MAX_SIZE_MB = float(os.environ.get("UPLOAD_MAX_SIZE_MB", 10 * 1024))
+UPLOAD_SESSION_TTL = int(os.environ.get("UPLOAD_SESSION_TTL", 24 * 60 * 60))
+UPLOAD_SESSIONS_DIR = Path(os.environ.get("UPLOAD_SESSIONS_DIR", UPLOADS_DIR / ".sessions"))
+
+# Maximum number of reference IDs accepted by a single batch status request.
+STATUS_BATCH_MAX_SIZE = int(os.environ.get("STATUS_BATCH_MAX_SIZE", 10000))
+
+# Batch submissions – max number of the files (or the upload sessions) submitted at once, and the time (in seconds)
+# their batches are kept to report the aggregate status of (the statuses of their uploads are kept regardless).
+UPLOAD_BATCH_MAX_SIZE = int(os.environ.get("UPLOAD_BATCH_MAX_SIZE", 1000))
+BATCH_TTL = int(os.environ.get("BATCH_TTL", 30 * 24 * 60 * 60))
+
+# Deduplication cache of the transcription results – re-uploads of the same content (transcribed with the same model
+# and format) are finished right away, reusing the existing transcription.
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 100000))
+# Entries not accessed for longer than that are evicted.
+RESULT_CACHE_MAX_AGE_SECONDS = int(os.environ.get("RESULT_CACHE_MAX_AGE_SECONDS", 30 * 24 * 60 * 60))
+
+# Fan-out transcription – media longer than FAN_OUT_MIN_DURATION (seconds, 0 disables it) are split into overlapping
+# windows transcribed in parallel by all the workers.
+FAN_OUT_MIN_DURATION = float(os.environ.get("FAN_OUT_MIN_DURATION", 0))
+FAN_OUT_WINDOW_DURATION = float(os.environ.get("FAN_OUT_WINDOW_DURATION", 10 * 60))
+FAN_OUT_WINDOW_OVERLAP = float(os.environ.get("FAN_OUT_WINDOW_OVERLAP", 10))
+
+# Number of the upcoming jobs claimed by a worker ahead of time, so their audio is decoded while the current job is
+# being transcribed (0 disables prefetching).
+WORKER_PREFETCH_DEPTH = int(os.environ.get("WORKER_PREFETCH_DEPTH", 0))
+
+# Number of the worker processes forked from a single worker container, sharing its (CPU) model copy-on-write, and
+# the number of torch threads of every one of them (0 splits the CPU cores evenly between them).
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", 1))
+WORKER_TORCH_THREADS = int(os.environ.get("WORKER_TORCH_THREADS", 0))
+
+# Minimal interval (in seconds) between the updates of the running jobs' progress and partial transcripts.
+PROGRESS_UPDATE_INTERVAL = float(os.environ.get("PROGRESS_UPDATE_INTERVAL", 5))
+
+# Silence skipping – the audio quieter than VAD_ENERGY_THRESHOLD_DB (dBFS, measured in 30 ms frames) for longer than
+# VAD_MIN_SILENCE_DURATION seconds is cut out before the inference (keeping VAD_SPEECH_PADDING seconds around the
+# speech), and the timestamps are mapped back to the original timeline.
+VAD_ENABLED = os.environ.get("VAD_ENABLED", "false").lower() == "true"
+VAD_ENERGY_THRESHOLD_DB = float(os.environ.get("VAD_ENERGY_THRESHOLD_DB", -45))
+VAD_MIN_SILENCE_DURATION = float(os.environ.get("VAD_MIN_SILENCE_DURATION", 2))
+VAD_SPEECH_PADDING = float(os.environ.get("VAD_SPEECH_PADDING", 0.3))
+
+# Checkpoints of the running transcriptions – the segments transcribed so far are saved every CHECKPOINT_INTERVAL
+# seconds (0 disables it) to the sidecar files in CHECKPOINTS_DIR, so the jobs retried (up to JOB_MAX_RETRIES times,
+# e.g. after their worker died or they timed out) continue from the last checkpoint rather than from the beginning.
+CHECKPOINT_INTERVAL = float(os.environ.get("CHECKPOINT_INTERVAL", 60))
+CHECKPOINTS_DIR = Path(os.environ.get("CHECKPOINTS_DIR", TRANSCRIPTIONS_DIR / ".checkpoints"))
+JOB_MAX_RETRIES = int(os.environ.get("JOB_MAX_RETRIES", 2))
+
+# Retention – the jobs finished (completed or failed) more than JOB_COMPACTION_MIN_AGE_SECONDS ago (0 keeps them in
+# Redis forever) are moved from Redis to the compact SQLite archive in JOB_ARCHIVE_PATH, the status of the archived
+# ones is read from there. The media of the archived jobs uploaded more than MEDIA_RETENTION_SECONDS ago (0 keeps
+# them) are deleted, or moved to MEDIA_ARCHIVE_DIR if set.
+JOB_COMPACTION_MIN_AGE_SECONDS = float(os.environ.get("JOB_COMPACTION_MIN_AGE_SECONDS", 24 * 60 * 60))
+JOB_ARCHIVE_PATH = Path(os.environ.get("JOB_ARCHIVE_PATH", TRANSCRIPTIONS_DIR / ".jobs.sqlite3"))
+MEDIA_RETENTION_SECONDS = float(os.environ.get("MEDIA_RETENTION_SECONDS", 0))
+MEDIA_ARCHIVE_DIR = Path(os.environ["MEDIA_ARCHIVE_DIR"]) if os.environ.get("MEDIA_ARCHIVE_DIR") else None
+
+# Duration-aware scheduling – uploads are routed to the short/medium/long queues by their duration (the max ones of
+# the short and medium classes, in seconds), and the workers drain them by the policy: "sjf" (shortest job first,
+# with every QUEUE_AGING_INTERVAL seconds of waiting promoting a job by one class, 0 disables it) or "fair" (weighted
+# fair share of the workers' time, weights given as "<queue>=<weight>" pairs).
+SHORT_MEDIA_MAX_DURATION = float(os.environ.get("SHORT_MEDIA_MAX_DURATION", 5 * 60))
+MEDIUM_MEDIA_MAX_DURATION = float(os.environ.get("MEDIUM_MEDIA_MAX_DURATION", 30 * 60))
+WORKER_QUEUE_POLICY = os.environ.get("WORKER_QUEUE_POLICY", "sjf")
+QUEUE_AGING_INTERVAL = float(os.environ.get("QUEUE_AGING_INTERVAL", 15 * 60))
+QUEUE_FAIR_SHARE_WEIGHTS = os.environ.get("QUEUE_FAIR_SHARE_WEIGHTS", "short=6,medium=3,long=1,default=3")
+# Jobs timeout is derived from the media duration: base + factor * duration (in seconds).
+JOB_TIMEOUT_BASE = float(os.environ.get("JOB_TIMEOUT_BASE", 10 * 60))
+JOB_TIMEOUT_DURATION_FACTOR = float(os.environ.get("JOB_TIMEOUT_DURATION_FACTOR", 4))
+
+# Estimation of the queue wait – the real-time factor (processing time per second of media) of every model and device
+# is averaged over its latest REAL_TIME_FACTOR_WINDOW transcriptions (DEFAULT_REAL_TIME_FACTOR is assumed until there
+# are any). Uploads are rejected (429) while transcribing the backlog is estimated to take longer than
+# ADMISSION_MAX_BACKLOG_WAIT seconds (0 disables the admission control).
+REAL_TIME_FACTOR_WINDOW = int(os.environ.get("REAL_TIME_FACTOR_WINDOW", 50))
+DEFAULT_REAL_TIME_FACTOR = float(os.environ.get("DEFAULT_REAL_TIME_FACTOR", 0.5))
+ADMISSION_MAX_BACKLOG_WAIT = float(os.environ.get("ADMISSION_MAX_BACKLOG_WAIT", 0))
+# The backlog estimate is cached by every API process for BACKLOG_ESTIMATE_CACHE_TTL seconds (0 disables the cache),
+# as computing it sums up the durations of all the queued jobs.
+BACKLOG_ESTIMATE_CACHE_TTL = float(os.environ.get("BACKLOG_ESTIMATE_CACHE_TTL", 1))
+
 # Default values for the whisper model are set as the codebase is shared by both API and worker, and the former
 # is independent/does not rely on them, so it shouldn't crash if they are not set.
 WHISPER_MODEL_NAME = os.environ.get("WHISPER_MODEL_NAME", "base")
 WHISPER_MODEL_DEVICE = os.environ.get("WHISPER_MODEL_DEVICE", "cpu")
+# Models the uploads can request (comma separated, WHISPER_MODEL_NAME is the default one and always available) and
+# the ones served by a worker (all of them by default).
+WHISPER_MODELS = list(
+    dict.fromkeys([WHISPER_MODEL_NAME, *filter(None, map(str.strip, os.environ.get("WHISPER_MODELS", "").split(",")))])
+)
+WORKER_WHISPER_MODELS = [
+    model_name for model_name in map(str.strip, os.environ.get("WORKER_WHISPER_MODELS", "").split(",")) if model_name
+] or WHISPER_MODELS
+# Memory (in MB) of the models a worker keeps loaded, the least recently used ones are unloaded to fit (0 keeps only
+# the last used model). Workers prefer the jobs of their loaded models, unless the job at the head of another model's
+# queue has been waiting for longer than MODEL_AFFINITY_MAX_WAIT seconds.
+WORKER_MODEL_CACHE_MAX_MEMORY_MB = float(os.environ.get("WORKER_MODEL_CACHE_MAX_MEMORY_MB", 0))
+MODEL_AFFINITY_MAX_WAIT = float(os.environ.get("MODEL_AFFINITY_MAX_WAIT", 5 * 60))
+# Quantization of the models on the CPU – "none" or "int8" (dynamic int8 quantization of the linear layers, faster
+# and smaller, at a small cost of the transcription quality – see `scripts/benchmarks/benchmark_quantization.py`).
+WHISPER_MODEL_QUANTIZATION = os.environ.get("WHISPER_MODEL_QUANTIZATION", "none").lower()
+# Whisper checkpoints are converted once into the model artifacts (in MODEL_ARTIFACTS_DIR), which are memory-mapped by
+# the workers instead of being deserialized – see `transcription_service.model_artifacts`.
+MODEL_ARTIFACTS_ENABLED = os.environ.get("MODEL_ARTIFACTS_ENABLED", "true").lower() == "true"
+MODEL_ARTIFACTS_DIR = Path(os.environ.get("MODEL_ARTIFACTS_DIR", Path.home() / ".cache" / "transcription_service" / "models"))
+
+# Live streaming transcription – served over WebSocket by the streaming workers (`transcription_service/streaming.py`)
+# on STREAMING_PORT, at most STREAM_MAX_CONCURRENT streams each (the others are rejected). The audio of a stream is
+# transcribed again every STREAM_STEP_SECONDS of new audio, over a window of up to STREAM_MAX_BUFFER_SECONDS, and the
+# stream is not read from while more than STREAM_MAX_PENDING_SECONDS of its audio is waiting for the transcription.
+STREAMING_PORT = int(os.environ.get("STREAMING_PORT", 8002))
+STREAM_MAX_CONCURRENT = int(os.environ.get("STREAM_MAX_CONCURRENT", 4))
+STREAM_STEP_SECONDS = float(os.environ.get("STREAM_STEP_SECONDS", 1))
+STREAM_MAX_BUFFER_SECONDS = float(os.environ.get("STREAM_MAX_BUFFER_SECONDS", 20))
+STREAM_MAX_PENDING_SECONDS = float(os.environ.get("STREAM_MAX_PENDING_SECONDS", 10))
 
 LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
@@ -0,0 +1,249 @@
+import math
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Union
+
+from redis import Redis
+from redis.client import Pipeline
+from rq.utils import as_text
+from rq.worker import Worker
+from rq.worker_registration import get_keys
+
+from transcription_service import config
+from transcription_service.scheduling import (
+    LEGACY_QUEUE_NAME,
+    SIZE_CLASS_QUEUE_NAMES,
+    QueuePolicy,
+    get_model_queue_name,
+    parse_model_queue_name,
+)
+
+# Redis lists of the latest (processing time, media duration) samples of the transcriptions, by model and device.
+REAL_TIME_FACTOR_SAMPLES_KEY_PREFIX = "transcription_service:real_time_factor:"
+# Hash of the devices the running workers transcribe on, by worker name.
+WORKER_DEVICES_KEY = "transcription_service:worker_devices"
+# Per-queue hashes of the media durations of the queued jobs, by reference ID.
+QUEUED_DURATIONS_KEY_PREFIX = "transcription_service:queued_durations:"
+
+# Latest backlog estimate of the process and the (monotonic) time it was computed at, see `get_backlog_estimate`.
+_cached_backlog_estimate: Optional["BacklogEstimate"] = None
+_cached_backlog_estimate_at = 0.0
+_backlog_estimate_lock = threading.Lock()
+
+
+def get_model_id(model_name: str, device: str) -> str:
+    return f"{model_name}:{device}"
+
+
+def record_real_time_factor(
+    redis_conn: Redis, model_name: str, device: str, processing_time: float, media_duration: float
+) -> None:
+    """Record the processing time of a transcription, keeping only the latest `REAL_TIME_FACTOR_WINDOW` ones."""
+    if media_duration <= 0:
+        return
+    samples_key = f"{REAL_TIME_FACTOR_SAMPLES_KEY_PREFIX}{get_model_id(model_name, device)}"
+    with redis_conn.pipeline() as pipeline:
+        pipeline.lpush(samples_key, f"{processing_time}:{media_duration}")
+        pipeline.ltrim(samples_key, 0, config.REAL_TIME_FACTOR_WINDOW - 1)
+        pipeline.execute()
+
+
+def get_real_time_factors(redis_conn: Redis, model_ids: List[str]) -> Dict[str, float]:
+    """
+    Get the rolling real-time factors (processing time per second of media) of the given models – the total
+    processing time of the latest transcriptions divided by their total duration, so the longer media weigh more.
+    Models without any transcription recorded yet get `DEFAULT_REAL_TIME_FACTOR`.
+    """
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for model_id in model_ids:
+            pipeline.lrange(f"{REAL_TIME_FACTOR_SAMPLES_KEY_PREFIX}{model_id}", 0, -1)
+        models_samples = pipeline.execute()
+
+    real_time_factors = {}
+    for model_id, samples in zip(model_ids, models_samples):
+        total_processing_time = total_duration = 0.0
+        for sample in samples:
+            processing_time, duration = as_text(sample).split(":")
+            total_processing_time += float(processing_time)
+            total_duration += float(duration)
+        real_time_factors[model_id] = (
+            total_processing_time / total_duration if total_duration > 0 else config.DEFAULT_REAL_TIME_FACTOR
+        )
+    return real_time_factors
+
+
+def register_worker_device(redis_conn: Redis, worker_name: str, device: str) -> None:
+    redis_conn.hset(WORKER_DEVICES_KEY, worker_name, device)
+
+
+def unregister_worker_device(redis_conn: Redis, worker_name: str) -> None:
+    redis_conn.hdel(WORKER_DEVICES_KEY, worker_name)
+
+
+def unregister_dead_workers_devices(redis_conn: Redis) -> None:
+    """Forget the devices of the workers which died without unregistering them."""
+    live_worker_names = {key[len(Worker.redis_worker_namespace_prefix) :] for key in get_keys(connection=redis_conn)}
+    dead_worker_names = [
+        as_text(worker_name)
+        for worker_name in redis_conn.hkeys(WORKER_DEVICES_KEY)
+        if as_text(worker_name) not in live_worker_names
+    ]
+    if dead_worker_names:
+        redis_conn.hdel(WORKER_DEVICES_KEY, *dead_worker_names)
+
+
+def add_queued_duration(
+    redis_conn: Union[Redis, Pipeline], queue_name: str, reference_id: str, duration: Optional[float]
+) -> None:
+    """Account the media of a (re)enqueued job in the backlog of its queue – unknown durations are not accounted."""
+    if duration is None:
+        return
+    redis_conn.hset(f"{QUEUED_DURATIONS_KEY_PREFIX}{queue_name}", reference_id, duration)
+
+
+def remove_queued_duration(redis_conn: Redis, queue_name: str, reference_id: str) -> None:
+    """Remove the media of a started (or otherwise dequeued) job from the backlog of its queue."""
+    redis_conn.hdel(f"{QUEUED_DURATIONS_KEY_PREFIX}{queue_name}", reference_id)
+
+
+@dataclass
+class BacklogEstimate:
+    """
+    Snapshot of the queued work and the live workers to process it – the work is the estimated processing time of the
+    queued media (their durations times the real-time factors of their models), so the models of different speed are
+    comparable.
+    """
+
+    # Estimated processing time of the queued media in seconds, by queue name.
+    queued_work: Dict[str, float]
+    # Real-time factors of the models, averaged over the devices of the live workers.
+    real_time_factors: Dict[str, float]
+    workers_count: int
+
+    @property
+    def wait(self) -> Optional[float]:
+        """Time (in seconds) to transcribe the whole backlog, None if there are no workers to do that."""
+        if self.workers_count <= 0:
+            return None
+        return sum(self.queued_work.values()) / self.workers_count
+
+    def get_retry_after(self) -> Optional[int]:
+        """
+        Get the time (in seconds) after which the backlog is expected to be back within `ADMISSION_MAX_BACKLOG_WAIT`,
+        or None if it's within it now (or the admission control is disabled).
+        """
+        wait = self.wait
+        if config.ADMISSION_MAX_BACKLOG_WAIT <= 0 or wait is None or wait <= config.ADMISSION_MAX_BACKLOG_WAIT:
+            return None
+        return max(1, math.ceil(wait - config.ADMISSION_MAX_BACKLOG_WAIT))
+
+    def get_work_ahead(self, queue_name: str, queued_ahead_fraction: float = 1.0) -> float:
+        """
+        Get the work (in seconds) to be done before a job in the given queue is started – regardless of the models.
+
+        Args:
+            queue_name (str): Name of the job's queue.
+            queued_ahead_fraction (float): Fraction of the job's queue before the job (1 for the newly enqueued jobs).
+        """
+        size_class = parse_model_queue_name(queue_name)[0]
+        queue_names_ahead = [name for name in self.queued_work if name != queue_name]
+        if size_class in SIZE_CLASS_QUEUE_NAMES and config.WORKER_QUEUE_POLICY == QueuePolicy.SHORTEST_JOB_FIRST:
+            # Ignoring the aging – the long jobs waiting for long are likely to start sooner than estimated.
+            shorter_size_classes = SIZE_CLASS_QUEUE_NAMES[: SIZE_CLASS_QUEUE_NAMES.index(size_class)]
+            queue_names_ahead = [name for name in queue_names_ahead if parse_model_queue_name(name)[0] in shorter_size_classes]
+        # Otherwise (the fair share drains all the queues at once), the whole backlog is an upper bound.
+        work_ahead = sum(self.queued_work[name] for name in queue_names_ahead)
+        return work_ahead + queued_ahead_fraction * self.queued_work.get(queue_name, 0.0)
+
+    def add_queued(self, queue_name: str, duration: Optional[float], model_name: str) -> None:
+        """Account a job enqueued after the snapshot was taken (e.g. the previous uploads of a batch)."""
+        if duration is None:
+            return
+        real_time_factor = self.real_time_factors.get(model_name, config.DEFAULT_REAL_TIME_FACTOR)
+        self.queued_work[queue_name] = self.queued_work.get(queue_name, 0.0) + duration * real_time_factor
+
+    def estimate_start(self, now: datetime, work_ahead: float) -> Optional[datetime]:
+        if self.workers_count <= 0:
+            return None
+        return now + timedelta(seconds=work_ahead / self.workers_count)
+
+    def estimate_processing_time(self, duration: Optional[float], model_name: str) -> Optional[timedelta]:
+        if duration is None or self.workers_count <= 0:
+            return None
+        real_time_factor = self.real_time_factors.get(model_name, config.DEFAULT_REAL_TIME_FACTOR)
+        return timedelta(seconds=duration * real_time_factor)
+
+
+def get_queued_queue_names() -> List[str]:
+    """Names of all the queues the queued media are accounted in."""
+    return [
+        *(
+            get_model_queue_name(queue_name, model_name)
+            for model_name in config.WHISPER_MODELS
+            for queue_name in SIZE_CLASS_QUEUE_NAMES
+        ),
+        LEGACY_QUEUE_NAME,
+    ]
+
+
+def get_backlog_estimate(redis_conn: Redis) -> BacklogEstimate:
+    """
+    Get the backlog estimate (see `_compute_backlog_estimate`), cached by the process for `BACKLOG_ESTIMATE_CACHE_TTL`
+    seconds – computing it transfers the duration of every queued job, so it's not done on every upload and status
+    request. The uploads enqueued meanwhile (by the process itself or by the others) are thus not accounted for up to
+    the TTL.
+
+    Returns:
+        BacklogEstimate: A copy of the cached estimate, free to be updated by the caller (see `BacklogEstimate.add_queued`).
+    """
+    global _cached_backlog_estimate, _cached_backlog_estimate_at
+    # Held while computing, so the concurrent requests wait for a single computation instead of repeating it.
+    with _backlog_estimate_lock:
+        now = time.monotonic()
+        if _cached_backlog_estimate is None or now - _cached_backlog_estimate_at >= config.BACKLOG_ESTIMATE_CACHE_TTL:
+            _cached_backlog_estimate = _compute_backlog_estimate(redis_conn)
+            _cached_backlog_estimate_at = now
+        return replace(_cached_backlog_estimate, queued_work=dict(_cached_backlog_estimate.queued_work))
+
+
+def _compute_backlog_estimate(redis_conn: Redis) -> BacklogEstimate:
+    """
+    Estimate the backlog from the durations of the queued media, the live workers and the real-time factors of the
+    models on their devices. The jobs being processed are not accounted (but the running workers are – as if they
+    were free), and every worker is assumed to serve all the models.
+
+    The durations are summed up on every call (rather than kept as running totals), so re-enqueued reference IDs
+    can't skew them – it's a single round trip, but transferring one number per queued job.
+    """
+    queue_names = get_queued_queue_names()
+    worker_names = [key[len(Worker.redis_worker_namespace_prefix) :] for key in get_keys(connection=redis_conn)]
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for queue_name in queue_names:
+            pipeline.hvals(f"{QUEUED_DURATIONS_KEY_PREFIX}{queue_name}")
+        if worker_names:
+            pipeline.hmget(WORKER_DEVICES_KEY, worker_names)
+        results = pipeline.execute()
+    # Workers running without a device registered (e.g. an older version) are assumed to use the default one.
+    workers_devices = [
+        as_text(device) if device else config.WHISPER_MODEL_DEVICE for device in (results[-1] if worker_names else [])
+    ]
+
+    model_ids = [get_model_id(model_name, device) for model_name in config.WHISPER_MODELS for device in set(workers_devices)]
+    models_real_time_factors = get_real_time_factors(redis_conn, model_ids)
+    real_time_factors = {
+        model_name: (
+            sum(models_real_time_factors[get_model_id(model_name, device)] for device in workers_devices)
+            / len(workers_devices)
+            if workers_devices
+            else config.DEFAULT_REAL_TIME_FACTOR
+        )
+        for model_name in config.WHISPER_MODELS
+    }
+    queued_work = {
+        queue_name: sum(float(duration) for duration in durations)
+        * real_time_factors.get(parse_model_queue_name(queue_name)[1], config.DEFAULT_REAL_TIME_FACTOR)
+        for queue_name, durations in zip(queue_names, results)
+    }
+    return BacklogEstimate(queued_work=queued_work, real_time_factors=real_time_factors, workers_count=len(workers_devices))
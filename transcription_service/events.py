@@ -0,0 +1,23 @@
+from typing import Union
+
+from redis import Redis
+from redis.client import Pipeline
+
+from transcription_service.models import TranscriptionStatus
+
+# Pub/sub channels with the status transitions of the transcription jobs, one per reference ID – so the subscribers
+# of a single job don't receive the others, while all of them can be received with a pattern subscription.
+JOB_EVENTS_CHANNEL_PREFIX = "transcription_service:job_events:"
+ALL_JOB_EVENTS_PATTERN = f"{JOB_EVENTS_CHANNEL_PREFIX}*"
+
+
+def get_job_events_channel(reference_id: str) -> str:
+    return f"{JOB_EVENTS_CHANNEL_PREFIX}{reference_id}"
+
+
+def publish_job_event(redis_conn: Union[Redis, Pipeline], transcription_status: TranscriptionStatus) -> None:
+    """
+    Notify the subscribers about the new status of a transcription job. It's fire-and-forget (pub/sub messages are not
+    stored), so the clients should still be able to fall back to checking the status.
+    """
+    redis_conn.publish(get_job_events_channel(transcription_status.reference_id), transcription_status.model_dump_json())
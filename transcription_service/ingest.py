@@ -0,0 +1,243 @@
+import hashlib
+from pathlib import Path
+from typing import Awaitable, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import multipart
+from fastapi.concurrency import run_in_threadpool
+from multipart.multipart import parse_options_header
+from starlette.requests import Request
+
+from transcription_service import config
+
+# Data received from the clients is written to the disk in chunks of (at least) that size, off the event loop.
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Max size of an uploaded file in bytes (None for no limit).
+MAX_UPLOAD_SIZE = int(config.UPLOAD_MAX_SIZE_MB * 1024 * 1024) or None
+# Max size of a single (non-file) field of the multipart uploads, and of all of them together.
+MAX_FORM_FIELD_SIZE = 64 * 1024
+MAX_FORM_FIELDS_SIZE = 1024 * 1024
+# Field of the multipart uploads with the uploaded file.
+FILE_FIELD_NAME = "file"
+
+
+class UploadTooLargeError(Exception):
+    pass
+
+
+class MalformedUploadError(Exception):
+    pass
+
+
+class UploadWriter:
+    """
+    Writer of the data received from a client straight to its destination file (no temporary copies) – buffered, so it
+    is written in chunks of `UPLOAD_CHUNK_SIZE` in the threadpool, optionally hashed on the way, and limited to
+    `max_size` bytes (of the whole file, including the data it already had when appending).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_size: Optional[int],
+        append: bool = False,
+        hash_content: bool = True,
+        on_flush: Optional[Callable[[], Awaitable[object]]] = None,
+    ):
+        self.path = path
+        self.max_size = max_size
+        self.append = append
+        # Bytes of the file, including the ones still in the buffer.
+        self.size = 0
+        self.on_flush = on_flush
+        self._content_hash = hashlib.sha256() if hash_content else None
+        self._buffer = bytearray()
+        self._file: Optional[BinaryIO] = None
+
+    def _open(self) -> None:
+        self._file = open(self.path, "ab" if self.append else "wb")
+        self.size = self._file.tell()
+
+    def _write(self, chunk: bytes) -> None:
+        if self._content_hash is not None:
+            self._content_hash.update(chunk)
+        self._file.write(chunk)
+
+    async def open(self) -> None:
+        await run_in_threadpool(self._open)
+
+    async def write(self, data: bytes) -> None:
+        """
+        Raises:
+            UploadTooLargeError: If the file would exceed the max size – the data is not written then.
+        """
+        if self.max_size is not None and self.size + len(data) > self.max_size:
+            raise UploadTooLargeError()
+        self.size += len(data)
+        self._buffer += data
+        if len(self._buffer) >= UPLOAD_CHUNK_SIZE:
+            await self.flush()
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        await run_in_threadpool(self._write, chunk)
+        if self.on_flush is not None:
+            await self.on_flush()
+
+    async def close(self) -> None:
+        """Write the rest of the buffered data and close the file (even if the upload failed, for the resumable ones)."""
+        if self._file is None:
+            return
+        try:
+            await self.flush()
+        finally:
+            await run_in_threadpool(self._file.close)
+            self._file = None
+
+    def get_content_hash(self) -> Optional[str]:
+        """Get the SHA-256 hex digest of the data written (None if not hashed)."""
+        return self._content_hash.hexdigest() if self._content_hash is not None else None
+
+
+def hash_file(path: Path) -> str:
+    """Get the SHA-256 hex digest of the file content."""
+    content_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+async def receive_multipart_uploads(
+    request: Request, open_file: Callable[[str, Dict[str, str]], UploadWriter], max_files: int
+) -> Tuple[Dict[str, str], List[UploadWriter]]:
+    """
+    Receive a multipart form upload, writing its files (the `file` fields) to the disk as they are being received –
+    rather than spooling all of them to temporary files first, to copy them to their destinations afterwards.
+
+    Args:
+        request (Request): The upload request.
+        open_file (Callable[[str, Dict[str, str]], UploadWriter]): Called with the name of every file and the fields
+            received before it (it's validated there, before any of its data is written), returns its writer.
+        max_files (int): Max number of the files in the form.
+
+    Returns:
+        Tuple[Dict[str, str], List[UploadWriter]]: The (non-file) fields of the form, and the (closed) writers of the
+            files, in the order they were received.
+
+    Raises:
+        MalformedUploadError: If the form is malformed, or there are no files (or too many of them) in it.
+        UploadTooLargeError: If a file exceeds the max size of its writer.
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if boundary is None:
+        raise MalformedUploadError("Missing boundary of the multipart form.")
+
+    fields: Dict[str, str] = {}
+    fields_size = 0
+    files_count = 0
+    # Parsed in the (synchronous) callbacks, handled asynchronously after every chunk: ("file", name) once a file
+    # starts, ("data", bytes) of the file, and ("end",) once it ends.
+    events: List[tuple] = []
+    part: Dict[str, object] = {}
+
+    def on_part_begin() -> None:
+        part.clear()
+        part.update(header_field=b"", header_value=b"", content_disposition=b"", data=bytearray())
+
+    def on_header_field(data: bytes, start: int, end: int) -> None:
+        part["header_field"] += data[start:end]
+
+    def on_header_value(data: bytes, start: int, end: int) -> None:
+        part["header_value"] += data[start:end]
+
+    def on_header_end() -> None:
+        if part["header_field"].lower() == b"content-disposition":
+            part["content_disposition"] = part["header_value"]
+        part["header_field"], part["header_value"] = b"", b""
+
+    def on_headers_finished() -> None:
+        nonlocal files_count
+        _, options = parse_options_header(part["content_disposition"])
+        if b"name" not in options:
+            raise MalformedUploadError('The Content-Disposition header field "name" must be provided.')
+        part["name"] = options[b"name"].decode("utf-8", errors="replace")
+        part["is_file"] = b"filename" in options
+        if part["is_file"]:
+            files_count += 1
+            if part["name"] != FILE_FIELD_NAME or files_count > max_files:
+                raise MalformedUploadError(
+                    f'Exactly one file is expected, in the "{FILE_FIELD_NAME}" field.'
+                    if max_files == 1
+                    else f'At most {max_files} files are expected, in the "{FILE_FIELD_NAME}" fields.'
+                )
+            events.append(("file", options[b"filename"].decode("utf-8", errors="replace")))
+
+    def on_part_data(data: bytes, start: int, end: int) -> None:
+        nonlocal fields_size
+        if part["is_file"]:
+            events.append(("data", data[start:end]))
+            return
+        part["data"] += data[start:end]
+        fields_size += end - start
+        if len(part["data"]) > MAX_FORM_FIELD_SIZE or fields_size > MAX_FORM_FIELDS_SIZE:
+            raise MalformedUploadError("The form fields are too large.")
+
+    def on_part_end() -> None:
+        if part["is_file"]:
+            events.append(("end",))
+        else:
+            fields[part["name"]] = part["data"].decode("utf-8", errors="replace")
+
+    parser = multipart.MultipartParser(
+        boundary,
+        {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        },
+    )
+    writers: List[UploadWriter] = []
+    # Of the file being received.
+    writer: Optional[UploadWriter] = None
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event in events:
+                if event[0] == "file":
+                    writer = open_file(event[1], fields)
+                    await writer.open()
+                elif event[0] == "data":
+                    await writer.write(event[1])
+                else:
+                    await writer.close()
+                    writers.append(writer)
+                    writer = None
+            events.clear()
+        parser.finalize()
+    finally:
+        if writer is not None:
+            await writer.close()
+    if writer is not None or not writers:
+        raise MalformedUploadError(f'The file is missing, it is expected in the "{FILE_FIELD_NAME}" field.')
+    return fields, writers
+
+
+async def receive_multipart_upload(
+    request: Request, open_file: Callable[[str, Dict[str, str]], UploadWriter]
+) -> Tuple[Dict[str, str], UploadWriter]:
+    """
+    Receive a multipart form upload of a single file (see `receive_multipart_uploads`).
+
+    Returns:
+        Tuple[Dict[str, str], UploadWriter]: The (non-file) fields of the form, and the (closed) writer of the file.
+    """
+    fields, writers = await receive_multipart_uploads(request, open_file, max_files=1)
+    return fields, writers[0]
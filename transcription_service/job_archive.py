@@ -0,0 +1,112 @@
+import json
+import sqlite3
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from transcription_service import config
+from transcription_service.models import TranscriptionStatus, TranscriptionStatusEnum
+
+# Max number of the parameters of a single SQLite query (the limit of the older SQLite versions).
+_MAX_QUERY_PARAMETERS = 999
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_jobs (
+    reference_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    error_message TEXT,
+    -- JSON object of the job meta kept after the compaction (e.g. the silence skipping report).
+    meta TEXT NOT NULL,
+    uploaded_at REAL,
+    ended_at REAL,
+    media_removed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS archived_jobs_media ON archived_jobs (media_removed, uploaded_at);
+"""
+
+
+@dataclass
+class ArchivedJob:
+    reference_id: str
+    status: TranscriptionStatusEnum
+    error_message: Optional[str]
+    meta: dict
+    # Unix timestamps.
+    uploaded_at: Optional[float]
+    ended_at: Optional[float]
+
+
+def _connect(read_only: bool = False) -> Optional[sqlite3.Connection]:
+    """
+    Connect to the archive (shared by the API and all the workers). Read-only connections don't create it, so they are
+    None if it doesn't exist yet.
+    """
+    if read_only:
+        if not config.JOB_ARCHIVE_PATH.exists():
+            return None
+        return sqlite3.connect(f"{config.JOB_ARCHIVE_PATH.as_uri()}?mode=ro", uri=True, timeout=30)
+    config.JOB_ARCHIVE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(config.JOB_ARCHIVE_PATH, timeout=30)
+    # Readers don't block the writer (and the other way round).
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+def archive_jobs(jobs: List[ArchivedJob]) -> None:
+    """Store the finished jobs in the archive (replacing the earlier jobs of the same reference IDs, if any)."""
+    if not jobs:
+        return
+    with closing(_connect()) as connection, connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO archived_jobs (reference_id, status, error_message, meta, uploaded_at, ended_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (job.reference_id, job.status.value, job.error_message, json.dumps(job.meta), job.uploaded_at, job.ended_at)
+                for job in jobs
+            ],
+        )
+
+
+def get_archived_statuses(reference_ids: List[str]) -> Dict[str, TranscriptionStatus]:
+    """
+    Get the transcription statuses of the archived jobs, by reference ID – the ones not archived are missing.
+    """
+    connection = _connect(read_only=True) if reference_ids else None
+    if connection is None:
+        return {}
+    transcription_statuses = {}
+    with closing(connection):
+        for i in range(0, len(reference_ids), _MAX_QUERY_PARAMETERS):
+            batch = reference_ids[i : i + _MAX_QUERY_PARAMETERS]
+            rows = connection.execute(
+                "SELECT reference_id, status, error_message, meta FROM archived_jobs "
+                f"WHERE reference_id IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            for reference_id, status, error_message, raw_meta in rows:
+                transcription_statuses[reference_id] = TranscriptionStatus(
+                    reference_id=reference_id,
+                    status=TranscriptionStatusEnum(status),
+                    error_message=error_message,
+                    silence_skipping=json.loads(raw_meta).get("silence_skipping"),
+                )
+    return transcription_statuses
+
+
+def get_expired_media(uploaded_before: float, limit: int) -> List[str]:
+    """Get the reference IDs of the archived jobs uploaded before the given time, whose media were not removed yet."""
+    with closing(_connect()) as connection:
+        rows = connection.execute(
+            "SELECT reference_id FROM archived_jobs WHERE media_removed = 0 AND uploaded_at < ? LIMIT ?",
+            (uploaded_before, limit),
+        )
+        return [reference_id for (reference_id,) in rows]
+
+
+def mark_media_removed(reference_ids: List[str]) -> None:
+    with closing(_connect()) as connection, connection:
+        connection.executemany(
+            "UPDATE archived_jobs SET media_removed = 1 WHERE reference_id = ?",
+            [(reference_id,) for reference_id in reference_ids],
+        )
@@ -1,15 +1,29 @@
 import logging
+from contextvars import ContextVar
+from typing import Optional
 
 from transcription_service import config
 
+# Trace ID of the request or the job being handled – carried from the upload to the logs of its jobs.
+TRACE_ID: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+
+class _TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = TRACE_ID.get() or "-"
+        return True
+
+
 log = logging.getLogger()
 log.setLevel(config.LOG_LEVEL)
 if not log.handlers:
     handler = logging.StreamHandler()
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(trace_id)s - %(message)s")
     formatter.default_time_format = "%Y-%m-%dT%H:%M:%S"
     formatter.default_msec_format = "%s.%03dZ"
     handler.setFormatter(formatter)
+    # On the handler, so it applies to the records of the other loggers (e.g. of rq) as well.
+    handler.addFilter(_TraceIdFilter())
     log.addHandler(handler)
 
 # Log object ready for import/usage
@@ -1,13 +1,28 @@
+import re
+import time
+import uuid
 from contextlib import asynccontextmanager
 
+import anyio
 from fastapi import FastAPI
-from redis import Redis
+from redis import BlockingConnectionPool, Redis
+from redis.asyncio import BlockingConnectionPool as AsyncBlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
 from redis.exceptions import ConnectionError as RedisConnectionError
 from redis.exceptions import TimeoutError
 from rq import Queue
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from transcription_service import config
 from transcription_service.api import api_router
+from transcription_service.logger import TRACE_ID, log
+from transcription_service.metrics import HTTP_REQUEST_DURATION
+from transcription_service.scheduling import SIZE_CLASS_QUEUE_NAMES, get_model_queue_name
+
+TRACE_ID_HEADER = "X-Trace-ID"
+# Trace IDs accepted from the clients – anything else is replaced, so it can't mess up the logs.
+TRACE_ID_PATTERN = re.compile(r"[A-Za-z0-9._-]{1,64}")
 
 
 def _validate_redis_connection(redis_conn: Redis) -> bool:
@@ -32,18 +47,106 @@ async def lifespan(app: FastAPI):
     Initialise the global objects and add them to app.state
     """
     config.UPLOADS_DIR.mkdir(exist_ok=True, parents=True)
+    config.UPLOAD_SESSIONS_DIR.mkdir(exist_ok=True, parents=True)
     config.TRANSCRIPTIONS_DIR.mkdir(exist_ok=True, parents=True)
+    # Runs the blocking work of the endpoints (e.g. writing the uploads to the disk).
+    anyio.to_thread.current_default_thread_limiter().total_tokens = config.API_THREADPOOL_SIZE
 
-    app.state.redis_conn = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB)
+    # Requests wait for a free connection rather than failing once all the connections of a pool are in use.
+    # Used by the synchronous code (RQ), in the threadpool.
+    app.state.redis_conn = Redis.from_pool(
+        BlockingConnectionPool(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            max_connections=config.API_THREADPOOL_SIZE,
+        )
+    )
     redis_connection_successful = _validate_redis_connection(app.state.redis_conn)
     if not redis_connection_successful:
         raise ConnectionError("Startup failed. Could not connect to Redis.")
-    app.state.queue = Queue(connection=app.state.redis_conn)
+    # Size-class queues of every model, by name.
+    app.state.queues = {
+        queue_name: Queue(queue_name, connection=app.state.redis_conn)
+        for queue_name in (
+            get_model_queue_name(size_class_queue_name, model_name)
+            for model_name in config.WHISPER_MODELS
+            for size_class_queue_name in SIZE_CLASS_QUEUE_NAMES
+        )
+    }
+    # Used by the async endpoints, so they don't block the event loop. The events streams hold a connection each (for
+    # their pub/sub) for as long as they are open.
+    app.state.async_redis_conn = AsyncRedis.from_pool(
+        AsyncBlockingConnectionPool(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            max_connections=config.API_REDIS_MAX_CONNECTIONS,
+        )
+    )
     yield
     """ 
     Run on shutdowns – close the connections, clear variables and release the resources.
     """
+    await app.state.async_redis_conn.aclose()
+    app.state.redis_conn.close()
 
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(api_router)
+
+
+class TraceAndMeasureRequestsMiddleware:
+    """
+    Assign the trace ID to the requests (the client's one from the `X-Trace-ID` header, if valid) – it's included in
+    the logs of the request and of the jobs it creates, and returned in the response header – and measure their
+    latency (till the response headers, so for the events streams, till the stream starts).
+
+    A plain ASGI middleware (rather than `@app.middleware("http")`, which runs every request in a separate task and
+    proxies its response), and the latency is recorded only once the response is sent, so it adds no latency itself.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace_id = Headers(scope=scope).get(TRACE_ID_HEADER)
+        if trace_id is None or not TRACE_ID_PATTERN.fullmatch(trace_id):
+            trace_id = uuid.uuid4().hex
+        started_at = time.monotonic()
+        duration, status_code = None, 500
+
+        async def send_with_trace_id(message: Message) -> None:
+            nonlocal duration, status_code
+            if message["type"] == "http.response.start":
+                duration, status_code = time.monotonic() - started_at, message["status"]
+                MutableHeaders(scope=message).append(TRACE_ID_HEADER, trace_id)
+            await send(message)
+
+        trace_id_token = TRACE_ID.set(trace_id)
+        try:
+            await self.app(scope, receive, send_with_trace_id)
+        finally:
+            # By the route template, so the number of the series is bounded.
+            route = scope.get("route")
+            # Never failing the request (e.g. `/health` while Redis is down), nor masking the error it failed with.
+            try:
+                async with scope["app"].state.async_redis_conn.pipeline(transaction=False) as pipeline:
+                    HTTP_REQUEST_DURATION.observe(
+                        pipeline,
+                        duration if duration is not None else time.monotonic() - started_at,
+                        method=scope["method"],
+                        route=route.path if route is not None else "unmatched",
+                        status=str(status_code),
+                    )
+                    await pipeline.execute()
+            except Exception:
+                log.warning("Recording the request latency failed", exc_info=True)
+            TRACE_ID.reset(trace_id_token)
+
+
+app.add_middleware(TraceAndMeasureRequestsMiddleware)
@@ -0,0 +1,157 @@
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Tuple, Union
+
+from redis import Redis
+from redis.client import Pipeline
+from rq.queue import Queue
+from rq.utils import as_text
+from rq.worker_registration import get_keys
+
+from transcription_service import config
+from transcription_service.scheduling import CHUNKS_QUEUE_NAME, LEGACY_QUEUE_NAME, SIZE_CLASS_QUEUE_NAMES, get_model_queue_name
+
+# Redis hashes of the histograms, by metric name – aggregated over all the API and worker processes (the workers push
+# their observations there, the API renders them), so any API process serves the metrics of the whole service. Fields
+# are "<labels>|<bucket upper bound>" with the observations count of the bucket, and "<labels>|sum".
+METRICS_KEY_PREFIX = "transcription_service:metrics:"
+_FIELD_SEPARATOR = "|"
+_SUM_FIELD = "sum"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    return ",".join(f'{name}="{_escape_label_value(str(value))}"' for name, value in labels.items())
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if math.isinf(bound) else repr(float(bound))
+
+
+@dataclass(frozen=True)
+class Histogram:
+    name: str
+    description: str
+    label_names: Tuple[str, ...]
+    # Upper bounds of the buckets (the +Inf one is implicit).
+    buckets: Tuple[float, ...]
+
+    @property
+    def key(self) -> str:
+        return f"{METRICS_KEY_PREFIX}{self.name}"
+
+    def observe(self, redis_conn: Union[Redis, Pipeline], value: float, **labels: str) -> None:
+        """Record the observation – with a (sync or async) connection or pipeline."""
+        bound = next((bound for bound in self.buckets if value <= bound), math.inf)
+        formatted_labels = _format_labels({name: labels[name] for name in self.label_names})
+        redis_conn.hincrby(self.key, f"{formatted_labels}{_FIELD_SEPARATOR}{_format_bound(bound)}", 1)
+        redis_conn.hincrbyfloat(self.key, f"{formatted_labels}{_FIELD_SEPARATOR}{_SUM_FIELD}", value)
+
+    def render(self, fields: Dict[bytes, bytes]) -> List[str]:
+        """Render the histogram (its Redis hash fields) in the Prometheus text format."""
+        series: Dict[str, Dict[str, float]] = {}
+        for field, value in fields.items():
+            formatted_labels, _, bucket = as_text(field).rpartition(_FIELD_SEPARATOR)
+            series.setdefault(formatted_labels, {})[bucket] = float(value)
+
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        for formatted_labels, values in sorted(series.items()):
+            separator = "," if formatted_labels else ""
+            count = 0
+            for bound in (*self.buckets, math.inf):
+                count += int(values.get(_format_bound(bound), 0))
+                lines.append(f'{self.name}_bucket{{{formatted_labels}{separator}le="{_format_bound(bound)}"}} {count}')
+            labels_suffix = f"{{{formatted_labels}}}" if formatted_labels else ""
+            lines.append(f"{self.name}_sum{labels_suffix} {values.get(_SUM_FIELD, 0.0)}")
+            lines.append(f"{self.name}_count{labels_suffix} {count}")
+        return lines
+
+
+STAGE_DURATION = Histogram(
+    "transcription_stage_duration_seconds",
+    "Duration of the stages of the transcriptions (upload_write, queue_wait, audio_decode, inference, result_write).",
+    ("stage",),
+    (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 1800, 3600, 7200),
+)
+REAL_TIME_FACTOR = Histogram(
+    "transcription_real_time_factor",
+    "Processing time per second of media of the transcription jobs (and the fan-out chunks).",
+    ("model", "device"),
+    (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5),
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Latency of the API requests, till the response headers (so for the event streams, till the stream starts).",
+    ("method", "route", "status"),
+    (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HISTOGRAMS = [STAGE_DURATION, REAL_TIME_FACTOR, HTTP_REQUEST_DURATION]
+
+
+@contextmanager
+def measure_stage(redis_conn: Redis, stage: str, durations: Dict[str, float]) -> Iterator[None]:
+    """Measure the duration of the stage of the transcription (only if it succeeds), also adding it to `durations`."""
+    started_at = time.monotonic()
+    yield
+    duration = time.monotonic() - started_at
+    durations[stage] = durations.get(stage, 0.0) + duration
+    STAGE_DURATION.observe(redis_conn, duration, stage=stage)
+
+
+def _get_queue_names() -> List[str]:
+    return [
+        *(
+            get_model_queue_name(queue_name, model_name)
+            for model_name in config.WHISPER_MODELS
+            for queue_name in (CHUNKS_QUEUE_NAME, *SIZE_CLASS_QUEUE_NAMES)
+        ),
+        LEGACY_QUEUE_NAME,
+    ]
+
+
+def render_metrics(redis_conn: Redis) -> str:
+    """
+    Render all the metrics in the Prometheus text format – the histograms, and the gauges measured right away: the
+    depth of every queue and the number of the workers by their state.
+    """
+    queue_names = _get_queue_names()
+    worker_keys = get_keys(connection=redis_conn)
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for histogram in HISTOGRAMS:
+            pipeline.hgetall(histogram.key)
+        for queue_name in queue_names:
+            pipeline.llen(f"{Queue.redis_queue_namespace_prefix}{queue_name}")
+        for worker_key in worker_keys:
+            pipeline.hget(worker_key, "state")
+        results = pipeline.execute()
+    histograms_fields = results[: len(HISTOGRAMS)]
+    queue_depths = results[len(HISTOGRAMS) : len(HISTOGRAMS) + len(queue_names)]
+    workers_states = results[len(HISTOGRAMS) + len(queue_names) :]
+
+    lines = []
+    for histogram, fields in zip(HISTOGRAMS, histograms_fields):
+        lines.extend(histogram.render(fields))
+
+    lines.append("# HELP transcription_queue_depth Number of the jobs waiting in the queue.")
+    lines.append("# TYPE transcription_queue_depth gauge")
+    lines.extend(
+        f"transcription_queue_depth{{{_format_labels({'queue': queue_name})}}} {depth}"
+        for queue_name, depth in zip(queue_names, queue_depths)
+    )
+
+    workers_counts = {"busy": 0, "idle": 0}
+    for state in workers_states:
+        # Workers starting, suspended, etc. are not processing any job.
+        workers_counts["busy" if as_text(state) == "busy" else "idle"] += 1
+    lines.append("# HELP transcription_workers Number of the live workers by their state.")
+    lines.append("# TYPE transcription_workers gauge")
+    lines.extend(
+        f"transcription_workers{{{_format_labels({'state': state})}}} {count}" for state, count in workers_counts.items()
+    )
+    return "\n".join(lines) + "\n"
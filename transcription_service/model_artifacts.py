@@ -0,0 +1,126 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Iterator, Optional
+
+import torch
+import whisper
+from whisper.model import ModelDimensions, Whisper
+
+from transcription_service import config
+from transcription_service.logger import log
+
+# Bumped whenever the layout of the artifacts changes, so the stale ones are not loaded.
+MODEL_ARTIFACT_FORMAT_VERSION = 1
+
+
+def get_model_artifact_path(model_name: str) -> Path:
+    return config.MODEL_ARTIFACTS_DIR / f"{model_name}.v{MODEL_ARTIFACT_FORMAT_VERSION}.pt"
+
+
+def _get_alignment_heads(model_name: str) -> Optional[bytes]:
+    """
+    Get the cross-attention heads the word timestamps of the official model are aligned with (None for the unofficial
+    models, whose default heads are used).
+
+    They're an internal of the pinned whisper version (see `pyproject.toml`) – checked, so a whisper upgrade changing
+    them fails loudly instead of silently converting artifacts without the heads (and with misaligned word timestamps).
+    """
+    alignment_heads = getattr(whisper, "_ALIGNMENT_HEADS", None)
+    if not isinstance(alignment_heads, dict) or not set(whisper.available_models()) <= set(alignment_heads):
+        raise RuntimeError(
+            f"Unsupported whisper version {whisper.__version__} – the alignment heads of its models are missing."
+        )
+    return alignment_heads.get(model_name)
+
+
+def convert_model_checkpoint(model_name: str, checkpoint: Optional[str] = None) -> Path:
+    """
+    Convert the whisper checkpoint of the given model (downloaded if needed) into the memory-mappable model artifact.
+
+    The weights are stored in float32 – the precision the model is loaded in for the inference (the checkpoints are
+    float16), so they can be used straight from the mapped file. The artifact is written to a temporary file first,
+    so the workers converting the same model at once don't read a partially written one.
+
+    Args:
+        model_name (str): Name of the model.
+        checkpoint (Optional[str]): Path to the checkpoint to convert instead of the official one of the model (e.g. a
+            fine-tuned one).
+
+    Returns:
+        Path: Path to the model artifact.
+    """
+    artifact_path = get_model_artifact_path(model_name)
+    model = whisper.load_model(checkpoint or model_name, device="cpu")
+    alignment_heads = _get_alignment_heads(model_name)
+    artifact = {
+        "dims": asdict(model.dims),
+        "model_state_dict": model.state_dict(),
+        "alignment_heads": alignment_heads.decode("ascii") if alignment_heads is not None else None,
+    }
+
+    artifact_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=artifact_path.parent, prefix=f".{artifact_path.name}.", delete=False) as f:
+        try:
+            torch.save(artifact, f)
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, artifact_path)
+    return artifact_path
+
+
+@contextmanager
+def _skip_parameters_init() -> Iterator[None]:
+    """
+    Create the parameters of the modules constructed within on the meta device – so their (random) initialization
+    neither allocates nor computes anything, as they are replaced by the loaded ones anyway. Buffers are created as
+    usual (the non-persistent ones, like the attention mask, are not a part of the state dict).
+    """
+    original_register_parameter = torch.nn.Module.register_parameter
+
+    def register_parameter(module: torch.nn.Module, name: str, parameter: Optional[torch.nn.Parameter]) -> None:
+        if parameter is not None:
+            parameter = torch.nn.Parameter(parameter.to("meta"), requires_grad=parameter.requires_grad)
+        original_register_parameter(module, name, parameter)
+
+    torch.nn.Module.register_parameter = register_parameter
+    try:
+        yield
+    finally:
+        torch.nn.Module.register_parameter = original_register_parameter
+
+
+def load_model_artifact(artifact_path: Path, device: str) -> Whisper:
+    """
+    Load the model from its artifact – the weights are memory-mapped rather than read, so the loading is almost
+    instant, the pages are read lazily, and they are shared (through the page cache) by all the processes mapping the
+    same file on the host. For the other devices than the CPU, the weights are copied over right away.
+    """
+    artifact = torch.load(artifact_path, map_location="cpu", mmap=True, weights_only=True)
+    with _skip_parameters_init():
+        model = Whisper(ModelDimensions(**artifact["dims"]))
+    model.load_state_dict(artifact["model_state_dict"], assign=True)
+    if artifact["alignment_heads"] is not None:
+        model.set_alignment_heads(artifact["alignment_heads"].encode("ascii"))
+    return model.to(device)
+
+
+def load_whisper_model(model_name: str, device: str) -> Whisper:
+    """
+    Load the whisper model – from its memory-mapped artifact (converted from the checkpoint on the first use) if
+    the model artifacts are enabled, or straight from the checkpoint otherwise.
+    """
+    if not config.MODEL_ARTIFACTS_ENABLED:
+        return whisper.load_model(model_name).to(device)
+
+    artifact_path = get_model_artifact_path(model_name)
+    if not artifact_path.exists():
+        started_at = time.monotonic()
+        log.info(f"Converting the whisper model {model_name} to {artifact_path}...")
+        convert_model_checkpoint(model_name)
+        log.info(f"Whisper model {model_name} converted in {time.monotonic() - started_at:.1f}s")
+    return load_model_artifact(artifact_path, device)
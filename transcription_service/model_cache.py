@@ -0,0 +1,91 @@
+import gc
+import time
+from collections import OrderedDict
+from typing import Dict, List
+
+import torch
+import whisper
+
+from transcription_service.logger import log
+from transcription_service.model_artifacts import load_whisper_model
+from transcription_service.quantization import QUANTIZATION_NONE, get_device_id, quantize_whisper_model
+
+
+def get_model_memory(model: torch.nn.Module) -> int:
+    """Get the memory (in bytes) taken by the weights and buffers of the model (including the quantized weights)."""
+    quantized_weights = [
+        module.weight() for module in model.modules() if isinstance(module, torch.ao.nn.quantized.dynamic.Linear)
+    ]
+    return sum(
+        tensor.numel() * tensor.element_size() for tensor in (*model.parameters(), *model.buffers(), *quantized_weights)
+    )
+
+
+class ModelCache:
+    """
+    LRU cache of the loaded whisper models, within a memory budget – when a model is loaded, the least recently used
+    ones are unloaded until all of them fit into the budget (the model just loaded is always kept, even if it alone
+    exceeds it).
+    """
+
+    def __init__(self, device: str, max_memory: int, quantization: str = QUANTIZATION_NONE):
+        """
+        Args:
+            device (str): Device to load the models on.
+            max_memory (int): Memory budget of the models in bytes.
+            quantization (str): Quantization applied to the loaded models (see `transcription_service.quantization`).
+        """
+        self.device = device
+        self.max_memory = max_memory
+        self.quantization = quantization
+        self._models: OrderedDict[str, whisper.Whisper] = OrderedDict()
+        # Memory taken by the models loaded so far – even the ones already unloaded, so they are unloaded to fit
+        # before being loaded again.
+        self._models_memory: Dict[str, int] = {}
+
+    @property
+    def device_id(self) -> str:
+        """Identifier of the device and the quantization of the models."""
+        return get_device_id(self.device, self.quantization)
+
+    @property
+    def loaded_model_names(self) -> List[str]:
+        """Names of the loaded models, the most recently used first."""
+        return list(reversed(self._models))
+
+    def get(self, model_name: str) -> whisper.Whisper:
+        """Get the model with the given name, loading it if needed."""
+        if model_name in self._models:
+            self._models.move_to_end(model_name)
+            return self._models[model_name]
+
+        # Making room before loading if the model size is already known, so both don't have to fit at once.
+        self._evict(self._models_memory.get(model_name, 0))
+        log.info(f"Loading the whisper model {model_name} on {self.device}...")
+        started_at = time.monotonic()
+        model = self.put(model_name, quantize_whisper_model(load_whisper_model(model_name, self.device), self.quantization))
+        log.info(f"Whisper model {model_name} loaded in {time.monotonic() - started_at:.1f}s")
+        return model
+
+    def put(self, model_name: str, model: whisper.Whisper) -> whisper.Whisper:
+        """Add an already loaded model to the cache."""
+        self._models[model_name] = model
+        self._models.move_to_end(model_name)
+        self._models_memory[model_name] = get_model_memory(model)
+        self._evict(0)
+        return model
+
+    def _evict(self, required_memory: int) -> None:
+        """Unload the least recently used models (but the most recent one) until the required memory is free."""
+        evicted = False
+        while len(self._models) > 1 or (self._models and required_memory > 0):
+            used_memory = sum(self._models_memory[model_name] for model_name in self._models)
+            if used_memory + required_memory <= self.max_memory:
+                break
+            model_name, _ = self._models.popitem(last=False)
+            log.info(f"Unloading the whisper model {model_name} to fit into the memory budget")
+            evicted = True
+        if evicted:
+            gc.collect()
+            if self.device.startswith("cuda"):
+                torch.cuda.empty_cache()
@@ -1,7 +1,10 @@
+from datetime import datetime
 from enum import Enum
-from typing import List, Optional
+from typing import Dict, List, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+from transcription_service import config
 
 
 class MediaType(str, Enum):
@@ -18,6 +21,28 @@ class TimestampedWord(BaseModel):
 
 class UploadResponse(BaseModel):
     reference_id: str
+    # Estimated from the current backlog, None if there are no workers (or the upload is already transcribed).
+    estimated_start_at: Optional[datetime] = None
+    estimated_finish_at: Optional[datetime] = None
+
+
+class CreateUploadSessionRequest(BaseModel):
+    filename: str = Field(..., min_length=1)
+    # Total size of the file in bytes, if known – the session can be finalized only once all of it is received then.
+    size: Optional[int] = Field(None, ge=1)
+    include_word_timestamps: bool = False
+    # Whisper model to transcribe with (the default one if not given).
+    model: Optional[str] = None
+
+
+class UploadSessionResponse(BaseModel):
+    session_id: str
+    filename: str
+    size: Optional[int]
+    # Number of the bytes received so far – the next append starts there.
+    offset: int
+    # Unless there's another append before.
+    expires_at: datetime
 
 
 class TranscriptionStatusEnum(str, Enum):
@@ -28,17 +53,95 @@ class TranscriptionStatusEnum(str, Enum):
     UNKNOWN = "UNKNOWN"
 
 
+class TranscriptionProgress(BaseModel):
+    fraction: float
+    processed_seconds: float
+    duration_seconds: float
+    segments: int
+    real_time_factor: Optional[float]
+
+
+class SilenceSkippingReport(BaseModel):
+    duration_seconds: float
+    skipped_seconds: float
+    skipped_fraction: float
+    # Inference time of the skipped audio, estimated from the one of the transcribed speech.
+    estimated_time_saved_seconds: float
+
+
 class TranscriptionStatus(BaseModel):
     reference_id: str
     status: TranscriptionStatusEnum
     error_message: Optional[str]
+    # Reported only while the transcription is being processed.
+    progress: Optional[TranscriptionProgress] = None
+    # Estimated only for the status of a single queued or processed transcription.
+    estimated_start_at: Optional[datetime] = None
+    estimated_finish_at: Optional[datetime] = None
+    # Reported for the completed transcriptions, if the silence skipping is enabled.
+    silence_skipping: Optional[SilenceSkippingReport] = None
+
+
+class TranscriptSegment(BaseModel):
+    start: float
+    end: float
+    text: str
+
+
+class PartialTranscriptionResponse(BaseModel):
+    reference_id: str
+    status: TranscriptionStatusEnum
+    progress: Optional[TranscriptionProgress]
+    # Segments starting from the requested offset.
+    offset: int
+    segments: List[TranscriptSegment]
 
 
 class ListTranscriptionStatusesPaginatedResponse(BaseModel):
     items: List[TranscriptionStatus]
     total: int
-    page: int
+    # Page number is not known when paginating with a cursor.
+    page: Optional[int]
     size: int
+    next_cursor: Optional[str] = None
+
+
+class BatchTranscriptionStatusesRequest(BaseModel):
+    reference_ids: List[str] = Field(..., min_length=1, max_length=config.STATUS_BATCH_MAX_SIZE)
+
+
+class BatchTranscriptionStatusesResponse(BaseModel):
+    items: List[TranscriptionStatus]
+    not_found: List[str]
+
+
+class BatchUploadRequest(BaseModel):
+    # Resumable uploads (all of their data received) to be finalized at once.
+    session_ids: List[str] = Field(..., min_length=1, max_length=config.UPLOAD_BATCH_MAX_SIZE)
+
+
+class BatchUploadResponse(BaseModel):
+    batch_id: str
+    # In the order the files (or the sessions) were submitted.
+    items: List[UploadResponse]
+
+
+class BatchStatusResponse(BaseModel):
+    batch_id: str
+    created_at: datetime
+    total: int
+    # Number of the uploads of the batch by their status.
+    counts: Dict[TranscriptionStatusEnum, int]
+    # Whether all the uploads of the batch are completed or failed.
+    finished: bool
+    # Statuses of the uploads of the batch (only if requested).
+    items: Optional[List[TranscriptionStatus]] = None
+
+
+class ResultCacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    entries: int
 
 
 class HealthCheckResponse(BaseModel):
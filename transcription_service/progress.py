@@ -0,0 +1,92 @@
+import json
+import time
+from typing import List, Optional
+
+from redis.asyncio import Redis as AsyncRedis
+from rq.job import Job
+
+from transcription_service import config
+
+# Redis lists of the segments transcribed so far (JSON encoded), by reference ID.
+PARTIAL_TRANSCRIPT_KEY_PREFIX = "transcription_service:partial_transcript:"
+# Partial transcripts expire this long after their last update – once the job is finished, the whole transcription
+# is available anyway.
+PARTIAL_TRANSCRIPT_TTL = 24 * 60 * 60
+
+
+def get_partial_transcript_key(reference_id: str) -> str:
+    return f"{PARTIAL_TRANSCRIPT_KEY_PREFIX}{reference_id}"
+
+
+class ProgressReporter:
+    """
+    Publisher of the progress of a running transcription job – the progress itself is stored in the job meta (under
+    the `progress` key), while the segments transcribed so far are appended to the partial transcript list.
+
+    Updates are rate limited to one per `min_interval` seconds (except for the forced ones), and only the segments not
+    published yet are sent, so reporting is cheap regardless of how often it is called.
+    """
+
+    def __init__(self, job: Job, duration: float, min_interval: float = config.PROGRESS_UPDATE_INTERVAL):
+        self.job = job
+        self.duration = duration
+        self.min_interval = min_interval
+        self._started_at = time.monotonic()
+        self._last_published_at: Optional[float] = None
+        self._published_segments_count = 0
+        # Media processed by the previous attempts of the job, see `resume_from`.
+        self._resumed_duration = 0.0
+        # Leftovers of a previous attempt of the job.
+        job.connection.delete(get_partial_transcript_key(job.id))
+
+    def resume_from(self, resumed_duration: float) -> None:
+        """Account the media (in seconds) processed by the previous attempts – excluded from the real-time factor."""
+        self._resumed_duration = resumed_duration
+
+    def update(self, processed_duration: float, segments: List[dict], force: bool = False) -> None:
+        """
+        Report the progress of the transcription.
+
+        Args:
+            processed_duration (float): Duration of the media processed so far in seconds.
+            segments (List[dict]): All the segments (with `start`, `end` and `text`) transcribed so far, timed from the
+                media start – the ones already published are expected to not change.
+            force (bool): Whether to publish the progress regardless of the rate limiting.
+        """
+        now = time.monotonic()
+        if not force and self._last_published_at is not None and now - self._last_published_at < self.min_interval:
+            return
+        self._last_published_at = now
+
+        processed_duration = min(processed_duration, self.duration)
+        transcribed_duration = processed_duration - self._resumed_duration
+        self.job.meta["progress"] = {
+            "fraction": processed_duration / self.duration if self.duration > 0 else 1.0,
+            "processed_seconds": processed_duration,
+            "duration_seconds": self.duration,
+            "segments": len(segments),
+            # Processing time per second of the media, so < 1 is faster than real time.
+            "real_time_factor": (now - self._started_at) / transcribed_duration if transcribed_duration > 0 else None,
+        }
+        new_segments = segments[self._published_segments_count :]
+        partial_transcript_key = get_partial_transcript_key(self.job.id)
+        with self.job.connection.pipeline(transaction=False) as pipeline:
+            # The same as `Job.save_meta`, just in the same round trip.
+            pipeline.hset(self.job.key, "meta", self.job.serializer.dumps(self.job.meta))
+            if new_segments:
+                pipeline.rpush(
+                    partial_transcript_key,
+                    *(
+                        json.dumps({"start": segment["start"], "end": segment["end"], "text": segment["text"]})
+                        for segment in new_segments
+                    ),
+                )
+            pipeline.expire(partial_transcript_key, PARTIAL_TRANSCRIPT_TTL)
+            pipeline.execute()
+        self._published_segments_count = len(segments)
+
+
+async def get_partial_transcript(redis_conn: AsyncRedis, reference_id: str, offset: int = 0) -> List[dict]:
+    """Get the segments transcribed so far (starting from the given offset) of the given reference ID."""
+    segments = await redis_conn.lrange(get_partial_transcript_key(reference_id), offset, -1)
+    return [json.loads(segment) for segment in segments]
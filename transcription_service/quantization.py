@@ -0,0 +1,32 @@
+import torch
+import whisper
+
+# Quantization modes of the whisper models (WHISPER_MODEL_QUANTIZATION values).
+QUANTIZATION_NONE = "none"
+# Dynamic int8 quantization of the linear layers – their weights are stored in int8 and the activations are quantized
+# on the fly, so the matrix multiplications (the bulk of the inference on the CPU) run on int8.
+QUANTIZATION_INT8 = "int8"
+QUANTIZATIONS = [QUANTIZATION_NONE, QUANTIZATION_INT8]
+
+
+def get_device_id(device: str, quantization: str) -> str:
+    """Get the identifier of the device and the quantization, as their transcription speeds differ."""
+    return device if quantization == QUANTIZATION_NONE else f"{device}-{quantization}"
+
+
+def quantize_whisper_model(model: whisper.Whisper, quantization: str) -> whisper.Whisper:
+    """
+    Quantize the (CPU) whisper model in place.
+
+    Whisper uses its own subclass of the linear layer (casting the weights to the input dtype), which the dynamic
+    quantization doesn't recognize – in float32 it's the same as the plain linear layer, so it's swapped for it first.
+    """
+    if quantization == QUANTIZATION_NONE:
+        return model
+    if quantization != QUANTIZATION_INT8:
+        raise ValueError(f"Unsupported quantization: {quantization}. Supported ones: {', '.join(QUANTIZATIONS)}")
+
+    for module in model.modules():
+        if type(module) is whisper.model.Linear:
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
@@ -0,0 +1,76 @@
+import time
+from typing import Dict, Optional
+
+from redis import Redis
+
+from transcription_service import config
+
+# Cache entries map the (content hash, model, format) of an upload to the reference ID with the finished transcription.
+RESULT_CACHE_KEY_PREFIX = "transcription_service:result_cache:"
+# Sorted set of all the cache entries scored by their last access time – used for the LRU/age based eviction.
+RESULT_CACHE_INDEX_KEY = "transcription_service:result_cache_index"
+RESULT_CACHE_HITS_KEY = "transcription_service:result_cache_hits"
+RESULT_CACHE_MISSES_KEY = "transcription_service:result_cache_misses"
+
+
+def get_result_cache_key(content_hash: str, model_name: str, include_word_timestamps: bool) -> str:
+    return f"{RESULT_CACHE_KEY_PREFIX}{content_hash}:{model_name}:{int(include_word_timestamps)}"
+
+
+def get_cached_reference_id(redis_conn: Redis, cache_key: str) -> Optional[str]:
+    """
+    Get the reference ID of an already finished transcription for the given cache key, refreshing the entry's
+    position in the LRU order.
+    """
+    reference_id = redis_conn.get(cache_key)
+    if reference_id is None:
+        return None
+
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.expire(cache_key, config.RESULT_CACHE_MAX_AGE_SECONDS)
+        pipeline.zadd(RESULT_CACHE_INDEX_KEY, {cache_key: time.time()})
+        pipeline.execute()
+    return reference_id.decode("utf-8")
+
+
+def count_result_cache_lookup(redis_conn: Redis, hit: bool) -> None:
+    redis_conn.incr(RESULT_CACHE_HITS_KEY if hit else RESULT_CACHE_MISSES_KEY)
+
+
+def invalidate_cached_result(redis_conn: Redis, cache_key: str) -> None:
+    """Remove an entry pointing to a transcription which is no longer available."""
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.delete(cache_key)
+        pipeline.zrem(RESULT_CACHE_INDEX_KEY, cache_key)
+        pipeline.execute()
+
+
+def add_cached_result(redis_conn: Redis, cache_key: str, reference_id: str) -> None:
+    """
+    Store the reference ID of a finished transcription under the given cache key, and evict the entries that were
+    not accessed for longer than the configured max age or that exceed the configured max number of entries (the least
+    recently used ones first).
+    """
+    now = time.time()
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.set(cache_key, reference_id, ex=config.RESULT_CACHE_MAX_AGE_SECONDS)
+        pipeline.zadd(RESULT_CACHE_INDEX_KEY, {cache_key: now})
+        # Entries older than the max age are already expired, so only the index has to be cleaned up.
+        pipeline.zremrangebyscore(RESULT_CACHE_INDEX_KEY, "-inf", now - config.RESULT_CACHE_MAX_AGE_SECONDS)
+        pipeline.zcard(RESULT_CACHE_INDEX_KEY)
+        *_, entries_count = pipeline.execute()
+
+    excess_entries_count = entries_count - config.RESULT_CACHE_MAX_ENTRIES
+    if excess_entries_count > 0:
+        evicted = redis_conn.zpopmin(RESULT_CACHE_INDEX_KEY, excess_entries_count)
+        if evicted:
+            redis_conn.delete(*(evicted_key for evicted_key, _ in evicted))
+
+
+def get_result_cache_stats(redis_conn: Redis) -> Dict[str, int]:
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.get(RESULT_CACHE_HITS_KEY)
+        pipeline.get(RESULT_CACHE_MISSES_KEY)
+        pipeline.zcard(RESULT_CACHE_INDEX_KEY)
+        hits, misses, entries = pipeline.execute()
+    return {"hits": int(hits or 0), "misses": int(misses or 0), "entries": entries}
@@ -0,0 +1,211 @@
+import gzip
+import json
+import os
+import tempfile
+import textwrap
+import zlib
+from contextlib import ExitStack
+from enum import Enum
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+
+from transcription_service import config
+from transcription_service.logger import log
+
+try:
+    import zstandard
+except ImportError:
+    # Optional – only needed for the zstd-compressed results.
+    zstandard = None
+
+
+class ResultFormat(str, Enum):
+    # The legacy format – the plain text, or the JSON list of the words with their timestamps (as strings).
+    TXT = "txt"
+    # Compact JSON of the text and the segments (with the words, if requested) with numeric timestamps.
+    JSON = "json"
+    # A JSON object of a segment per line.
+    NDJSON = "ndjson"
+    SRT = "srt"
+    VTT = "vtt"
+
+
+RESULT_MEDIA_TYPES = {
+    ResultFormat.TXT: "text/plain; charset=utf-8",
+    ResultFormat.JSON: "application/json",
+    ResultFormat.NDJSON: "application/x-ndjson",
+    ResultFormat.SRT: "application/x-subrip",
+    ResultFormat.VTT: "text/vtt; charset=utf-8",
+}
+# Suffixes of the precompressed results by their content coding, in the order the downloads prefer them.
+RESULT_ENCODING_SUFFIXES = {"zstd": ".zst", "gzip": ".gz"}
+# Levels balancing the compression ratio and the time of the result write.
+GZIP_COMPRESS_LEVEL = 6
+ZSTD_COMPRESS_LEVEL = 10
+
+
+def get_result_encodings() -> List[str]:
+    """Get the content codings the results are precompressed with (zstd only if the `zstandard` package is installed)."""
+    return [
+        encoding
+        for encoding in RESULT_ENCODING_SUFFIXES
+        if encoding in config.RESULT_ENCODINGS and (encoding != "zstd" or zstandard is not None)
+    ]
+
+
+def get_result_path(reference_id: str, result_format: ResultFormat, encoding: Optional[str] = None) -> Path:
+    """Get the path of the transcription result in the format (precompressed with the content coding, if given)."""
+    suffix = RESULT_ENCODING_SUFFIXES[encoding] if encoding is not None else ""
+    return config.TRANSCRIPTIONS_DIR / f"{reference_id}.{result_format.value}{suffix}"
+
+
+def get_result_paths(reference_id: str) -> List[Path]:
+    """Get the paths of all the (possible) files of the transcription result – the legacy `.txt` one first."""
+    return [
+        get_result_path(reference_id, ResultFormat.TXT),
+        *(
+            get_result_path(reference_id, result_format, encoding)
+            for result_format in ResultFormat
+            for encoding in RESULT_ENCODING_SUFFIXES
+        ),
+    ]
+
+
+def get_decompressor(encoding: str):
+    """Get a streaming decompressor (with a `decompress` method) of the precompressed results of the content coding."""
+    if encoding == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unsupported content coding: {encoding}")
+
+
+def _format_timestamp(seconds: float, decimal_marker: str) -> str:
+    hours, milliseconds = divmod(round(seconds * 1000), 60 * 60 * 1000)
+    minutes, milliseconds = divmod(milliseconds, 60 * 1000)
+    seconds, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def _get_segment_record(segment: dict, include_word_timestamps: bool) -> dict:
+    record = {"start": round(segment["start"], 3), "end": round(segment["end"], 3), "text": segment["text"]}
+    if include_word_timestamps:
+        record["words"] = [
+            {"word": word["word"], "start": round(word["start"], 3), "end": round(word["end"], 3)}
+            for word in segment.get("words", [])
+        ]
+    return record
+
+
+def _iter_txt(segments: List[dict], text: str, include_word_timestamps: bool) -> Iterator[str]:
+    if not include_word_timestamps:
+        yield text
+        return
+    # The same as `json.dumps(words, indent=4)` of the list of all the words, without building it.
+    is_first = True
+    for segment in segments:
+        for word_info in segment["words"]:
+            word = {"word": word_info["word"], "start": f"{word_info['start']:.2f}", "end": f"{word_info['end']:.2f}"}
+            yield ("[\n" if is_first else ",\n") + textwrap.indent(json.dumps(word, indent=4), " " * 4)
+            is_first = False
+    yield "[]" if is_first else "\n]"
+
+
+def _iter_json(segments: List[dict], text: str, include_word_timestamps: bool) -> Iterator[str]:
+    yield f'{{"text":{json.dumps(text, ensure_ascii=False)},"segments":['
+    for i, segment in enumerate(segments):
+        record = _get_segment_record(segment, include_word_timestamps)
+        yield ("," if i else "") + json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    yield "]}"
+
+
+def _iter_ndjson(segments: List[dict], text: str, include_word_timestamps: bool) -> Iterator[str]:
+    for segment in segments:
+        record = _get_segment_record(segment, include_word_timestamps)
+        yield json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+def _iter_srt(segments: List[dict], text: str, include_word_timestamps: bool) -> Iterator[str]:
+    for i, segment in enumerate(segments, start=1):
+        start, end = _format_timestamp(segment["start"], ","), _format_timestamp(segment["end"], ",")
+        yield f"{i}\n{start} --> {end}\n{segment['text'].strip()}\n\n"
+
+
+def _iter_vtt(segments: List[dict], text: str, include_word_timestamps: bool) -> Iterator[str]:
+    yield "WEBVTT\n\n"
+    for segment in segments:
+        start, end = _format_timestamp(segment["start"], "."), _format_timestamp(segment["end"], ".")
+        yield f"{start} --> {end}\n{segment['text'].strip()}\n\n"
+
+
+_FORMATTERS = {
+    ResultFormat.TXT: _iter_txt,
+    ResultFormat.JSON: _iter_json,
+    ResultFormat.NDJSON: _iter_ndjson,
+    ResultFormat.SRT: _iter_srt,
+    ResultFormat.VTT: _iter_vtt,
+}
+
+
+def _open_compressed(f: BinaryIO, encoding: str) -> BinaryIO:
+    if encoding == "gzip":
+        # Without the mtime, the same result is compressed to the same bytes.
+        return gzip.GzipFile(fileobj=f, mode="wb", compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+    return zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).stream_writer(f, closefd=False)
+
+
+def _write_result(
+    reference_id: str, result_format: ResultFormat, chunks: Iterator[str], include_plain: bool, encodings: List[str]
+) -> None:
+    """
+    Write the result chunk by chunk to all its files at once – the plain one (if `include_plain`) and the ones
+    precompressed with the content codings. Every file is written to a temporary one first and then renamed, so a
+    partial result is never served.
+    """
+    all_encodings = [*([None] if include_plain else []), *encodings]
+    paths = [get_result_path(reference_id, result_format, encoding) for encoding in all_encodings]
+    temporary_paths = []
+    try:
+        with ExitStack() as stack:
+            writers = []
+            for path, encoding in zip(paths, all_encodings):
+                f = stack.enter_context(
+                    tempfile.NamedTemporaryFile("wb", dir=path.parent, prefix=f".{path.name}.", delete=False)
+                )
+                temporary_paths.append(f.name)
+                writers.append(stack.enter_context(_open_compressed(f, encoding)) if encoding is not None else f)
+            for chunk in chunks:
+                data = chunk.encode("utf-8")
+                for writer in writers:
+                    writer.write(data)
+    except BaseException:
+        for temporary_path in temporary_paths:
+            os.unlink(temporary_path)
+        raise
+    for temporary_path, path in zip(temporary_paths, paths):
+        os.replace(temporary_path, path)
+
+
+def write_transcription_results(reference_id: str, segments: List[dict], text: str, include_word_timestamps: bool) -> None:
+    """
+    Write the result of the transcription – the legacy `.txt` one, and every one of `RESULT_FORMATS` precompressed
+    with every one of `RESULT_ENCODINGS`, so the downloads are served without serializing (or compressing) them again.
+    The results are serialized incrementally, segment by segment, rather than building all of them in memory first.
+
+    Args:
+        reference_id (str): The reference ID of the transcribed file.
+        segments (List[dict]): The transcribed segments (with the words, if `include_word_timestamps`).
+        text (str): The whole transcribed text.
+        include_word_timestamps (bool): Whether the results include the word timestamps.
+    """
+    if "zstd" in config.RESULT_ENCODINGS and zstandard is None:
+        log.warning("The results are not compressed with zstd – the `zstandard` package is not installed")
+    for result_format in dict.fromkeys([ResultFormat.TXT, *map(ResultFormat, config.RESULT_FORMATS)]):
+        _write_result(
+            reference_id,
+            result_format,
+            _FORMATTERS[result_format](segments, text, include_word_timestamps),
+            # The legacy result is kept plain as well (e.g. for the clients reading it from the volume).
+            include_plain=result_format == ResultFormat.TXT,
+            encodings=get_result_encodings() if result_format.value in config.RESULT_FORMATS else [],
+        )
@@ -0,0 +1,269 @@
+import shutil
+import time
+from datetime import timezone
+from typing import List
+
+from redis import Redis
+from rq.job import Job, JobStatus
+from rq.registry import FailedJobRegistry, FinishedJobRegistry
+from rq.results import Result
+from rq.utils import as_text, utcparse
+
+from transcription_service import config
+from transcription_service.checkpoints import get_checkpoint_path
+from transcription_service.job_archive import ArchivedJob, archive_jobs, get_expired_media, mark_media_removed
+from transcription_service.logger import log
+from transcription_service.models import TranscriptionStatusEnum
+from transcription_service.progress import get_partial_transcript_key
+from transcription_service.scheduling import LEGACY_QUEUE_NAME, SIZE_CLASS_QUEUE_NAMES, get_model_queue_name
+from transcription_service.upload_sessions import get_upload_session_key
+from transcription_service.uploads_index import UPLOADS_INDEX_KEY
+
+# Held by the process running the retention, so the workers don't run it concurrently.
+RETENTION_LOCK_KEY = "transcription_service:retention_lock"
+RETENTION_LOCK_TIMEOUT = 10 * 60
+# Number of the jobs (media files) handled at once, and at most by a single run – so a worker running it as a
+# maintenance task is not held off its jobs for too long, the rest is left for the next run.
+RETENTION_BATCH_SIZE = 500
+RETENTION_MAX_BATCHES_PER_RUN = 20
+# Meta of the jobs kept in the archive – the rest (e.g. the progress) is only relevant while the job is running.
+ARCHIVED_META_KEYS = ("duration", "silence_skipping", "deduplicated_from", "trace_id")
+
+_ARCHIVED_JOB_STATUSES = {
+    JobStatus.FINISHED: TranscriptionStatusEnum.COMPLETED,
+    JobStatus.FAILED: TranscriptionStatusEnum.FAILED,
+}
+
+
+def _get_queue_names() -> List[str]:
+    return [
+        *(
+            get_model_queue_name(queue_name, model_name)
+            for model_name in config.WHISPER_MODELS
+            for queue_name in SIZE_CLASS_QUEUE_NAMES
+        ),
+        LEGACY_QUEUE_NAME,
+    ]
+
+
+def _get_expired_job_ids(redis_conn: Redis, registry_key: str, ended_before: float) -> List[str]:
+    """Get the (up to `RETENTION_BATCH_SIZE`) jobs of the registry that ended before the given time."""
+    expired_job_ids: List[str] = []
+    # The jobs are kept forever, so the registries are not sorted by the time they ended – the jobs are checked one by
+    # one, but only the recently ended ones are left in the registries after the compaction.
+    offset = 0
+    while len(expired_job_ids) < RETENTION_BATCH_SIZE:
+        job_ids = [as_text(job_id) for job_id in redis_conn.zrange(registry_key, offset, offset + RETENTION_BATCH_SIZE - 1)]
+        if not job_ids:
+            break
+        offset += len(job_ids)
+        with redis_conn.pipeline(transaction=False) as pipeline:
+            for job_id in job_ids:
+                pipeline.hget(Job.key_for(job_id), "ended_at")
+            ended_ats = pipeline.execute()
+        expired_job_ids.extend(
+            job_id
+            for job_id, ended_at in zip(job_ids, ended_ats)
+            # Without the end time (e.g. the job hash is gone), there's nothing to keep.
+            if ended_at is None or utcparse(as_text(ended_at)).replace(tzinfo=timezone.utc).timestamp() < ended_before
+        )
+    return expired_job_ids[:RETENTION_BATCH_SIZE]
+
+
+def _compact_jobs(redis_conn: Redis, registry_key: str, job_ids: List[str]) -> int:
+    """
+    Move the finished jobs of the registry to the archive – only once they are archived (durably), they are removed
+    from Redis, so their status is always available from one or the other.
+
+    Returns:
+        int: The number of the jobs archived.
+    """
+    jobs = Job.fetch_many(job_ids, connection=redis_conn)
+    uploaded_ats = redis_conn.zmscore(UPLOADS_INDEX_KEY, job_ids)
+    archived_jobs = []
+    for job_id, job, uploaded_at in zip(job_ids, jobs, uploaded_ats):
+        status = _ARCHIVED_JOB_STATUSES.get(job.get_status(refresh=False)) if job is not None else None
+        if status is None:
+            # E.g. a re-upload under the same reference ID, enqueued again – only the registry entry is stale.
+            continue
+        archived_jobs.append(
+            ArchivedJob(
+                reference_id=job_id,
+                status=status,
+                error_message=job.exc_info if status == TranscriptionStatusEnum.FAILED else None,
+                meta={key: job.meta[key] for key in ARCHIVED_META_KEYS if job.meta.get(key) is not None},
+                uploaded_at=uploaded_at,
+                ended_at=job.ended_at.replace(tzinfo=timezone.utc).timestamp() if job.ended_at is not None else None,
+            )
+        )
+    archive_jobs(archived_jobs)
+
+    with redis_conn.pipeline() as pipeline:
+        pipeline.zrem(registry_key, *job_ids)
+        for archived_job in archived_jobs:
+            job_key = Job.key_for(archived_job.reference_id)
+            pipeline.delete(
+                job_key,
+                f"{job_key}:dependents",
+                f"{job_key}:dependencies",
+                Result.get_key(archived_job.reference_id),
+                get_partial_transcript_key(archived_job.reference_id),
+            )
+        pipeline.execute()
+    for archived_job in archived_jobs:
+        # Left behind by the failed jobs.
+        get_checkpoint_path(archived_job.reference_id).unlink(missing_ok=True)
+    return len(archived_jobs)
+
+
+def compact_finished_jobs(redis_conn: Redis, min_age: float) -> int:
+    """
+    Move the jobs which finished (completed or failed) more than `min_age` seconds ago from Redis to the archive.
+
+    Returns:
+        int: The number of the jobs archived.
+    """
+    ended_before = time.time() - min_age
+    archived_count = 0
+    batches_count = 0
+    for queue_name in _get_queue_names():
+        for registry_key in (
+            FinishedJobRegistry(queue_name, connection=redis_conn).key,
+            FailedJobRegistry(queue_name, connection=redis_conn).key,
+        ):
+            while batches_count < RETENTION_MAX_BATCHES_PER_RUN:
+                job_ids = _get_expired_job_ids(redis_conn, registry_key, ended_before)
+                if not job_ids:
+                    break
+                archived_count += _compact_jobs(redis_conn, registry_key, job_ids)
+                batches_count += 1
+    return archived_count
+
+
+def remove_expired_media(max_age: float) -> int:
+    """
+    Delete the media of the archived jobs uploaded more than `max_age` seconds ago (or move them to `MEDIA_ARCHIVE_DIR`,
+    if set). The media of the jobs still in Redis (queued, running or finished recently) are always kept.
+
+    Returns:
+        int: The number of the media removed.
+    """
+    uploaded_before = time.time() - max_age
+    if config.MEDIA_ARCHIVE_DIR is not None:
+        config.MEDIA_ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    removed_count = 0
+    for _ in range(RETENTION_MAX_BATCHES_PER_RUN):
+        reference_ids = get_expired_media(uploaded_before, RETENTION_BATCH_SIZE)
+        if not reference_ids:
+            break
+        for reference_id in reference_ids:
+            media_path = config.UPLOADS_DIR / reference_id
+            try:
+                if config.MEDIA_ARCHIVE_DIR is not None:
+                    shutil.move(media_path, config.MEDIA_ARCHIVE_DIR / reference_id)
+                else:
+                    media_path.unlink()
+                removed_count += 1
+            except FileNotFoundError:
+                # Already removed by hand.
+                pass
+        mark_media_removed(reference_ids)
+    return removed_count
+
+
+def remove_stale_checkpoints(redis_conn: Redis, min_age: float) -> int:
+    """
+    Delete the checkpoints not updated for more than `min_age` seconds whose jobs are not going to continue from them
+    (e.g. the job was deleted).
+
+    Returns:
+        int: The number of the checkpoints deleted.
+    """
+    if not config.CHECKPOINTS_DIR.exists():
+        return 0
+    updated_before = time.time() - min_age
+    stale_paths = [path for path in config.CHECKPOINTS_DIR.glob("*.jsonl") if path.stat().st_mtime < updated_before]
+    if not stale_paths:
+        return 0
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for path in stale_paths:
+            pipeline.hget(Job.key_for(path.stem), "status")
+        statuses = pipeline.execute()
+    removed_count = 0
+    for path, status in zip(stale_paths, statuses):
+        if status is None or JobStatus(as_text(status)) not in (JobStatus.QUEUED, JobStatus.STARTED, JobStatus.SCHEDULED):
+            path.unlink(missing_ok=True)
+            removed_count += 1
+    return removed_count
+
+
+def remove_expired_upload_sessions(redis_conn: Redis) -> int:
+    """
+    Delete the data received by the resumable uploads whose sessions expired (not appended to for longer than
+    `UPLOAD_SESSION_TTL`).
+
+    Returns:
+        int: The number of the upload sessions' files deleted.
+    """
+    if not config.UPLOAD_SESSIONS_DIR.exists():
+        return 0
+    updated_before = time.time() - config.UPLOAD_SESSION_TTL
+    stale_paths = [
+        path for path in config.UPLOAD_SESSIONS_DIR.iterdir() if path.is_file() and path.stat().st_mtime < updated_before
+    ]
+    if not stale_paths:
+        return 0
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        for path in stale_paths:
+            pipeline.exists(get_upload_session_key(path.name))
+        sessions_exist = pipeline.execute()
+    removed_count = 0
+    for path, session_exists in zip(stale_paths, sessions_exist):
+        if not session_exists:
+            path.unlink(missing_ok=True)
+            removed_count += 1
+    return removed_count
+
+
+def run_retention(redis_conn: Redis) -> None:
+    """
+    Run all the retention tasks enabled by the configuration, and the cleanup of the expired upload sessions – unless
+    they are already being run by another process.
+    """
+    if (
+        config.JOB_COMPACTION_MIN_AGE_SECONDS <= 0
+        and config.MEDIA_RETENTION_SECONDS <= 0
+        and not config.UPLOAD_SESSIONS_DIR.exists()
+    ):
+        return
+    lock = redis_conn.lock(RETENTION_LOCK_KEY, timeout=RETENTION_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        started_at = time.monotonic()
+        if config.JOB_COMPACTION_MIN_AGE_SECONDS > 0:
+            archived_count = compact_finished_jobs(redis_conn, config.JOB_COMPACTION_MIN_AGE_SECONDS)
+            removed_checkpoints_count = remove_stale_checkpoints(redis_conn, config.JOB_COMPACTION_MIN_AGE_SECONDS)
+            log.info(f"Archived {archived_count} finished jobs, removed {removed_checkpoints_count} stale checkpoints")
+        if config.MEDIA_RETENTION_SECONDS > 0:
+            removed_media_count = remove_expired_media(config.MEDIA_RETENTION_SECONDS)
+            log.info(f"Removed {removed_media_count} expired media files")
+        removed_upload_sessions_count = remove_expired_upload_sessions(redis_conn)
+        if removed_upload_sessions_count:
+            log.info(f"Removed {removed_upload_sessions_count} expired upload sessions")
+        log.info(f"Retention finished in {time.monotonic() - started_at:.1f}s")
+    finally:
+        lock.release()
+
+
+def main():
+    """
+    One-off run of the retention (it's run periodically by the workers as well).
+    """
+    log.info("Starting the retention. Establishing connection to Redis...")
+    redis_conn = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB)
+    run_retention(redis_conn)
+
+
+if __name__ == "__main__":
+    main()
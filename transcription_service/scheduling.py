@@ -0,0 +1,146 @@
+from enum import Enum
+from typing import Dict, List, Optional, Set, Tuple
+
+from rq import Retry
+
+from transcription_service import config
+
+# Size-class queues – the transcriptions are routed by the duration of the media, so the short files are not stuck
+# behind the long ones. Listed from the shortest class. Every model has its own queues (see `get_model_queue_name`).
+SHORT_QUEUE_NAME = "short"
+MEDIUM_QUEUE_NAME = "medium"
+LONG_QUEUE_NAME = "long"
+SIZE_CLASS_QUEUE_NAMES = [SHORT_QUEUE_NAME, MEDIUM_QUEUE_NAME, LONG_QUEUE_NAME]
+# Queue of all the transcriptions enqueued before the size classes were introduced – still drained by the workers
+# (with the default model), after the size classes.
+LEGACY_QUEUE_NAME = "default"
+SCHEDULED_QUEUE_NAMES = [*SIZE_CLASS_QUEUE_NAMES, LEGACY_QUEUE_NAME]
+MODEL_QUEUE_NAME_SEPARATOR = ":"
+# Queue of the chunk jobs of fan-out transcriptions – listened to by workers before the other queues, so files which
+# are already being transcribed are finished first.
+CHUNKS_QUEUE_NAME = "chunks"
+
+# Timeout of the jobs with unknown media duration.
+DEFAULT_JOB_TIMEOUT = 60 * 60
+
+
+class QueuePolicy(str, Enum):
+    # Shorter size classes first, but the jobs waiting for long are promoted (see `order_by_shortest_job_first`).
+    SHORTEST_JOB_FIRST = "sjf"
+    # Every size class gets its (weighted) share of the worker's time (see `FairShareScheduler`).
+    FAIR_SHARE = "fair"
+
+
+def get_size_class_queue_name(duration: Optional[float]) -> str:
+    """
+    Get the name of the queue for the media of the given duration (in seconds) – the unknown durations are treated as
+    the medium ones.
+    """
+    if duration is None:
+        return MEDIUM_QUEUE_NAME
+    if duration <= config.SHORT_MEDIA_MAX_DURATION:
+        return SHORT_QUEUE_NAME
+    if duration <= config.MEDIUM_MEDIA_MAX_DURATION:
+        return MEDIUM_QUEUE_NAME
+    return LONG_QUEUE_NAME
+
+
+def get_model_queue_name(queue_name: str, model_name: str) -> str:
+    """Get the name of the given queue of the given model, e.g. `short:large-v3`."""
+    return f"{queue_name}{MODEL_QUEUE_NAME_SEPARATOR}{model_name}"
+
+
+def parse_model_queue_name(queue_name: str) -> Tuple[str, str]:
+    """
+    Split the name of a per-model queue into the (size-class or other) queue name and the model name – the queues
+    without the model (the legacy one) are of the default model.
+    """
+    base_queue_name, _, model_name = queue_name.partition(MODEL_QUEUE_NAME_SEPARATOR)
+    return base_queue_name, model_name or config.WHISPER_MODEL_NAME
+
+
+def get_job_timeout(duration: Optional[float]) -> int:
+    """Get the timeout of the transcription of the media of the given duration (in seconds)."""
+    if duration is None:
+        return DEFAULT_JOB_TIMEOUT
+    return int(config.JOB_TIMEOUT_BASE + config.JOB_TIMEOUT_DURATION_FACTOR * duration)
+
+
+def get_job_retry() -> Optional[Retry]:
+    """
+    Get the retry policy of the transcription jobs – retried right away, as the failures worth retrying (a worker died
+    or the job timed out) are not transient, and the retried transcriptions continue from their checkpoints.
+    """
+    return Retry(max=config.JOB_MAX_RETRIES) if config.JOB_MAX_RETRIES > 0 else None
+
+
+def parse_fair_share_weights(weights: str) -> Dict[str, float]:
+    """Parse the weights of the queues given as a comma separated list of `<queue name>=<weight>` pairs."""
+    parsed_weights = {}
+    for pair in filter(None, weights.split(",")):
+        queue_name, weight = pair.split("=")
+        parsed_weights[queue_name.strip()] = float(weight)
+    return parsed_weights
+
+
+def order_by_shortest_job_first(
+    queue_names: List[str], head_waits: Dict[str, Optional[float]], aging_interval: float
+) -> List[str]:
+    """
+    Order the queues by the size class of their jobs (shortest first), with aging – every `aging_interval` seconds the
+    job at the head of a queue waits, it's promoted by one size class, so the long jobs don't starve.
+
+    Args:
+        queue_names (List[str]): Names of the queues, ordered from the shortest size class.
+        head_waits (Dict[str, Optional[float]]): How long the job at the head of every queue has been waiting in
+            seconds (None for the empty queues).
+        aging_interval (float): Waiting time promoting a job by one size class in seconds (0 disables the aging).
+
+    Returns:
+        List[str]: Names of the queues in the order they should be drained in.
+    """
+
+    def effective_rank(rank_and_name):
+        rank, queue_name = rank_and_name
+        wait = head_waits.get(queue_name)
+        if wait is None or aging_interval <= 0:
+            return rank, rank
+        # Ties are resolved in favor of the shorter size class.
+        return rank - wait // aging_interval, rank
+
+    return [queue_name for _, queue_name in sorted(enumerate(queue_names), key=effective_rank)]
+
+
+class FairShareScheduler:
+    """
+    Weighted fair share of the worker's time between the queues – the queues are drained starting from the least
+    served one, i.e. the one with the lowest time spent on its jobs relative to its weight (virtual time). So every
+    queue with waiting jobs gets at least its weighted share of the time.
+
+    Queues don't accumulate any credit while they are empty (their virtual time is kept up with the busy queues),
+    so a queue becoming busy again doesn't take over the worker until it catches up.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.virtual_times: Dict[str, float] = {}
+
+    def record(self, queue_name: str, busy_time: float) -> None:
+        """Record the time (in seconds) spent on a job of the given queue."""
+        virtual_busy_time = busy_time / self.weights.get(queue_name, 1.0)
+        self.virtual_times[queue_name] = self.virtual_times.get(queue_name, 0.0) + virtual_busy_time
+
+    def order(self, queue_names: List[str], non_empty_queue_names: Set[str]) -> List[str]:
+        """
+        Args:
+            queue_names (List[str]): Names of the queues, ordered from the shortest size class (used for the ties).
+            non_empty_queue_names (Set[str]): Names of the queues with waiting jobs.
+
+        Returns:
+            List[str]: Names of the queues in the order they should be drained in.
+        """
+        busy_virtual_times = [self.virtual_times.get(queue_name, 0.0) for queue_name in non_empty_queue_names]
+        if busy_virtual_times:
+            for queue_name in set(queue_names) - non_empty_queue_names:
+                self.virtual_times[queue_name] = max(self.virtual_times.get(queue_name, 0.0), min(busy_virtual_times))
+        return sorted(queue_names, key=lambda queue_name: self.virtual_times.get(queue_name, 0.0))
@@ -0,0 +1,284 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+import uvicorn
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+
+from transcription_service import config
+from transcription_service.audio import SAMPLE_RATE
+from transcription_service.chunking import normalize_word
+from transcription_service.logger import log
+from transcription_service.transcription import init_whisper_model, transcribe_stream_window
+
+# Close codes of the rejected streams – the worker already serves STREAM_MAX_CONCURRENT streams (try again later),
+# or the stream is invalid (e.g. an unsupported model, or a malformed message).
+STREAMS_LIMIT_CLOSE_CODE = 1013
+INVALID_STREAM_CLOSE_CODE = 1008
+# The audio is streamed as raw PCM – signed 16-bit little-endian mono samples at 16 kHz.
+BYTES_PER_SAMPLE = 2
+# Text of the committed words given to whisper as the prompt of the next window, and the number of the committed
+# words kept by a stream (for the prompt, and to drop the words transcribed again at the start of the next window).
+PROMPT_MAX_CHARS = 200
+COMMITTED_WORDS_KEPT = 50
+# Up to that many committed words may be transcribed again at the start of the next window – if its first words are
+# the same as the last committed ones (and start right after them, within the tolerance in seconds), they are dropped.
+REPEATED_WORDS_MAX_COUNT = 5
+REPEATED_WORDS_MAX_GAP = 1.0
+
+# Runs the passes of all the streams of the process one by one – they all share the same model (and the CPU/GPU).
+INFERENCE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream_inference")
+
+
+class StreamTranscriber:
+    """
+    Transcription of a live audio stream over a sliding window (the LocalAgreement-2 policy). The window – from the end
+    of the words committed so far to the latest audio – is transcribed again as the audio comes in, and the words two
+    consecutive hypotheses agree on (their common prefix) are committed as final, the rest of the latest hypothesis is
+    interim (it may still change). The committed audio is trimmed off the window, and the committed text is the prompt
+    of the next windows, so the window stays short – once it grows above `max_buffer_duration` seconds anyway (the
+    hypotheses keep changing), its latest hypothesis is committed as it is.
+
+    All the timestamps are in seconds from the start of the stream.
+    """
+
+    def __init__(self, model_name: str, max_buffer_duration: float):
+        self.model_name = model_name
+        self.max_buffer_duration = max_buffer_duration
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # Stream time of the start of the window.
+        self._buffer_start = 0.0
+        self._committed_words: List[dict] = []
+        self._committed_end = 0.0
+        # The words of the latest hypothesis not committed yet.
+        self._hypothesis: List[dict] = []
+
+    @property
+    def duration(self) -> float:
+        """Duration of the audio received so far."""
+        return self._buffer_start + len(self._buffer) / SAMPLE_RATE
+
+    def insert_audio(self, audio: np.ndarray) -> None:
+        self._buffer = np.concatenate([self._buffer, audio])
+
+    def _transcribe(self) -> List[dict]:
+        if len(self._buffer) == 0:
+            return []
+        prompt = "".join(word["word"] for word in self._committed_words)[-PROMPT_MAX_CHARS:]
+        words = [
+            {"word": word["word"], "start": word["start"] + self._buffer_start, "end": word["end"] + self._buffer_start}
+            for word in transcribe_stream_window(self._buffer, self.model_name, initial_prompt=prompt or None)
+        ]
+        words = [word for word in words if word["end"] > self._committed_end]
+        # The last committed word may be cut in the middle (its end timestamp is not exact) and transcribed again.
+        if words and words[0]["start"] - self._committed_end < REPEATED_WORDS_MAX_GAP:
+            for count in range(min(REPEATED_WORDS_MAX_COUNT, len(words), len(self._committed_words)), 0, -1):
+                committed_tail = [normalize_word(word["word"]) for word in self._committed_words[-count:]]
+                if committed_tail == [normalize_word(word["word"]) for word in words[:count]]:
+                    words = words[count:]
+                    break
+        return words
+
+    def _trim(self, stream_time: float) -> None:
+        samples = max(0, int((stream_time - self._buffer_start) * SAMPLE_RATE))
+        self._buffer = self._buffer[samples:]
+        self._buffer_start += samples / SAMPLE_RATE
+
+    def process(self, is_final: bool = False) -> Tuple[List[dict], List[dict]]:
+        """
+        Transcribe the window (blocking – it's run in the `INFERENCE_EXECUTOR`).
+
+        Args:
+            is_final (bool): Whether the stream ended – all the words of the window are committed then.
+
+        Returns:
+            Tuple[List[dict], List[dict]]: The newly committed words and the interim ones.
+        """
+        words = self._transcribe()
+        buffer_duration = len(self._buffer) / SAMPLE_RATE
+        if is_final or buffer_duration > self.max_buffer_duration:
+            committed_count = len(words)
+        else:
+            committed_count = 0
+            for word, previous_word in zip(words, self._hypothesis):
+                if normalize_word(word["word"]) != normalize_word(previous_word["word"]):
+                    break
+                committed_count += 1
+        committed, self._hypothesis = words[:committed_count], words[committed_count:]
+        if committed:
+            self._committed_words = (self._committed_words + committed)[-COMMITTED_WORDS_KEPT:]
+            self._committed_end = committed[-1]["end"]
+            self._trim(self._committed_end)
+        if is_final:
+            self._trim(self.duration)
+        elif len(self._buffer) / SAMPLE_RATE > self.max_buffer_duration:
+            # Nothing to commit in the window (e.g. a long silence) – its older half is dropped.
+            self._trim(self.duration - self.max_buffer_duration / 2)
+            self._hypothesis = []
+        return committed, self._hypothesis
+
+
+def _get_segment_message(message_type: str, words: List[dict]) -> dict:
+    return {
+        "type": message_type,
+        "start": round(words[0]["start"], 3) if words else None,
+        "end": round(words[-1]["end"], 3) if words else None,
+        "text": "".join(word["word"] for word in words),
+        "words": [{"word": word["word"], "start": round(word["start"], 3), "end": round(word["end"], 3)} for word in words],
+    }
+
+
+async def _serve_stream(websocket: WebSocket, transcriber: StreamTranscriber) -> None:
+    """
+    Receive the audio of the stream and send back its transcription, until the client ends the stream. The audio
+    received while a pass is running is transcribed by the next one, so the passes get longer (and fewer) rather than
+    falling behind when the inference is slow – and once STREAM_MAX_PENDING_SECONDS of the audio are waiting, the
+    stream is not read from anymore, so the client is held off by the TCP flow control (backpressure).
+    """
+    step_size = int(config.STREAM_STEP_SECONDS * SAMPLE_RATE) * BYTES_PER_SAMPLE
+    max_pending_size = max(int(config.STREAM_MAX_PENDING_SECONDS * SAMPLE_RATE) * BYTES_PER_SAMPLE, step_size)
+    pending = bytearray()
+    is_ended = False
+    pending_changed = asyncio.Condition()
+
+    async def receive_audio() -> None:
+        nonlocal is_ended
+        while True:
+            async with pending_changed:
+                await pending_changed.wait_for(lambda: len(pending) < max_pending_size)
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes") is not None:
+                if len(message["bytes"]) % BYTES_PER_SAMPLE:
+                    raise ValueError("Audio frames must consist of whole 16-bit samples.")
+                async with pending_changed:
+                    pending.extend(message["bytes"])
+                    pending_changed.notify_all()
+            else:
+                control_message = json.loads(message.get("text") or "null")
+                if not isinstance(control_message, dict) or control_message.get("type") != "end":
+                    raise ValueError('Only the {"type": "end"} text messages are expected.')
+                async with pending_changed:
+                    is_ended = True
+                    pending_changed.notify_all()
+                return
+
+    async def transcribe() -> None:
+        loop = asyncio.get_running_loop()
+        interim_text = ""
+        while True:
+            async with pending_changed:
+                await pending_changed.wait_for(lambda: is_ended or len(pending) >= step_size)
+                data, is_final = bytes(pending), is_ended
+                pending.clear()
+                pending_changed.notify_all()
+            transcriber.insert_audio(np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0)
+            committed, interim = await loop.run_in_executor(INFERENCE_EXECUTOR, transcriber.process, is_final)
+            if committed:
+                await websocket.send_json(_get_segment_message("final", committed))
+            # Only the changes – an empty interim segment clears the previous one.
+            if "".join(word["word"] for word in interim) != interim_text:
+                await websocket.send_json(_get_segment_message("interim", interim))
+                interim_text = "".join(word["word"] for word in interim)
+            if is_final:
+                await websocket.send_json({"type": "end", "duration": round(transcriber.duration, 3)})
+                return
+
+    tasks = [asyncio.ensure_future(receive_audio()), asyncio.ensure_future(transcribe())]
+    try:
+        # The receiving ends first (with the end of the stream), the transcription – once the rest is transcribed.
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Preload the default model (the other served ones are loaded on demand, see `ModelCache`) – in the inference
+    thread, which runs all the passes.
+    """
+    if config.WORKER_TORCH_THREADS > 0:
+        torch.set_num_threads(config.WORKER_TORCH_THREADS)
+    preloaded_model_name = (
+        config.WHISPER_MODEL_NAME
+        if config.WHISPER_MODEL_NAME in config.WORKER_WHISPER_MODELS
+        else config.WORKER_WHISPER_MODELS[0]
+    )
+    await asyncio.get_running_loop().run_in_executor(
+        INFERENCE_EXECUTOR, init_whisper_model, preloaded_model_name, config.WHISPER_MODEL_DEVICE
+    )
+    app.state.streams_count = 0
+    log.info("Whisper model preloaded. Starting serving streams...")
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.get("/ping")
+def ping_check():
+    return {"ping": "pong", "streams": app.state.streams_count, "max_streams": config.STREAM_MAX_CONCURRENT}
+
+
+@app.websocket("/stream")
+async def stream(websocket: WebSocket, model: Optional[str] = None):
+    """
+    Transcribe a live audio stream.
+
+    The client sends the audio as binary messages of raw PCM (signed 16-bit little-endian mono samples at 16 kHz, of
+    any length), and a `{"type": "end"}` text message once the stream ends. The server sends back JSON messages of
+    the segments as they are transcribed – `final` ones (never changed again, in order) and `interim` ones (the rest
+    of the latest hypothesis, replacing the previous interim one), both with the `start`, `end` (in seconds from the
+    start of the stream), `text` and `words` (with their timestamps) – and a final `{"type": "end"}` message once the
+    rest of the audio is transcribed, then it closes the connection.
+
+    Streams over STREAM_MAX_CONCURRENT of the worker are closed right away with the 1013 (try again later) code.
+    """
+    model_name = model or config.WHISPER_MODEL_NAME
+    if model_name not in config.WORKER_WHISPER_MODELS:
+        await websocket.accept()
+        await websocket.close(
+            INVALID_STREAM_CLOSE_CODE, f"Unsupported model. Available models: {', '.join(config.WORKER_WHISPER_MODELS)}."
+        )
+        return
+    if websocket.app.state.streams_count >= config.STREAM_MAX_CONCURRENT:
+        await websocket.accept()
+        await websocket.close(STREAMS_LIMIT_CLOSE_CODE, "Too many concurrent streams, try again later.")
+        return
+
+    websocket.app.state.streams_count += 1
+    try:
+        await websocket.accept()
+        log.info(f"Stream started ({websocket.app.state.streams_count} streams)")
+        transcriber = StreamTranscriber(model_name, config.STREAM_MAX_BUFFER_SECONDS)
+        await _serve_stream(websocket, transcriber)
+        log.info(f"Stream ended after {transcriber.duration:.1f}s of audio")
+        await websocket.close()
+    except WebSocketDisconnect:
+        log.info("Stream disconnected by the client")
+    except ValueError as e:
+        await websocket.close(INVALID_STREAM_CLOSE_CODE, str(e))
+    finally:
+        websocket.app.state.streams_count -= 1
+
+
+def main():
+    """
+    Run the streaming worker – a dedicated process serving the live streams with its own model, rather than the
+    queue workers (whose jobs would hold the streams off for minutes).
+    """
+    log.info("Starting the streaming worker. Preloading Whisper model...")
+    uvicorn.run(app, host="0.0.0.0", port=config.STREAMING_PORT, log_level=config.LOG_LEVEL.lower())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,31 @@
-import json
-import tempfile
+import importlib
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
-import ffmpeg
+import numpy as np
 import whisper
+from rq import Queue, get_current_job
+from rq.job import Job, JobStatus
 
 from transcription_service import config
-from transcription_service.models import MediaType
+from transcription_service.audio import SAMPLE_RATE, decode_audio, get_media_duration, take_prefetched_audio
+from transcription_service.checkpoints import TranscriptionCheckpoint, shift_segments
+from transcription_service.chunking import merge_windows_segments, split_into_windows
+from transcription_service.estimation import record_real_time_factor
+from transcription_service.logger import log
+from transcription_service.metrics import REAL_TIME_FACTOR, measure_stage
+from transcription_service.model_cache import ModelCache
+from transcription_service.models import MediaType, SilenceSkippingReport
+from transcription_service.progress import ProgressReporter
+from transcription_service.result_cache import add_cached_result, get_result_cache_key
+from transcription_service.result_formats import write_transcription_results
+from transcription_service.scheduling import CHUNKS_QUEUE_NAME, get_job_retry, get_job_timeout, get_model_queue_name
+from transcription_service.vad import get_silence_skipping_report, merge_silence_skipping_reports, skip_silence
 
 
 def determine_media_type(path: Path) -> MediaType:
@@ -28,37 +47,471 @@ def determine_media_type(path: Path) -> MediaType:
         return MediaType.OTHER
 
 
+# Cache of the loaded whisper models, set up by `init_whisper_model`.
+MODEL_CACHE: Optional[ModelCache] = None
+
+
 def init_whisper_model(model_name: str, device: str) -> whisper.Whisper:
     """
-    Init helper class responsible for setting up global whisper model instance – necessary because of how the
-    redis queue workers are implemented.
+    Init helper class responsible for setting up global whisper models cache and preloading the given model into it –
+    necessary because of how the redis queue workers are implemented.
+    """
+    global MODEL_CACHE
+    MODEL_CACHE = ModelCache(
+        device, int(config.WORKER_MODEL_CACHE_MAX_MEMORY_MB * 1024 * 1024), config.WHISPER_MODEL_QUANTIZATION
+    )
+    return MODEL_CACHE.get(model_name)
+
+
+def get_whisper_model(model_name: Optional[str] = None) -> whisper.Whisper:
+    """Get the given (or the default) model from the models cache, loading it if needed."""
+    return MODEL_CACHE.get(model_name or config.WHISPER_MODEL_NAME)
+
+
+def get_loaded_model_names() -> List[str]:
+    """Names of the models loaded by this process, the most recently used first."""
+    return MODEL_CACHE.loaded_model_names if MODEL_CACHE is not None else []
+
+
+# How often the fan-out parent job checks the state of its chunk jobs.
+CHUNKS_POLL_INTERVAL = 1.0
+# Finished chunks are kept for a while, so a retried parent job can reuse them.
+CHUNKS_RESULT_TTL = 24 * 60 * 60
+# Text of that many last segments of the previous attempts is the prompt of a resumed transcription (whisper keeps
+# only up to its last ~220 tokens anyway).
+RESUMED_PROMPT_SEGMENTS = 20
+
+
+@contextmanager
+def _forward_whisper_progress(callback: Callable[[float, List[dict]], None]) -> Iterator[None]:
+    """
+    Forward the progress of `whisper.transcribe` to the callback (with the duration of the processed audio in seconds
+    and all the segments transcribed so far).
+
+    Whisper reports its progress only through a tqdm progress bar, so it's swapped for one calling the callback
+    instead. The segments are read from the transcription loop (`all_segments`), which updates the bar after every
+    processed 30 seconds window.
+
+    Both are internals of the pinned whisper version (see `pyproject.toml`) – they're checked before every
+    transcription, so a whisper upgrade changing them fails loudly instead of silently losing the progress. The bar is
+    swapped for the whole process, so the transcriptions of the other threads meanwhile get an inert one (whisper's
+    own bar is disabled unless `verbose=False` anyway).
     """
-    global TRANSCRIPTION_MODEL
-    TRANSCRIPTION_MODEL = whisper.load_model(model_name).to(device)
+    # `whisper.transcribe` is shadowed by the function of the same name.
+    whisper_transcribe_module = importlib.import_module("whisper.transcribe")
+    transcribe_code = whisper_transcribe_module.transcribe.__code__
+    if not hasattr(whisper_transcribe_module, "tqdm") or "all_segments" not in transcribe_code.co_varnames:
+        raise RuntimeError(
+            f"Unsupported whisper version {whisper.__version__} – the progress of its transcriptions can't be forwarded."
+        )
+    thread_id = threading.get_ident()
+
+    class _ProgressBar:
+        def __init__(self, *args, **kwargs):
+            self.processed_frames = 0
 
+        def __enter__(self):
+            return self
 
-def _format_to_word_timestamps_json_string(transcription_segments: dict) -> str:
-    word_timings = []
-    for segment in transcription_segments:
-        for word_info in segment["words"]:
-            word_timings.append(
-                {"word": word_info["word"], "start": f"{word_info['start']:.2f}", "end": f"{word_info['end']:.2f}"}
+        def __exit__(self, *exc_info):
+            return False
+
+        def update(self, frames: int) -> None:
+            if threading.get_ident() != thread_id:
+                return
+            self.processed_frames += frames
+            # The frame of the transcription loop, wherever in it the bar is updated from.
+            frame = sys._getframe(1)
+            while frame is not None and frame.f_code is not transcribe_code:
+                frame = frame.f_back
+            if frame is None:
+                raise RuntimeError(f"Unsupported whisper version {whisper.__version__} – no transcription loop found.")
+            callback(
+                self.processed_frames * whisper.audio.HOP_LENGTH / whisper.audio.SAMPLE_RATE, frame.f_locals["all_segments"]
             )
-    word_timings_str = json.dumps(word_timings, indent=4)
-    return word_timings_str
+
+    original_tqdm = whisper_transcribe_module.tqdm
+    whisper_transcribe_module.tqdm = SimpleNamespace(tqdm=_ProgressBar)
+    try:
+        yield
+    finally:
+        whisper_transcribe_module.tqdm = original_tqdm
 
 
-def _transcribe_audio(path: Path, include_word_timestamps: bool) -> str:
-    global TRANSCRIPTION_MODEL
-    result = TRANSCRIPTION_MODEL.transcribe(str(path), word_timestamps=include_word_timestamps)
-    if include_word_timestamps:
-        word_timings_str = _format_to_word_timestamps_json_string(result["segments"])
-        return word_timings_str
+def _run_whisper(
+    audio: np.ndarray,
+    word_timestamps: bool,
+    progress_callback: Optional[Callable[[float, List[dict]], None]] = None,
+    model_name: Optional[str] = None,
+    initial_prompt: Optional[str] = None,
+) -> Tuple[dict, Optional[SilenceSkippingReport]]:
+    """
+    Transcribe the audio with the whisper model – only its speech if the silence skipping is enabled, with the
+    timestamps of the result (and of the reported progress) mapped back to the original audio.
+
+    Returns:
+        Tuple[dict, Optional[SilenceSkippingReport]]: The whisper result and the report of the skipped silence (None if
+        the silence skipping is disabled).
+    """
+    model = get_whisper_model(model_name)
+    timeline = None
+    if config.VAD_ENABLED:
+        audio, timeline = skip_silence(audio)
+        if progress_callback is not None:
+            speech_progress_callback = progress_callback
+
+            def progress_callback(processed_duration: float, segments: List[dict]) -> None:
+                speech_progress_callback(
+                    timeline.to_original(processed_duration, is_end=True), timeline.remap_segments(segments)
+                )
+
+    started_at = time.monotonic()
+    if len(audio) == 0:
+        # Nothing but silence – whisper would only hallucinate something.
+        result = {"text": "", "segments": []}
+    elif progress_callback is not None:
+        with _forward_whisper_progress(progress_callback):
+            result = model.transcribe(audio, word_timestamps=word_timestamps, initial_prompt=initial_prompt)
     else:
-        return result["text"]
+        result = model.transcribe(audio, word_timestamps=word_timestamps, initial_prompt=initial_prompt)
 
+    if timeline is None:
+        return result, None
+    result["segments"] = timeline.remap_segments(result["segments"])
+    return result, get_silence_skipping_report(timeline, time.monotonic() - started_at)
 
-def transcribe_audio_task(reference_id: str, include_word_timestamps: bool = False) -> None:
+
+def _transcribe_audio(
+    audio: np.ndarray,
+    include_word_timestamps: bool,
+    progress_reporter: Optional[ProgressReporter] = None,
+    model_name: Optional[str] = None,
+    checkpoint: Optional[TranscriptionCheckpoint] = None,
+) -> Tuple[List[dict], str, Optional[SilenceSkippingReport], float]:
+    """
+    Transcribe the audio – continuing from the checkpoint of the previous attempts, if given. The audio they processed
+    is skipped, and the text of their last segments is given to whisper as the prompt (as it would be if the audio
+    was transcribed at once).
+
+    Returns:
+        Tuple[List[dict], str, Optional[SilenceSkippingReport], float]: The segments, the whole text, the report of the
+            skipped silence (if it was skipped), and the duration of the audio transcribed by this attempt in seconds
+            (without the resumed one).
+    """
+    resumed_duration, resumed_segments = checkpoint.start() if checkpoint is not None else (0.0, [])
+    if resumed_duration > 0:
+        log.info(f"Resuming the transcription from {resumed_duration:.1f}s ({len(resumed_segments)} segments)")
+    if progress_reporter is not None:
+        progress_reporter.resume_from(resumed_duration)
+    duration = len(audio) / SAMPLE_RATE
+    audio = audio[int(resumed_duration * SAMPLE_RATE) :]
+
+    def report_progress(processed_duration: float, segments: List[dict]) -> None:
+        all_segments = resumed_segments + shift_segments(segments, resumed_duration, include_word_timestamps)
+        if progress_reporter is not None:
+            progress_reporter.update(resumed_duration + processed_duration, all_segments)
+        if checkpoint is not None:
+            checkpoint.save(resumed_duration + processed_duration, all_segments)
+
+    if progress_reporter is not None:
+        progress_reporter.update(resumed_duration, resumed_segments)
+    result, silence_skipping = _run_whisper(
+        audio,
+        include_word_timestamps,
+        report_progress if progress_reporter is not None or checkpoint is not None else None,
+        model_name=model_name,
+        initial_prompt="".join(segment["text"] for segment in resumed_segments[-RESUMED_PROMPT_SEGMENTS:]) or None,
+    )
+    segments = resumed_segments + shift_segments(result["segments"], resumed_duration, include_word_timestamps)
+    if progress_reporter is not None:
+        progress_reporter.update(duration, segments, force=True)
+
+    text = "".join(segment["text"] for segment in segments) if resumed_segments else result["text"]
+    return segments, text, silence_skipping, max(duration - resumed_duration, 0.0)
+
+
+def transcribe_stream_window(
+    audio: np.ndarray, model_name: Optional[str] = None, initial_prompt: Optional[str] = None
+) -> List[dict]:
+    """
+    Transcribe a window of a live audio stream (see `transcription_service.streaming`) with the already loaded model.
+
+    Returns:
+        List[dict]: The transcribed words, with their timestamps relative to the start of the window.
+    """
+    result, _ = _run_whisper(audio, True, model_name=model_name, initial_prompt=initial_prompt)
+    return [
+        {"word": word_info["word"], "start": word_info["start"], "end": word_info["end"]}
+        for segment in result["segments"]
+        for word_info in segment.get("words", [])
+    ]
+
+
+def _should_fan_out(path: Path, duration: Optional[float] = None) -> Optional[float]:
+    """
+    Check whether the media file is long enough to be transcribed in chunks by multiple workers.
+
+    Args:
+        path (Path): Path to the media file.
+        duration (Optional[float]): Duration of the media, if already known (probed otherwise).
+
+    Returns:
+        Optional[float]: The duration of the media if it should be fanned out, None otherwise.
+    """
+    if config.FAN_OUT_MIN_DURATION <= 0:
+        return None
+    if duration is None:
+        duration = get_media_duration(path)
+    if duration is None or duration < config.FAN_OUT_MIN_DURATION:
+        return None
+    return duration
+
+
+def _transcribe_window(
+    reference_id: str, start: float, duration: float, model_name: str
+) -> Tuple[List[dict], Optional[SilenceSkippingReport]]:
+    """Transcribe a single window of a long media file – see `transcribe_chunk_task`."""
+    started_at = time.monotonic()
+    job = get_current_job()
+    stage_durations: Dict[str, float] = {}
+    with measure_stage(job.connection, "audio_decode", stage_durations):
+        audio = take_prefetched_audio(job.id)
+        if audio is None:
+            audio = decode_audio(config.UPLOADS_DIR / f"{reference_id}", start, duration)
+    with measure_stage(job.connection, "inference", stage_durations):
+        result, silence_skipping = _run_whisper(audio, True, model_name=model_name)
+    _record_real_time_factor(job, model_name, time.monotonic() - started_at, len(audio) / SAMPLE_RATE)
+
+    segments = [
+        {
+            "start": segment["start"],
+            "end": segment["end"],
+            "text": segment["text"],
+            "words": [
+                {"word": word_info["word"], "start": word_info["start"], "end": word_info["end"]}
+                for word_info in segment.get("words", [])
+            ],
+        }
+        for segment in result["segments"]
+    ]
+    return segments, silence_skipping
+
+
+def transcribe_chunk_task(reference_id: str, start: float, duration: float, model_name: Optional[str] = None) -> List[dict]:
+    """
+    Transcribe a single window of a long media file – a part of the fan-out transcription of the whole file.
+
+    Args:
+        reference_id (str): The reference ID of the media file.
+        start (float): Start of the window in seconds.
+        duration (float): Duration of the window in seconds.
+        model_name (Optional[str]): Whisper model to transcribe with (the default one if not given).
+
+    Returns:
+        List[dict]: Segments of the window with word timestamps (always needed for merging the windows), timed from
+        the window start.
+    """
+    segments, silence_skipping = _transcribe_window(reference_id, start, duration, model_name or config.WHISPER_MODEL_NAME)
+    if silence_skipping is not None:
+        # Collected by the parent job from the finished chunks.
+        job = get_current_job()
+        job.meta["silence_skipping"] = silence_skipping.model_dump()
+        job.save_meta()
+    return segments
+
+
+def _transcribe_in_chunks(
+    reference_id: str,
+    duration: float,
+    include_word_timestamps: bool,
+    progress_reporter: ProgressReporter,
+    model_name: str,
+) -> Tuple[List[dict], str, Optional[SilenceSkippingReport]]:
+    """
+    Fan-out transcription of a long media file. The file is split into overlapping windows, which are enqueued as
+    chunk jobs, so they are transcribed in parallel by the whole worker fleet. The results are then merged (reduced)
+    here, in the parent job.
+
+    While waiting, the parent job transcribes its chunks which were not picked up by any other worker yet itself –
+    so it doesn't block a worker idly, and the transcription progresses even with a single worker.
+    """
+    job = get_current_job()
+    # Chunks are transcribed with the same model, so they are routed to the workers serving it.
+    queue = Queue(get_model_queue_name(CHUNKS_QUEUE_NAME, model_name), connection=job.connection)
+    windows = split_into_windows(duration, config.FAN_OUT_WINDOW_DURATION, config.FAN_OUT_WINDOW_OVERLAP)
+    chunk_job_ids = [f"{reference_id}:chunk:{i}" for i in range(len(windows))]
+
+    # Chunks finished or still in progress from a previous attempt of this job are reused.
+    chunk_jobs = Job.fetch_many(chunk_job_ids, connection=job.connection)
+    queue.enqueue_many(
+        [
+            Queue.prepare_data(
+                transcribe_chunk_task,
+                args=(reference_id, start, window_duration, model_name),
+                job_id=chunk_job_id,
+                timeout=get_job_timeout(window_duration),
+                retry=get_job_retry(),
+                result_ttl=CHUNKS_RESULT_TTL,
+                failure_ttl=CHUNKS_RESULT_TTL,
+                meta={"trace_id": job.meta.get("trace_id")},
+            )
+            for chunk_job_id, chunk_job, (start, window_duration) in zip(chunk_job_ids, chunk_jobs, windows)
+            if chunk_job is None
+            or chunk_job.get_status(refresh=False) in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED)
+        ]
+    )
+
+    windows_segments: List[Optional[List[dict]]] = [None] * len(windows)
+    silence_skipping_reports: List[SilenceSkippingReport] = []
+    progress_reporter.update(0, [])
+    while True:
+        chunk_jobs = Job.fetch_many(chunk_job_ids, connection=job.connection)
+        pending = False
+        for i, chunk_job in enumerate(chunk_jobs):
+            if windows_segments[i] is not None:
+                continue
+            if chunk_job is None:
+                raise RuntimeError(f"Chunk job {chunk_job_ids[i]} disappeared.")
+
+            chunk_status = chunk_job.get_status(refresh=False)
+            if chunk_status == JobStatus.FINISHED:
+                windows_segments[i] = chunk_job.return_value()
+                if "silence_skipping" in chunk_job.meta:
+                    silence_skipping_reports.append(SilenceSkippingReport(**chunk_job.meta["silence_skipping"]))
+            elif chunk_status in (JobStatus.FAILED, JobStatus.STOPPED, JobStatus.CANCELED):
+                latest_result = chunk_job.latest_result()
+                exc_string = latest_result.exc_string if latest_result else None
+                raise RuntimeError(f"Chunk job {chunk_job.id} did not finish ({chunk_status}): {exc_string}")
+            elif chunk_status == JobStatus.QUEUED and queue.remove(chunk_job.id):
+                # Removing the job from the queue is atomic, so no other worker can pick it up anymore.
+                windows_segments[i], silence_skipping = _transcribe_window(reference_id, *windows[i], model_name)
+                if silence_skipping is not None:
+                    silence_skipping_reports.append(silence_skipping)
+                chunk_job.delete()
+                _report_chunks_progress(progress_reporter, windows, windows_segments, force=False)
+            else:
+                pending = True
+
+        _report_chunks_progress(progress_reporter, windows, windows_segments, force=not pending)
+        if not pending:
+            break
+        time.sleep(CHUNKS_POLL_INTERVAL)
+
+    with job.connection.pipeline() as pipeline:
+        for chunk_job in chunk_jobs:
+            if chunk_job is not None:
+                chunk_job.delete(pipeline=pipeline)
+        pipeline.execute()
+
+    segments = merge_windows_segments(windows, windows_segments, config.FAN_OUT_WINDOW_OVERLAP)
+    silence_skipping = merge_silence_skipping_reports(silence_skipping_reports)
+    return segments, "".join(segment["text"] for segment in segments), silence_skipping
+
+
+def _report_chunks_progress(
+    progress_reporter: ProgressReporter,
+    windows: List[Tuple[float, float]],
+    windows_segments: List[Optional[List[dict]]],
+    force: bool,
+) -> None:
+    """
+    Report the progress of the fan-out transcription – the processed duration is the one of all the finished windows,
+    while the partial transcript is merged from the finished windows at the beginning of the media (as the segments of
+    the following windows may still change it).
+    """
+    processed_duration = sum(
+        window_duration for (_, window_duration), segments in zip(windows, windows_segments) if segments is not None
+    )
+    finished_prefix_length = next((i for i, segments in enumerate(windows_segments) if segments is None), len(windows))
+    # The window following the finished ones is needed as well to know where the last finished window is cut.
+    segments = merge_windows_segments(
+        windows[: finished_prefix_length + 1], windows_segments[:finished_prefix_length], config.FAN_OUT_WINDOW_OVERLAP
+    )
+    progress_reporter.update(processed_duration, segments, force=force)
+
+
+def _record_real_time_factor(job: Job, model_name: str, processing_time: float, media_duration: float) -> None:
+    """Record how long the media took to transcribe, for the estimation of the queue waits (and the metrics)."""
+    record_real_time_factor(job.connection, model_name, MODEL_CACHE.device_id, processing_time, media_duration)
+    if media_duration > 0:
+        REAL_TIME_FACTOR.observe(
+            job.connection, processing_time / media_duration, model=model_name, device=MODEL_CACHE.device_id
+        )
+
+
+def _cache_transcription_result(reference_id: str, content_hash: str, include_word_timestamps: bool, model_name: str) -> None:
+    """Make the finished transcription reusable by the later uploads of the same content."""
+    cache_key = get_result_cache_key(content_hash, model_name, include_word_timestamps)
+    add_cached_result(get_current_job().connection, cache_key, reference_id)
+
+
+def _transcribe_media(
+    reference_id: str, include_word_timestamps: bool, content_hash: Optional[str], model_name: Optional[str]
+) -> None:
+    """
+    Transcribe the media file (audio or video – its audio track is decoded the same way) with the given reference
+    ID and save the result to the transcriptions directory.
+    """
+    started_at = time.monotonic()
+    model_name = model_name or config.WHISPER_MODEL_NAME
+    job = get_current_job()
+    media_path = config.UPLOADS_DIR / f"{reference_id}"
+    # Audio is prefetched only for the files which are not fanned out (see `get_job_audio_loader`).
+    audio = take_prefetched_audio(reference_id)
+    # Probed on upload (missing for the jobs enqueued before it was).
+    duration = job.meta.get("duration")
+    fan_out_duration = _should_fan_out(media_path, duration) if audio is None else None
+    # The fan-out transcriptions are resumed from their finished chunks instead.
+    checkpoint = None
+    stage_durations: Dict[str, float] = {}
+    if fan_out_duration is not None:
+        # Chunk jobs decode the audio of their windows straight from the media file (and measure their own stages).
+        progress_reporter = ProgressReporter(job, fan_out_duration)
+        segments, text, silence_skipping = _transcribe_in_chunks(
+            reference_id, fan_out_duration, include_word_timestamps, progress_reporter, model_name
+        )
+    else:
+        with measure_stage(job.connection, "audio_decode", stage_durations):
+            if audio is None:
+                audio = decode_audio(media_path, expected_duration=duration)
+        progress_reporter = ProgressReporter(job, len(audio) / SAMPLE_RATE)
+        if config.CHECKPOINT_INTERVAL > 0:
+            checkpoint = TranscriptionCheckpoint(reference_id, model_name, include_word_timestamps)
+        with measure_stage(job.connection, "inference", stage_durations):
+            segments, text, silence_skipping, transcribed_duration = _transcribe_audio(
+                audio, include_word_timestamps, progress_reporter, model_name, checkpoint
+            )
+        # The fan-out transcriptions are not recorded as a whole – their chunks are (the time of a single worker). The
+        # resumed ones only by the audio left after their checkpoint.
+        _record_real_time_factor(job, model_name, time.monotonic() - started_at, transcribed_duration)
+
+    # Save transcription
+    with measure_stage(job.connection, "result_write", stage_durations):
+        write_transcription_results(reference_id, segments, text, include_word_timestamps)
+    log.info(
+        f"Transcribed {reference_id} in {time.monotonic() - started_at:.1f}s ("
+        + ", ".join(f"{stage} {stage_duration:.1f}s" for stage, stage_duration in stage_durations.items())
+        + ")"
+    )
+    if checkpoint is not None:
+        checkpoint.delete()
+    if silence_skipping is not None:
+        log.info(
+            f"Skipped {silence_skipping.skipped_fraction:.0%} of {reference_id} as silence, saving "
+            f"~{silence_skipping.estimated_time_saved_seconds:.0f}s of the inference"
+        )
+        job.meta["silence_skipping"] = silence_skipping.model_dump()
+        job.save_meta()
+    if content_hash is not None:
+        _cache_transcription_result(reference_id, content_hash, include_word_timestamps, model_name)
+
+
+def transcribe_audio_task(
+    reference_id: str,
+    include_word_timestamps: bool = False,
+    content_hash: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> None:
     """
     Transcribe an audio file with the given reference ID. The transcription result will be saved to a file in the
     configured transcriptions directory.
@@ -67,23 +520,18 @@ def transcribe_audio_task(reference_id: str, include_word_timestamps: bool = Fal
         reference_id (str): The reference ID of the audio file.
         include_word_timestamps (bool): Whether to include word timestamps in the transcription (rich/extended
         format) Defaults to False to ensure backwards compatibility.
+        content_hash (Optional[str]): SHA-256 of the file content, if given, the result is stored in the results cache.
+        model_name (Optional[str]): Whisper model to transcribe with (the default one if not given).
     """
-    audio_path = config.UPLOADS_DIR / f"{reference_id}"
-    results = _transcribe_audio(audio_path, include_word_timestamps)
-
-    # Save transcription
-    with open(config.TRANSCRIPTIONS_DIR / f"{reference_id}.txt", "w", encoding="utf-8") as f:
-        f.write(results)
-
+    _transcribe_media(reference_id, include_word_timestamps, content_hash, model_name)
 
-def _extract_audio_from_video(video_path: Path, audio_path: Path) -> None:
-    stream = ffmpeg.input(str(video_path))
-    stream = ffmpeg.output(stream, filename=str(audio_path), acodec="pcm_s16le", ac=1, ar="16k")
-    ffmpeg.run(stream, capture_stdout=True, capture_stderr=True)
-    # It raises an exception if the command fails / returns non-zero internally.
 
-
-def transcribe_video_task(reference_id: str, include_word_timestamps: bool = False) -> None:
+def transcribe_video_task(
+    reference_id: str,
+    include_word_timestamps: bool = False,
+    content_hash: Optional[str] = None,
+    model_name: Optional[str] = None,
+) -> None:
     """
     Transcribe a video file with the given reference ID. The transcription result will be saved to a file in the
     configured transcriptions directory.
@@ -92,13 +540,41 @@ def transcribe_video_task(reference_id: str, include_word_timestamps: bool = Fal
         reference_id (str): The reference ID of the video file.
         include_word_timestamps (bool): Whether to include word timestamps in the transcription (rich/extended
         format) Defaults to False to ensure backwards compatibility.
+        content_hash (Optional[str]): SHA-256 of the file content, if given, the result is stored in the results cache.
+        model_name (Optional[str]): Whisper model to transcribe with (the default one if not given).
+    """
+    _transcribe_media(reference_id, include_word_timestamps, content_hash, model_name)
+
+
+def is_media_transcription_job(job: Job) -> bool:
+    """Check whether the job transcribes a whole uploaded file (rather than e.g. a chunk of one)."""
+    return job.func_name in (
+        f"{__name__}.{transcribe_audio_task.__name__}",
+        f"{__name__}.{transcribe_video_task.__name__}",
+    )
+
+
+def get_job_audio_loader(job: Job) -> Optional[Callable[[], Optional[np.ndarray]]]:
     """
-    with tempfile.TemporaryDirectory() as temp_dir:
-        video_path = config.UPLOADS_DIR / f"{reference_id}"
-        temp_audio_path = Path(temp_dir) / "audio.wav"
-        _extract_audio_from_video(video_path, temp_audio_path)
-        results = _transcribe_audio(temp_audio_path, include_word_timestamps)
+    Get a function loading the audio of the given (not yet started) transcription job, so it can be prefetched.
+
+    Returns:
+        Optional[Callable[[], Optional[np.ndarray]]]: The loader, or None if the job is not a transcription job. The
+        loader returns None for the files that will be fanned out (as they are not decoded as a whole).
+    """
+    if job.func_name == f"{__name__}.{transcribe_chunk_task.__name__}":
+        reference_id, start, duration = job.args[:3]
+        return lambda: decode_audio(config.UPLOADS_DIR / f"{reference_id}", start, duration)
+
+    if is_media_transcription_job(job):
+        media_path = config.UPLOADS_DIR / f"{job.args[0]}"
+        duration = job.meta.get("duration")
+
+        def load_audio() -> Optional[np.ndarray]:
+            if _should_fan_out(media_path, duration) is not None:
+                return None
+            return decode_audio(media_path, expected_duration=duration)
+
+        return load_audio
 
-        # Save transcription
-        with open(config.TRANSCRIPTIONS_DIR / f"{reference_id}.txt", "w", encoding="utf-8") as f:
-            f.write(results)
+    return None
@@ -0,0 +1,133 @@
+import re
+import time
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.lock import Lock as AsyncLock
+from redis.exceptions import LockNotOwnedError
+from rq.utils import as_text
+
+from transcription_service import config
+
+# Hashes of the resumable upload sessions, by session ID – expiring UPLOAD_SESSION_TTL seconds after the last append.
+# The data received so far is kept in UPLOAD_SESSIONS_DIR, the file size is the offset the next append starts at.
+UPLOAD_SESSION_KEY_PREFIX = "transcription_service:upload_session:"
+# Held while data is appended to the session (or it's finalized), so the appends can't interleave. Refreshed with
+# every write, so it expires soon after the API process holding it dies.
+UPLOAD_SESSION_LOCK_TIMEOUT = 60
+# Session IDs are UUID4 hex – anything else is not looked up (nor used as a file name).
+UPLOAD_SESSION_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+class UploadSessionBusyError(Exception):
+    pass
+
+
+@dataclass
+class UploadSession:
+    session_id: str
+    filename: str
+    model_name: str
+    include_word_timestamps: bool
+    # Total size of the file in bytes, if declared by the client when creating the session.
+    size: Optional[int]
+    # Unix timestamp.
+    created_at: float
+
+    @property
+    def path(self) -> Path:
+        return config.UPLOAD_SESSIONS_DIR / self.session_id
+
+
+def get_upload_session_key(session_id: str) -> str:
+    return f"{UPLOAD_SESSION_KEY_PREFIX}{session_id}"
+
+
+def _get_upload_session_lock_key(session_id: str) -> str:
+    return f"{UPLOAD_SESSION_KEY_PREFIX}{session_id}:lock"
+
+
+async def create_upload_session(
+    redis_conn: AsyncRedis, filename: str, model_name: str, include_word_timestamps: bool, size: Optional[int]
+) -> UploadSession:
+    """Create the session of a resumable upload (its file is created by the first append)."""
+    session = UploadSession(
+        session_id=uuid.uuid4().hex,
+        filename=filename,
+        model_name=model_name,
+        include_word_timestamps=include_word_timestamps,
+        size=size,
+        created_at=time.time(),
+    )
+    mapping = {
+        "filename": session.filename,
+        "model_name": session.model_name,
+        "include_word_timestamps": int(session.include_word_timestamps),
+        "created_at": session.created_at,
+    }
+    if session.size is not None:
+        mapping["size"] = session.size
+    await redis_conn.hset(get_upload_session_key(session.session_id), mapping=mapping)
+    await redis_conn.expire(get_upload_session_key(session.session_id), config.UPLOAD_SESSION_TTL)
+    return session
+
+
+async def get_upload_session(redis_conn: AsyncRedis, session_id: str) -> Optional[UploadSession]:
+    """Get the upload session – None if it doesn't exist (e.g. it expired or was finalized)."""
+    if not UPLOAD_SESSION_ID_PATTERN.fullmatch(session_id):
+        return None
+    fields = {
+        as_text(name): as_text(value) for name, value in (await redis_conn.hgetall(get_upload_session_key(session_id))).items()
+    }
+    if not fields:
+        return None
+    return UploadSession(
+        session_id=session_id,
+        filename=fields["filename"],
+        model_name=fields["model_name"],
+        include_word_timestamps=fields["include_word_timestamps"] == "1",
+        size=int(fields["size"]) if "size" in fields else None,
+        created_at=float(fields["created_at"]),
+    )
+
+
+async def get_upload_session_expiration(redis_conn: AsyncRedis, session_id: str) -> float:
+    """Get the time the upload session expires at (unix timestamp), unless there's another append."""
+    return time.time() + max(await redis_conn.ttl(get_upload_session_key(session_id)), 0)
+
+
+async def extend_upload_session(redis_conn: AsyncRedis, session_id: str) -> None:
+    await redis_conn.expire(get_upload_session_key(session_id), config.UPLOAD_SESSION_TTL)
+
+
+async def delete_upload_session(redis_conn: AsyncRedis, session_id: str) -> None:
+    """Delete the session (its file is expected to be removed, or moved, by the caller)."""
+    await redis_conn.delete(get_upload_session_key(session_id))
+
+
+@asynccontextmanager
+async def lock_upload_session(redis_conn: AsyncRedis, session_id: str) -> AsyncIterator[AsyncLock]:
+    """
+    Hold the lock of the upload session. Its timeout is reset with `AsyncLock.reacquire`, and it's released, only while
+    still owned – if it expired meanwhile, it may be held by another request by then.
+
+    Raises:
+        UploadSessionBusyError: If the session is already locked (e.g. another append is still running), or the lock
+            expired while held.
+    """
+    lock = redis_conn.lock(_get_upload_session_lock_key(session_id), timeout=UPLOAD_SESSION_LOCK_TIMEOUT)
+    if not await lock.acquire(blocking=False):
+        raise UploadSessionBusyError()
+    try:
+        yield lock
+    except LockNotOwnedError:
+        raise UploadSessionBusyError()
+    finally:
+        try:
+            await lock.release()
+        except LockNotOwnedError:
+            pass
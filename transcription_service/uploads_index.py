@@ -0,0 +1,135 @@
+import base64
+import os
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from transcription_service import config
+from transcription_service.logger import log
+
+# Sorted set holding all the reference IDs, scored by the upload time (unix timestamp).
+UPLOADS_INDEX_KEY = "transcription_service:uploads_index"
+
+
+def add_to_uploads_index(redis_conn: Redis, reference_id: str, uploaded_at: Optional[float] = None) -> None:
+    """
+    Record an uploaded file in the uploads index. `redis_conn` can also be a pipeline, so the index update can be
+    executed together with the job enqueueing.
+    """
+    uploaded_at = time.time() if uploaded_at is None else uploaded_at
+    redis_conn.zadd(UPLOADS_INDEX_KEY, {reference_id: uploaded_at})
+
+
+async def is_in_uploads_index(redis_conn: AsyncRedis, reference_id: str) -> bool:
+    """
+    Check whether a file with the given reference ID was uploaded – in constant time, without touching the uploads
+    directory.
+    """
+    return await redis_conn.zscore(UPLOADS_INDEX_KEY, reference_id) is not None
+
+
+async def are_in_uploads_index(redis_conn: AsyncRedis, reference_ids: List[str]) -> List[bool]:
+    """
+    Check which of the given reference IDs were uploaded, with a single Redis command.
+    """
+    if not reference_ids:
+        return []
+    scores = await redis_conn.zmscore(UPLOADS_INDEX_KEY, reference_ids)
+    return [score is not None for score in scores]
+
+
+def encode_cursor(reference_id: str) -> str:
+    return base64.urlsafe_b64encode(reference_id.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> str:
+    """
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        return base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+    except Exception as e:
+        raise ValueError("Malformed cursor.") from e
+
+
+async def get_uploads_page(redis_conn: AsyncRedis, offset: int, size: int, descending: bool) -> Tuple[List[str], int]:
+    """
+    Get a page of reference IDs (sorted by the upload time) starting at the given offset.
+
+    Returns:
+        Tuple[List[str], int]: The reference IDs on the page and the total number of uploads.
+    """
+    async with redis_conn.pipeline(transaction=False) as pipeline:
+        pipeline.zrange(UPLOADS_INDEX_KEY, offset, offset + size - 1, desc=descending)
+        pipeline.zcard(UPLOADS_INDEX_KEY)
+        reference_ids, total = await pipeline.execute()
+    return [reference_id.decode("utf-8") for reference_id in reference_ids], total
+
+
+async def get_uploads_page_after(
+    redis_conn: AsyncRedis, cursor_reference_id: str, size: int, descending: bool
+) -> Tuple[List[str], int, int]:
+    """
+    Get a page of reference IDs (sorted by the upload time) that directly follow the given (cursor) reference ID.
+
+    Returns:
+        Tuple[List[str], int, int]: The reference IDs on the page, the offset of the page and the total number of
+        uploads.
+
+    Raises:
+        KeyError: If the cursor reference ID is not present in the index.
+    """
+    if descending:
+        rank = await redis_conn.zrevrank(UPLOADS_INDEX_KEY, cursor_reference_id)
+    else:
+        rank = await redis_conn.zrank(UPLOADS_INDEX_KEY, cursor_reference_id)
+    if rank is None:
+        raise KeyError(cursor_reference_id)
+
+    offset = rank + 1
+    reference_ids, total = await get_uploads_page(redis_conn, offset, size, descending)
+    return reference_ids, offset, total
+
+
+def backfill_uploads_index(redis_conn: Redis, uploads_dir: Path, batch_size: int = 1000) -> int:
+    """
+    Add all the files from the uploads directory to the uploads index, scored by their creation time (the order
+    used before the index was introduced). Already indexed uploads keep their original upload time.
+
+    Returns:
+        int: The number of files that were added to the index.
+    """
+    added = 0
+    with redis_conn.pipeline(transaction=False) as pipeline:
+        batch_len = 0
+        with os.scandir(uploads_dir) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                pipeline.zadd(UPLOADS_INDEX_KEY, {entry.name: entry.stat().st_ctime}, nx=True)
+                batch_len += 1
+                if batch_len >= batch_size:
+                    added += sum(pipeline.execute())
+                    batch_len = 0
+        if batch_len:
+            added += sum(pipeline.execute())
+    return added
+
+
+def main():
+    """
+    One-off backfill of the uploads index for volumes with files uploaded before the index was introduced.
+    """
+    log.info("Starting the uploads index backfill. Establishing connection to Redis...")
+    redis_conn = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB)
+    added = backfill_uploads_index(redis_conn, config.UPLOADS_DIR)
+    total = redis_conn.zcard(UPLOADS_INDEX_KEY)
+    log.info(f"Uploads index backfill finished. Added {added} uploads, {total} uploads indexed in total.")
+
+
+if __name__ == "__main__":
+    main()
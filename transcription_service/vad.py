@@ -0,0 +1,164 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from transcription_service import config
+from transcription_service.audio import SAMPLE_RATE
+from transcription_service.models import SilenceSkippingReport
+
+# Duration of the frames the energy of the audio is measured in, in seconds.
+FRAME_DURATION = 0.03
+
+
+def detect_speech_spans(
+    audio: np.ndarray, threshold_db: float, min_silence_duration: float, padding: float
+) -> List[Tuple[int, int]]:
+    """
+    Detect the speech in the audio by its energy – frames louder than the threshold are considered speech.
+
+    Args:
+        audio (np.ndarray): The audio (float32 samples in [-1, 1], at `SAMPLE_RATE`).
+        threshold_db (float): Energy threshold of the speech frames in dBFS.
+        min_silence_duration (float): Shorter silences (in seconds) are kept as a part of the surrounding speech.
+        padding (float): Silence (in seconds) kept before and after every speech span, so the words are not cut.
+
+    Returns:
+        List[Tuple[int, int]]: Start and end (exclusive) samples of the speech spans, in order.
+    """
+    frame_length = int(FRAME_DURATION * SAMPLE_RATE)
+    frames_count = len(audio) // frame_length
+    if frames_count == 0:
+        return [(0, len(audio))] if len(audio) else []
+
+    frames = audio[: frames_count * frame_length].reshape(frames_count, frame_length)
+    energies_db = 10 * np.log10(np.mean(np.square(frames, dtype=np.float32), axis=1) + 1e-10)
+    # The remainder shorter than a frame goes with the last frame.
+    is_speech = np.concatenate(([False], energies_db > threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(is_speech.astype(np.int8)))
+    frames_spans = edges.reshape(-1, 2)
+
+    spans: List[Tuple[int, int]] = []
+    padding_length = int(padding * SAMPLE_RATE)
+    min_silence_length = int(min_silence_duration * SAMPLE_RATE)
+    for start_frame, end_frame in frames_spans:
+        start = max(0, start_frame * frame_length - padding_length)
+        end = len(audio) if end_frame == frames_count else min(len(audio), end_frame * frame_length + padding_length)
+        if spans and start - spans[-1][1] < min_silence_length:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+class SpeechTimeline:
+    """
+    Mapping of the timeline of the speech-only audio (the speech spans concatenated) back to the timeline of the
+    original audio.
+    """
+
+    def __init__(self, spans: List[Tuple[int, int]], audio_length: int):
+        """
+        Args:
+            spans (List[Tuple[int, int]]): Start and end samples of the speech spans in the original audio.
+            audio_length (int): Length of the original audio in samples.
+        """
+        self.spans = spans
+        self.audio_length = audio_length
+        self._speech_starts = []
+        speech_length = 0
+        for start, end in spans:
+            self._speech_starts.append(speech_length / SAMPLE_RATE)
+            speech_length += end - start
+        self.speech_length = speech_length
+
+    @property
+    def duration(self) -> float:
+        return self.audio_length / SAMPLE_RATE
+
+    @property
+    def skipped_duration(self) -> float:
+        return (self.audio_length - self.speech_length) / SAMPLE_RATE
+
+    def to_original(self, timestamp: float, is_end: bool = False) -> float:
+        """
+        Map the timestamp (in seconds) of the speech-only audio to the original audio. A timestamp on the boundary of
+        two spans is mapped to the start of the latter one – or to the end of the former one if `is_end` (e.g. of a
+        word ending there), so it doesn't stretch over the skipped silence.
+        """
+        if not self.spans:
+            return timestamp
+        i = max(0, (bisect_left if is_end else bisect_right)(self._speech_starts, timestamp) - 1)
+        return self.spans[i][0] / SAMPLE_RATE + timestamp - self._speech_starts[i]
+
+    def remap_segments(self, segments: List[dict]) -> List[dict]:
+        """Map the timestamps of the whisper segments (and their words) of the speech-only audio to the original audio."""
+        return [
+            {
+                **segment,
+                "start": self.to_original(segment["start"]),
+                "end": self.to_original(segment["end"], is_end=True),
+                **(
+                    {
+                        "words": [
+                            {
+                                **word,
+                                "start": self.to_original(word["start"]),
+                                "end": self.to_original(word["end"], is_end=True),
+                            }
+                            for word in segment["words"]
+                        ]
+                    }
+                    if "words" in segment
+                    else {}
+                ),
+            }
+            for segment in segments
+        ]
+
+
+def skip_silence(audio: np.ndarray) -> Tuple[np.ndarray, SpeechTimeline]:
+    """
+    Cut the silence (as configured by the `VAD_*` settings) out of the audio.
+
+    Returns:
+        Tuple[np.ndarray, SpeechTimeline]: The speech-only audio and the mapping of its timeline to the original one.
+    """
+    spans = detect_speech_spans(
+        audio, config.VAD_ENERGY_THRESHOLD_DB, config.VAD_MIN_SILENCE_DURATION, config.VAD_SPEECH_PADDING
+    )
+    if spans == [(0, len(audio))]:
+        speech_audio = audio
+    else:
+        speech_audio = np.concatenate([audio[start:end] for start, end in spans]) if spans else audio[:0]
+    return speech_audio, SpeechTimeline(spans, len(audio))
+
+
+def get_silence_skipping_report(timeline: SpeechTimeline, inference_time: float) -> SilenceSkippingReport:
+    """
+    Report the silence skipped in the audio – the inference time saved is estimated from the inference time of the
+    speech, as if the skipped audio was transcribed at the same speed.
+    """
+    speech_duration = timeline.speech_length / SAMPLE_RATE
+    return SilenceSkippingReport(
+        duration_seconds=timeline.duration,
+        skipped_seconds=timeline.skipped_duration,
+        skipped_fraction=timeline.skipped_duration / timeline.duration if timeline.duration > 0 else 0.0,
+        estimated_time_saved_seconds=(
+            inference_time / speech_duration * timeline.skipped_duration if speech_duration > 0 else 0.0
+        ),
+    )
+
+
+def merge_silence_skipping_reports(reports: List[SilenceSkippingReport]) -> Optional[SilenceSkippingReport]:
+    """Merge the reports of the parts of the media (e.g. the fan-out windows) into the one of the whole media."""
+    if not reports:
+        return None
+    duration = sum(report.duration_seconds for report in reports)
+    skipped_duration = sum(report.skipped_seconds for report in reports)
+    return SilenceSkippingReport(
+        duration_seconds=duration,
+        skipped_seconds=skipped_duration,
+        skipped_fraction=skipped_duration / duration if duration > 0 else 0.0,
+        estimated_time_saved_seconds=sum(report.estimated_time_saved_seconds for report in reports),
+    )
@@ -1,26 +1,470 @@
-from redis import Redis
-from rq import SimpleWorker
+import gc
+import multiprocessing
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from redis import ConnectionPool, Redis
+from redis.exceptions import ResponseError
+from rq import Queue, SimpleWorker
+from rq.job import Job, JobStatus
+from rq.utils import as_text, utcnow, utcparse
+from rq.worker_pool import WorkerPool
 
 from transcription_service import config
-from transcription_service.logger import log
-from transcription_service.transcription import init_whisper_model
+from transcription_service.audio import discard_prefetched_audio, start_audio_prefetch
+from transcription_service.estimation import (
+    add_queued_duration,
+    register_worker_device,
+    remove_queued_duration,
+    unregister_dead_workers_devices,
+    unregister_worker_device,
+)
+from transcription_service.events import publish_job_event
+from transcription_service.logger import TRACE_ID, log
+from transcription_service.metrics import STAGE_DURATION
+from transcription_service.models import TranscriptionStatus, TranscriptionStatusEnum
+from transcription_service.quantization import QUANTIZATION_NONE, QUANTIZATIONS, get_device_id
+from transcription_service.retention import run_retention
+from transcription_service.scheduling import (
+    CHUNKS_QUEUE_NAME,
+    LEGACY_QUEUE_NAME,
+    SCHEDULED_QUEUE_NAMES,
+    SIZE_CLASS_QUEUE_NAMES,
+    FairShareScheduler,
+    QueuePolicy,
+    get_model_queue_name,
+    order_by_shortest_job_first,
+    parse_fair_share_weights,
+    parse_model_queue_name,
+)
+from transcription_service.transcription import (
+    get_job_audio_loader,
+    get_loaded_model_names,
+    init_whisper_model,
+    is_media_transcription_job,
+)
+
+# Per-worker sorted sets of the jobs claimed (removed from their queues) ahead of time, scored by the claim time.
+PREFETCHED_JOBS_KEY_PREFIX = "transcription_service:prefetched:"
+PREFETCHED_JOBS_RECOVERY_KEY_PREFIX = "transcription_service:prefetched_recovery:"
+
+
+class TranscriptionWorker(SimpleWorker):
+    """
+    Worker overlapping the decoding of the upcoming jobs' audio with the inference of the current job, and publishing
+    the status transitions of the transcription jobs (see `transcription_service.events`).
+
+    Before executing a job, up to `prefetch_depth` next jobs are claimed – atomically moved from the head of their
+    queue to a registry of this worker, so no other worker picks them up – and their audio is decoded on a background
+    thread. The claimed jobs keep their QUEUED status until they are actually started. On shutdown they are pushed
+    back to the front of their queues, and the ones left behind by a dead worker are recovered by the other workers.
+
+    Every model has its own queues – the ones of the models already loaded by the worker are drained first (the most
+    recently used first), so the models are not reloaded needlessly. Unless a job of another model has been waiting
+    for longer than `model_affinity_max_wait`, then its model goes first. Within a model, the size-class queues (see
+    `transcription_service.scheduling`) are drained in the order given by the queue policy – the other queues (i.e.
+    the chunks of the fan-out transcriptions) always go first. The order is re-evaluated before every dequeue.
+    """
+
+    def __init__(
+        self,
+        *args,
+        prefetch_depth: int = 0,
+        queue_policy: Optional[QueuePolicy] = None,
+        aging_interval: float = 0,
+        fair_share_weights: Optional[Dict[str, float]] = None,
+        model_affinity_max_wait: float = 0,
+        started_at: Optional[float] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        # Monotonic time the startup of the worker began at (e.g. before loading the model), to report the cold start.
+        self.started_at = started_at if started_at is not None else time.monotonic()
+        self._first_job_started = False
+        self.prefetch_depth = prefetch_depth
+        # Claimed jobs in the order they should be executed in.
+        self._prefetched: List[Tuple[str, Queue]] = []
+        self.queue_policy = queue_policy
+        self.aging_interval = aging_interval
+        self.model_affinity_max_wait = model_affinity_max_wait
+        # (Size-class or other) queue name and the model of every queue, by its full name.
+        self._queues_models = {queue.name: parse_model_queue_name(queue.name) for queue in self.queues}
+        # The weights are given per size class, the same for all the models.
+        fair_share_weights = fair_share_weights or {}
+        self._fair_share_scheduler = FairShareScheduler(
+            {
+                queue_name: fair_share_weights.get(base_queue_name, 1.0)
+                for queue_name, (base_queue_name, _) in self._queues_models.items()
+            }
+        )
+
+    def _get_head_jobs_waits(self, queues: List[Queue]) -> Dict[str, Optional[float]]:
+        """Get how long the jobs at the heads of the given queues have been waiting (None for the empty queues)."""
+        with self.connection.pipeline(transaction=False) as pipeline:
+            for queue in queues:
+                pipeline.lindex(queue.key, 0)
+            head_job_ids = pipeline.execute()
+        with self.connection.pipeline(transaction=False) as pipeline:
+            for job_id in head_job_ids:
+                if job_id is not None:
+                    pipeline.hget(Job.key_for(as_text(job_id)), "enqueued_at")
+            enqueued_ats = iter(pipeline.execute())
+
+        now = utcnow()
+        head_waits: Dict[str, Optional[float]] = {}
+        for queue, job_id in zip(queues, head_job_ids):
+            if job_id is None:
+                head_waits[queue.name] = None
+                continue
+            enqueued_at = next(enqueued_ats)
+            # Jobs without the enqueue time recorded are treated as just enqueued.
+            head_waits[queue.name] = (now - utcparse(as_text(enqueued_at))).total_seconds() if enqueued_at else 0.0
+        return head_waits
+
+    def _is_scheduled_queue(self, queue: Queue) -> bool:
+        return self._queues_models[queue.name][0] in SCHEDULED_QUEUE_NAMES
+
+    def apply_queue_policy(self) -> None:
+        """Reorder the queues by the model affinity and the queue policy."""
+        if self.queue_policy is None:
+            return
+        head_waits = self._get_head_jobs_waits([queue for queue in self.queues if self._is_scheduled_queue(queue)])
+        models_queues: Dict[str, List[Queue]] = {}
+        for queue in self.queues:
+            models_queues.setdefault(self._queues_models[queue.name][1], []).append(queue)
+        loaded_model_names = get_loaded_model_names()
+
+        def get_model_rank(model_name: str) -> int:
+            if model_name in loaded_model_names:
+                return loaded_model_names.index(model_name)
+            max_wait = max((head_waits.get(queue.name) or 0.0 for queue in models_queues[model_name]), default=0.0)
+            if 0 < self.model_affinity_max_wait < max_wait:
+                # Waited for too long for a worker with the model loaded.
+                return -1
+            return len(loaded_model_names)
+
+        ordered_queues = []
+        for model_name in sorted(models_queues, key=get_model_rank):
+            scheduled_queues = {queue.name: queue for queue in models_queues[model_name] if self._is_scheduled_queue(queue)}
+            model_head_waits = {queue_name: head_waits[queue_name] for queue_name in scheduled_queues}
+            if self.queue_policy == QueuePolicy.SHORTEST_JOB_FIRST:
+                ordered_queue_names = order_by_shortest_job_first(
+                    list(scheduled_queues), model_head_waits, self.aging_interval
+                )
+            else:
+                non_empty_queue_names = {queue_name for queue_name, wait in model_head_waits.items() if wait is not None}
+                ordered_queue_names = self._fair_share_scheduler.order(list(scheduled_queues), non_empty_queue_names)
+            ordered_queues.extend(queue for queue in models_queues[model_name] if not self._is_scheduled_queue(queue))
+            ordered_queues.extend(scheduled_queues[queue_name] for queue_name in ordered_queue_names)
+        self._ordered_queues = ordered_queues
+
+    @property
+    def prefetched_jobs_key(self) -> str:
+        return f"{PREFETCHED_JOBS_KEY_PREFIX}{self.name}"
+
+    def _claim_next_job(self) -> Optional[Tuple[Job, Queue]]:
+        """Claim the job at the head of the first non-empty queue, if its audio can be prefetched."""
+        for queue in self._ordered_queues:
+            job_ids = queue.get_job_ids(0, 0)
+            if not job_ids:
+                continue
+            job = Job.fetch(job_ids[0], connection=self.connection, serializer=self.serializer)
+            if get_job_audio_loader(job) is None:
+                # The jobs are not reordered – prefetching stops at the first job which doesn't benefit from it.
+                return None
+
+            with self.connection.pipeline() as pipeline:
+                pipeline.lrem(queue.key, 1, job.id)
+                pipeline.zadd(self.prefetched_jobs_key, {job.id: time.time()})
+                removed_count, _ = pipeline.execute()
+            if not removed_count:
+                # Picked up by another worker in the meantime.
+                self.connection.zrem(self.prefetched_jobs_key, job.id)
+                return None
+            return job, queue
+        return None
+
+    def _prefetch_next_jobs(self) -> None:
+        while len(self._prefetched) < self.prefetch_depth:
+            self.apply_queue_policy()
+            claimed = self._claim_next_job()
+            if claimed is None:
+                return
+            job, queue = claimed
+            start_audio_prefetch(job.id, get_job_audio_loader(job))
+            self._prefetched.append((job.id, queue))
+            self.log.debug("Prefetching audio of job %s", job.id)
+
+    def execute_job(self, job: Job, queue: Queue):
+        if self.prefetch_depth > 0:
+            try:
+                self._prefetch_next_jobs()
+            except Exception:
+                # Prefetching is only an optimization, it must never prevent the job from being executed.
+                self.log.warning("Prefetching of the next jobs failed", exc_info=True)
+        started_at = time.monotonic()
+        trace_id_token = TRACE_ID.set(job.meta.get("trace_id"))
+        try:
+            super().execute_job(job, queue)
+        finally:
+            TRACE_ID.reset(trace_id_token)
+        self._fair_share_scheduler.record(queue.name, time.monotonic() - started_at)
+
+    def dequeue_job_and_maintain_ttl(self, timeout: Optional[int], max_idle_time: Optional[int] = None):
+        while self._prefetched:
+            job_id, queue = self._prefetched.pop(0)
+            job = Job.fetch(job_id, connection=self.connection, serializer=self.serializer)
+            if job.get_status(refresh=False) != JobStatus.QUEUED:
+                # E.g. canceled or deleted while waiting.
+                self.connection.zrem(self.prefetched_jobs_key, job_id)
+                remove_queued_duration(self.connection, queue.name, job_id)
+                discard_prefetched_audio(job_id)
+                continue
+
+            self.heartbeat()
+            job.redis_server_version = self.get_redis_server_version()
+            self.log.info("%s: %s (prefetched)", queue.name, job.id)
+            return job, queue
+        self.apply_queue_policy()
+        return super().dequeue_job_and_maintain_ttl(timeout, max_idle_time)
+
+    def prepare_job_execution(self, job: Job, remove_from_intermediate_queue: bool = False):
+        super().prepare_job_execution(job, remove_from_intermediate_queue)
+        if not self._first_job_started:
+            self._first_job_started = True
+            self.log.info("Time to first job: %.1fs", time.monotonic() - self.started_at)
+        # The job is in the started jobs registry from now on.
+        self.connection.zrem(self.prefetched_jobs_key, job.id)
+        if is_media_transcription_job(job):
+            remove_queued_duration(self.connection, job.origin, job.id)
+            if job.enqueued_at is not None:
+                # Since the last enqueueing, i.e. of a retried job since its retry.
+                STAGE_DURATION.observe(self.connection, (utcnow() - job.enqueued_at).total_seconds(), stage="queue_wait")
+        self._publish_job_event(job, TranscriptionStatusEnum.PROCESSING)
+
+    def _publish_job_event(self, job: Job, status: TranscriptionStatusEnum, error_message: Optional[str] = None) -> None:
+        # Chunk jobs are an implementation detail of the fan-out transcriptions.
+        if is_media_transcription_job(job):
+            publish_job_event(
+                self.connection, TranscriptionStatus(reference_id=job.id, status=status, error_message=error_message)
+            )
+
+    def handle_job_success(self, job: Job, queue: Queue, started_job_registry):
+        # Published only once the job is marked as finished, so the result can be downloaded right away.
+        super().handle_job_success(job, queue, started_job_registry)
+        self._publish_job_event(job, TranscriptionStatusEnum.COMPLETED)
+
+    def handle_job_failure(self, job: Job, queue: Queue, started_job_registry=None, exc_string=""):
+        super().handle_job_failure(job, queue, started_job_registry, exc_string)
+        job_status = job.get_status(refresh=False)
+        if job_status == JobStatus.FAILED:
+            self._publish_job_event(job, TranscriptionStatusEnum.FAILED, exc_string)
+        elif job_status in (JobStatus.QUEUED, JobStatus.SCHEDULED):
+            # To be retried.
+            if is_media_transcription_job(job):
+                add_queued_duration(self.connection, job.origin, job.id, job.meta.get("duration"))
+            self._publish_job_event(job, TranscriptionStatusEnum.QUEUED)
+
+    def _requeue_claimed_jobs(self, key: str) -> int:
+        """Push the jobs claimed in the given registry back to the front of their queues, keeping their order."""
+        job_ids = [job_id.decode("utf-8") for job_id in self.connection.zrange(key, 0, -1)]
+        jobs = Job.fetch_many(job_ids, connection=self.connection, serializer=self.serializer)
+        requeued_count = 0
+        with self.connection.pipeline() as pipeline:
+            for job in reversed(jobs):
+                if job is not None and job.get_status(refresh=False) == JobStatus.QUEUED:
+                    Queue(job.origin, connection=self.connection).push_job_id(job.id, pipeline=pipeline, at_front=True)
+                    requeued_count += 1
+            pipeline.delete(key)
+            pipeline.execute()
+        for job_id in job_ids:
+            discard_prefetched_audio(job_id)
+        return requeued_count
+
+    def recover_orphaned_prefetched_jobs(self) -> None:
+        """Requeue the jobs claimed by the workers which died without giving them back."""
+        for key in self.connection.scan_iter(match=f"{PREFETCHED_JOBS_KEY_PREFIX}*"):
+            worker_name = key.decode("utf-8")[len(PREFETCHED_JOBS_KEY_PREFIX) :]
+            if worker_name == self.name or self.connection.exists(self.redis_worker_namespace_prefix + worker_name):
+                continue
+
+            # Renaming makes sure only one of the recovering workers requeues the jobs.
+            recovery_key = f"{PREFETCHED_JOBS_RECOVERY_KEY_PREFIX}{self.name}"
+            try:
+                self.connection.rename(key, recovery_key)
+            except ResponseError:
+                continue
+            requeued_count = self._requeue_claimed_jobs(recovery_key)
+            self.log.info("Requeued %d jobs prefetched by the dead worker %s", requeued_count, worker_name)
+
+    def bootstrap(self, *args, **kwargs):
+        super().bootstrap(*args, **kwargs)
+        # So the API knows the real-time factors of this worker for the queue wait estimation.
+        register_worker_device(
+            self.connection, self.name, get_device_id(config.WHISPER_MODEL_DEVICE, config.WHISPER_MODEL_QUANTIZATION)
+        )
+        self.recover_orphaned_prefetched_jobs()
+        self.log.info("Time to ready: %.1fs", time.monotonic() - self.started_at)
+
+    def run_maintenance_tasks(self):
+        super().run_maintenance_tasks()
+        self.recover_orphaned_prefetched_jobs()
+        unregister_dead_workers_devices(self.connection)
+        try:
+            run_retention(self.connection)
+        except Exception:
+            # Retried by the next maintenance run.
+            self.log.warning("Retention failed", exc_info=True)
+
+    def teardown(self):
+        if self._prefetched:
+            requeued_count = self._requeue_claimed_jobs(self.prefetched_jobs_key)
+            self._prefetched = []
+            self.log.info("Requeued %d prefetched jobs", requeued_count)
+        unregister_worker_device(self.connection, self.name)
+        super().teardown()
+
+
+def _run_pool_worker(
+    worker_name: str,
+    queue_names: List[str],
+    connection_class,
+    connection_pool_class,
+    connection_pool_kwargs: dict,
+    worker_kwargs: dict,
+    torch_threads: int,
+    burst: bool,
+    logging_level: str,
+) -> None:
+    # The model is inherited from the pool's process, only the torch threads have to be set up for the child.
+    torch.set_num_threads(torch_threads)
+    connection = connection_class(
+        connection_pool=ConnectionPool(connection_class=connection_pool_class, **connection_pool_kwargs)
+    )
+    worker = TranscriptionWorker(queue_names, name=worker_name, connection=connection, **worker_kwargs)
+    worker.work(burst=burst, logging_level=logging_level)
+
+
+class TranscriptionWorkerPool(WorkerPool):
+    """
+    Pool of worker processes forked from the process with the preloaded whisper model.
+
+    The model weights are shared by all the workers copy-on-write (they are never written to during the inference), so
+    the pool takes roughly the memory of a single model regardless of its size – unlike the same number of separate
+    workers, each loading its own copy. Dead workers are respawned by forking again, so without reloading the model.
+    Only for the CPU inference – CUDA can't be used in the forked processes once initialized in the parent one.
+    """
+
+    def __init__(
+        self,
+        *args,
+        worker_kwargs: Optional[dict] = None,
+        torch_threads: int = 1,
+        started_at: Optional[float] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, worker_class=TranscriptionWorker, **kwargs)
+        # Keyword arguments of the `TranscriptionWorker`s.
+        self.worker_kwargs = worker_kwargs or {}
+        self.torch_threads = torch_threads
+        # Startup time of the pool – the cold start of the initial workers is reported since then, while the respawned
+        # ones are timed from their own start.
+        self.started_at = started_at
+        self._initial_workers_started = False
+        self._process_context = multiprocessing.get_context("fork")
+
+    def start_workers(self, *args, **kwargs):
+        super().start_workers(*args, **kwargs)
+        self._initial_workers_started = True
+
+    def get_worker_process(self, name: str, burst: bool, _sleep: float = 0, logging_level: str = "INFO"):
+        return self._process_context.Process(
+            target=_run_pool_worker,
+            args=(name, self._queue_names, self._connection_class, self._pool_class, self._pool_kwargs),
+            kwargs={
+                "worker_kwargs": {
+                    **self.worker_kwargs,
+                    "started_at": self.started_at if not self._initial_workers_started else None,
+                },
+                "torch_threads": self.torch_threads,
+                "burst": burst,
+                "logging_level": logging_level,
+            },
+            name=f"Worker {name} (WorkerPool {self.name})",
+        )
+
+
+def get_torch_threads_per_worker(pool_size: int) -> int:
+    """Number of the torch intra-op threads of every worker – the configured one, or the CPU cores split evenly."""
+    if config.WORKER_TORCH_THREADS > 0:
+        return config.WORKER_TORCH_THREADS
+    return max(1, len(os.sched_getaffinity(0)) // pool_size)
 
 
 def main():
+    started_at = time.monotonic()
     log.info("Starting worker. Establishing connection to Redis...")
     redis_conn = Redis(host=config.REDIS_HOST, port=config.REDIS_PORT, db=config.REDIS_DB)
+    if config.WORKER_POOL_SIZE > 1 and config.WHISPER_MODEL_DEVICE != "cpu":
+        raise ValueError("Worker pool (WORKER_POOL_SIZE > 1) is supported only with the cpu model device.")
+    if config.WHISPER_MODEL_QUANTIZATION not in QUANTIZATIONS:
+        raise ValueError(f"Unsupported WHISPER_MODEL_QUANTIZATION. Supported ones: {', '.join(QUANTIZATIONS)}")
+    if config.WHISPER_MODEL_QUANTIZATION != QUANTIZATION_NONE and config.WHISPER_MODEL_DEVICE != "cpu":
+        raise ValueError("Model quantization (WHISPER_MODEL_QUANTIZATION) is supported only with the cpu model device.")
 
     log.info("Connection established. Preloading Whisper model...")
     # Preload the model to avoid loading it on each job execution – done in a specific (rather hacky/ugly) way because
     # of how redis queue and its workers are operating underneath. Some more information can be found
     # here: https://github.com/rq/rq/issues/1088 and https://python-rq.org/docs/workers/#performance-notes
-    # TODO: potentially it can be embedded into the worker image itself, to trade off the startup time for the first job
-    #       execution for storage space.
-    init_whisper_model(config.WHISPER_MODEL_NAME, config.WHISPER_MODEL_DEVICE)
+    # The model is memory-mapped from its pre-converted artifact, so it's almost instant once the artifact exists –
+    # it's converted on the first start, unless pre-warmed (see `scripts/prewarm_models.py`).
+    # The other served models are loaded on demand (see `ModelCache`).
+    preloaded_model_name = (
+        config.WHISPER_MODEL_NAME
+        if config.WHISPER_MODEL_NAME in config.WORKER_WHISPER_MODELS
+        else config.WORKER_WHISPER_MODELS[0]
+    )
+    init_whisper_model(preloaded_model_name, config.WHISPER_MODEL_DEVICE)
 
     log.info("Whisper model preloaded. Starting serving jobs...")
-    worker = SimpleWorker(["default"], connection=redis_conn)
-    worker.work()
+    # Queues of every served model – chunks of the fan-out transcriptions go first, so the files already being
+    # transcribed are finished first. The models and the size-class queues are ordered by the worker.
+    queue_names = [
+        get_model_queue_name(queue_name, model_name)
+        for model_name in config.WORKER_WHISPER_MODELS
+        for queue_name in (CHUNKS_QUEUE_NAME, *SIZE_CLASS_QUEUE_NAMES)
+    ]
+    if config.WHISPER_MODEL_NAME in config.WORKER_WHISPER_MODELS:
+        queue_names.append(LEGACY_QUEUE_NAME)
+    worker_kwargs = {
+        "prefetch_depth": config.WORKER_PREFETCH_DEPTH,
+        "queue_policy": QueuePolicy(config.WORKER_QUEUE_POLICY),
+        "aging_interval": config.QUEUE_AGING_INTERVAL,
+        "fair_share_weights": parse_fair_share_weights(config.QUEUE_FAIR_SHARE_WEIGHTS),
+        "model_affinity_max_wait": config.MODEL_AFFINITY_MAX_WAIT,
+    }
+    if config.WORKER_POOL_SIZE > 1:
+        torch_threads = get_torch_threads_per_worker(config.WORKER_POOL_SIZE)
+        log.info(f"Forking {config.WORKER_POOL_SIZE} workers with {torch_threads} torch threads each...")
+        # Objects existing now are excluded from the garbage collection, so the collections in the workers don't
+        # write to (and so copy) the memory pages shared with this process.
+        gc.freeze()
+        pool = TranscriptionWorkerPool(
+            queue_names,
+            connection=redis_conn,
+            num_workers=config.WORKER_POOL_SIZE,
+            worker_kwargs=worker_kwargs,
+            torch_threads=torch_threads,
+            started_at=started_at,
+        )
+        pool.start(logging_level=config.LOG_LEVEL)
+    else:
+        if config.WORKER_TORCH_THREADS > 0:
+            torch.set_num_threads(config.WORKER_TORCH_THREADS)
+        worker = TranscriptionWorker(queue_names, connection=redis_conn, started_at=started_at, **worker_kwargs)
+        worker.work()
 
 
 if __name__ == "__main__":